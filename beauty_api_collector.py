@@ -1,50 +1,23 @@
-import tweepy
-import requests
-import json
-import time
 import datetime
-import sqlite3
 import os
 from dotenv import load_dotenv
+from beauty_metrics import metrics
+from beauty_search import setup_tweet_search
+from beauty_storage import get_connection, TRENDS_DB
+from beauty_twitter_planner import (RecentSearchClient, plan_queries, attribute_tweets,
+                                    TWITTER_MAX_PAGES)
 
 # 環境変数の読み込み
 load_dotenv()
 
 # Twitter API認証情報
-TWITTER_API_KEY = os.getenv("TWITTER_API_KEY")
-TWITTER_API_SECRET = os.getenv("TWITTER_API_SECRET")
-TWITTER_ACCESS_TOKEN = os.getenv("TWITTER_ACCESS_TOKEN")
-TWITTER_ACCESS_SECRET = os.getenv("TWITTER_ACCESS_SECRET")
 TWITTER_BEARER_TOKEN = os.getenv("TWITTER_BEARER_TOKEN")
 
-# DBの設定
+# DBの設定（テーブルとインデックスは beauty_storage の移行手順で作成）
 def setup_database():
-    conn = sqlite3.connect('beauty_trends.db')
-    cursor = conn.cursor()
-    
-    # X/Twitterトレンド用テーブル
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS twitter_trends (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        keyword TEXT,
-        tweet_count INTEGER,
-        tweets_text TEXT,
-        collection_date TEXT
-    )
-    ''')
-    
-    # Instagram用テーブル
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS instagram_trends (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        hashtag TEXT,
-        post_count INTEGER,
-        recent_posts TEXT,
-        collection_date TEXT
-    )
-    ''')
-    
-    conn.commit()
+    conn = get_connection(TRENDS_DB)
+    # ツイートの全文検索インデックス（保存に合わせてトリガーで更新）
+    setup_tweet_search(conn)
     return conn
 
 # 美容関連キーワード
@@ -60,63 +33,171 @@ beauty_keywords = [
     "beauty trend", "cosmetics", "K-beauty", "J-beauty"
 ]
 
+def get_cursor(conn, keyword):
+    """キーワードの取得位置 (since_id, until_id, pending_newest_id)
+
+    since_id は取得済みの最新ツイートID。until_id はページングを途中で打ち切った場合の再開位置で、
+    pending_newest_id はそのときまでに取得した最新ID（再開分を取り終えたら since_id になる）。
+    """
+    row = conn.execute("SELECT since_id, until_id, pending_newest_id FROM twitter_since_ids "
+                       "WHERE keyword = ?", (keyword,)).fetchone()
+    return tuple(row) if row else (None, None, None)
+
+def _newest(*ids):
+    ids = [tweet_id for tweet_id in ids if tweet_id]
+    return max(ids, key=int) if ids else None
+
+def _save_cursor(conn, keyword, since_id, until_id, pending_newest_id, collection_date):
+    conn.execute('''
+    INSERT INTO twitter_since_ids (keyword, since_id, until_id, pending_newest_id, updated_date)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(keyword) DO UPDATE SET since_id = excluded.since_id, until_id = excluded.until_id,
+        pending_newest_id = excluded.pending_newest_id, updated_date = excluded.updated_date
+    ''', (keyword, since_id, until_id, pending_newest_id, collection_date))
+
+def advance_cursor(conn, keyword, newest_id, collection_date):
+    """ページングを最後まで終えたキーワードの since_id を進める"""
+    since_id, _, pending_newest_id = get_cursor(conn, keyword)
+    _save_cursor(conn, keyword, _newest(since_id, pending_newest_id, newest_id), None, None,
+                 collection_date)
+
+def suspend_cursor(conn, keyword, until_id, newest_id, collection_date):
+    """ページングを途中で打ち切ったキーワードの再開位置を記録（since_id は進めない）"""
+    since_id, _, pending_newest_id = get_cursor(conn, keyword)
+    _save_cursor(conn, keyword, since_id, until_id, _newest(pending_newest_id, newest_id),
+                 collection_date)
+
+def save_tweets(conn, tweets, collection_date):
+    """ツイート（APIのJSON辞書）を保存し、新規件数を返す（既知のIDは無視）"""
+    rows = []
+    for tweet in tweets:
+        public_metrics = tweet.get("public_metrics") or {}
+        rows.append((str(tweet["id"]), tweet.get("text", ""), tweet.get("created_at"),
+                     public_metrics.get("retweet_count"), public_metrics.get("reply_count"),
+                     public_metrics.get("like_count"), public_metrics.get("quote_count"),
+                     collection_date))
+    
+    # rowcount は全文検索トリガーによる変更を含まない（total_changes は含む）
+    inserted = conn.executemany('''
+    INSERT OR IGNORE INTO tweets (tweet_id, text, created_at, retweet_count, reply_count,
+                                  like_count, quote_count, collection_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows).rowcount
+    metrics.inc("beauty_twitter_tweets_inserted_total", inserted)
+    metrics.inc("beauty_twitter_tweets_duplicate_total", len(rows) - inserted)
+    return inserted
+
+def link_tweets(conn, keyword, tweets):
+    """キーワードとツイートを紐付け、新たに紐付いた件数を返す"""
+    # total_changes はトリガーによる変更も数えるため、INSERT 自体の rowcount を使う
+    return conn.executemany("INSERT OR IGNORE INTO keyword_tweets (keyword, tweet_id) VALUES (?, ?)",
+                            [(keyword, str(tweet["id"])) for tweet in tweets]).rowcount
+
+def _collect_batch(client, conn, batch, reserved_requests, collection_date):
+    """OR結合クエリ1つ分を収集し、キーワード別の新規件数を返す
+
+    since_id はページングを最後まで終えてから進める。クォータ（またはページ数の上限）で打ち切った場合は
+    取得できた最も古いIDを再開位置として記録し、次回はそこから古い分を取得する。
+    """
+    new_counts = {keyword: 0 for keyword in batch.keywords}
+    newest_id = None
+    oldest_id = None
+    next_token = None
+    pages = 0
+    
+    while True:
+        payload = client.search(batch.query, since_id=batch.since_id, until_id=batch.until_id,
+                                next_token=next_token)
+        meta = payload.get("meta") or {}
+        tweets = payload.get("data") or []
+        pages += 1
+        
+        # 最新IDは1ページ目のmetaに含まれる
+        if newest_id is None:
+            newest_id = meta.get("newest_id")
+        oldest_id = meta.get("oldest_id") or oldest_id
+        
+        # ツイートを保存し、本文に含まれるキーワードに振り分ける
+        attributed = attribute_tweets(tweets, batch.keywords)
+        with metrics.timer("beauty_twitter_db_seconds", operation="insert"):
+            save_tweets(conn, tweets, collection_date)
+            for keyword, matched in attributed.items():
+                new_counts[keyword] += link_tweets(conn, keyword, matched)
+            conn.commit()
+        
+        # 残りのクエリ分のクォータを確保したうえで、余裕がある間は次ページを取得
+        next_token = meta.get("next_token")
+        if (not next_token or (TWITTER_MAX_PAGES and pages >= TWITTER_MAX_PAGES)
+                or not client.rate_limit.has_spare(reserved_requests)):
+            break
+    
+    for keyword in batch.keywords:
+        if next_token and oldest_id:
+            suspend_cursor(conn, keyword, oldest_id, newest_id, collection_date)
+        else:
+            advance_cursor(conn, keyword, newest_id, collection_date)
+    if next_token:
+        metrics.inc("beauty_twitter_queries_suspended_total")
+    conn.commit()
+    return new_counts
+
 # X/Twitter APIでのデータ収集
-def collect_twitter_data():
+def collect_twitter_data(keywords=None, client=None, raise_errors=False):
+    """キーワードのツイートを収集（raise_errors=True ならエラーを表示せず送出する）"""
+    with metrics.run("twitter"):
+        _collect_twitter_data(keywords, client, raise_errors)
+
+def _collect_twitter_data(keywords, client, raise_errors=False):
     print("X/Twitterからデータ収集開始...")
     
+    if keywords is None:
+        keywords = beauty_keywords
+    
     try:
-        # Twitter API v2クライアントの設定
-        client = tweepy.Client(
-            bearer_token=TWITTER_BEARER_TOKEN,
-            consumer_key=TWITTER_API_KEY, 
-            consumer_secret=TWITTER_API_SECRET,
-            access_token=TWITTER_ACCESS_TOKEN, 
-            access_token_secret=TWITTER_ACCESS_SECRET
-        )
+        # Twitter API v2 recent search クライアント（レート制限ヘッダーに従って待機）
+        if client is None:
+            client = RecentSearchClient(TWITTER_BEARER_TOKEN)
         
         conn = setup_database()
         cursor = conn.cursor()
         collection_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        for keyword in beauty_keywords:
+        # キーワードをOR結合したクエリにまとめる（前回以降の新しいツイートのみ取得。
+        # 前回ページングを打ち切ったキーワードは、その続きから取得する）
+        cursors = {keyword: get_cursor(conn, keyword) for keyword in keywords}
+        batches = plan_queries(keywords, {keyword: cursor[0] for keyword, cursor in cursors.items()},
+                               {keyword: cursor[1] for keyword, cursor in cursors.items()})
+        print(f"{len(keywords)}個のキーワードを{len(batches)}件のクエリにまとめました")
+        
+        for i, batch in enumerate(batches):
             try:
-                # 各キーワードで検索（最新100件）
-                tweets = client.search_recent_tweets(
-                    query=f"{keyword} -is:retweet", 
-                    max_results=100,
-                    tweet_fields=["created_at", "public_metrics"]
-                )
-                
-                if not tweets.data:
-                    continue
-                    
-                # ツイートテキストを集める
-                tweets_text = []
-                tweet_count = 0
+                new_counts = _collect_batch(client, conn, batch, len(batches) - i - 1,
+                                            collection_date)
                 
-                for tweet in tweets.data:
-                    tweets_text.append(tweet.text)
-                    tweet_count += 1
-                
-                # DBに保存
-                cursor.execute('''
+                # キーワード別の収集件数を記録（本文は tweets テーブルに保存）
+                cursor.executemany('''
                 INSERT INTO twitter_trends (keyword, tweet_count, tweets_text, collection_date)
                 VALUES (?, ?, ?, ?)
-                ''', (keyword, tweet_count, json.dumps(tweets_text, ensure_ascii=False), collection_date))
-                
-                print(f"キーワード '{keyword}' について {tweet_count} 件のツイートを収集")
+                ''', [(keyword, count, None, collection_date)
+                      for keyword, count in new_counts.items() if count])
+                conn.commit()
                 
-                # API制限に配慮して待機
-                time.sleep(3)
+                for keyword, count in new_counts.items():
+                    if count:
+                        print(f"キーワード '{keyword}' について {count} 件の新規ツイートを収集")
                 
             except Exception as e:
-                print(f"Twitter API エラー (キーワード: {keyword}): {e}")
+                metrics.inc("beauty_twitter_query_errors_total")
+                if raise_errors:
+                    raise
+                print(f"Twitter API エラー (クエリ: {batch.query}): {e}")
         
         conn.commit()
-        conn.close()
         print("X/Twitterデータ収集完了")
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Twitter API 認証/接続エラー: {e}")
 
 # Instagram非公式APIでのハッシュタグデータ収集（ダミー実装）
@@ -127,25 +208,26 @@ def collect_instagram_data():
 
 # 収集したデータの分析（例）
 def analyze_trends():
-    conn = sqlite3.connect('beauty_trends.db')
+    conn = setup_database()
     cursor = conn.cursor()
     
     # 過去24時間で最も言及された美容キーワードトップ10
+    # collection_date はローカル時刻の文字列なので、同じ形式の境界と比較する（インデックスを使う）
+    since = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
     cursor.execute('''
-    SELECT keyword, SUM(tweet_count) as total_count
-    FROM twitter_trends
-    WHERE collection_date >= datetime('now', '-1 day')
-    GROUP BY keyword
+    SELECT kt.keyword, COUNT(*) as total_count
+    FROM tweets t
+    JOIN keyword_tweets kt ON kt.tweet_id = t.tweet_id
+    WHERE t.collection_date >= ?
+    GROUP BY kt.keyword
     ORDER BY total_count DESC
     LIMIT 10
-    ''')
+    ''', (since,))
     
     results = cursor.fetchall()
     print("\n--- 過去24時間の美容トップトレンド (X/Twitter) ---")
     for i, (keyword, count) in enumerate(results, 1):
         print(f"{i}. {keyword}: {count}ツイート")
-    
-    conn.close()
 
 if __name__ == "__main__":
     print("美容キーワードAPI検索システム 開始")
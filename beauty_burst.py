@@ -0,0 +1,284 @@
+import datetime
+import threading
+from collections import defaultdict
+import numpy as np
+from beauty_term_counts import hour_bucket
+
+# バースト検出の設定
+BURST_BASELINE_HOURS = 7 * 24   # 直近の期間と比べるベースラインの長さ（時間）
+BURST_MIN_COUNT = 5             # 直近の期間の出現回数がこれ未満の単語は対象外
+BURST_PRIOR_VARIANCE = 1.0      # 分散に加える事前値（ベースラインのない単語のスコアが発散しないように）
+BURST_MIN_SCORE = 0.0           # これ以下（ベースライン以下）の単語はトレンドにしない
+BURST_STREAMS = ('rss', 'twitter')
+# キャッシュ（単語×時間の行列）で計算する期間の上限（時間）。これより長い期間はDBで集計しながら読み流す
+BURST_CACHE_MAX_HOURS = 24 + BURST_BASELINE_HOURS
+BURST_CHUNK_SIZE = 5000         # DBから一度に読み込む行数
+
+
+class HourlyCountCache:
+    """時間別集計をバケットごとに (単語番号の配列, 回数の配列) で保持する
+
+    term_count_buckets の版で前回以降に更新されたバケットを調べ、そのバケットだけを読み直す。
+    2回目以降の計算でDBから読むのは新しく集計された時間の分だけになる
+    （別のプロセスが集計を更新した場合も版で検出できる）。
+    """
+
+    def __init__(self, streams=BURST_STREAMS):
+        self.streams = tuple(streams)
+        self.vocabulary = {}    # 単語 -> 番号
+        self.terms = []         # 番号 -> 単語
+        self.hours = {}         # バケット -> (単語番号の配列, 回数の配列)
+        self.version = None
+        self.start = None
+        self._lock = threading.Lock()
+
+    def _term_ids(self, terms):
+        """単語の列を番号の配列に変換（辞書を引くのは単語の種類数だけ）"""
+        unique, inverse = np.unique(np.array(terms, dtype=object), return_inverse=True)
+        ids = np.empty(len(unique), dtype=np.int64)
+        for i, term in enumerate(unique):
+            ids[i] = self.vocabulary.setdefault(term, len(self.vocabulary))
+            if ids[i] == len(self.terms):
+                self.terms.append(term)
+        return ids[inverse]
+
+    def _load(self, conn, where, params, chunk_size=BURST_CHUNK_SIZE):
+        placeholders = ",".join("?" * len(self.streams))
+        cursor = conn.cursor()
+        cursor.execute(f'''
+        SELECT bucket, term, SUM(count) FROM term_counts_hourly
+        WHERE stream IN ({placeholders}) AND {where}
+        GROUP BY bucket, term
+        ORDER BY bucket
+        ''', list(self.streams) + params)
+        # チャンクごとに配列へ変換する（行のタプルを全件メモリに載せない）
+        parts = defaultdict(list)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            buckets, terms, counts = zip(*rows)
+            ids = self._term_ids(terms)
+            counts = np.array(counts, dtype=np.float64)
+            buckets = np.array(buckets, dtype=object)
+            # バケットの境目で分割（チャンクの境目をまたぐバケットは後で連結する）
+            bounds = np.concatenate(([0], np.flatnonzero(buckets[1:] != buckets[:-1]) + 1, [len(buckets)]))
+            for begin, end in zip(bounds[:-1], bounds[1:]):
+                parts[buckets[begin]].append((ids[begin:end], counts[begin:end]))
+        for bucket, chunks in parts.items():
+            if len(chunks) == 1:
+                self.hours[bucket] = chunks[0]
+            else:
+                self.hours[bucket] = (np.concatenate([ids for ids, _ in chunks]),
+                                      np.concatenate([counts for _, counts in chunks]))
+
+    def _compact(self):
+        """期間外になった単語を語彙から除き、番号を詰め直す（常駐プロセスで語彙が増え続けないように）"""
+        if not self.hours:
+            self.vocabulary, self.terms = {}, []
+            return
+        active = np.unique(np.concatenate([ids for ids, _ in self.hours.values()]))
+        if len(self.terms) <= 2 * len(active) + 10000:
+            return
+        position = np.full(len(self.terms), -1, dtype=np.int64)
+        position[active] = np.arange(len(active))
+        self.terms = [self.terms[i] for i in active]
+        self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        self.hours = {bucket: (position[ids], counts) for bucket, (ids, counts) in self.hours.items()}
+
+    def refresh(self, conn, start):
+        """start 以降のバケットを最新の状態にする"""
+        with self._lock:
+            # 版と集計を同じスナップショットから読む
+            began = not conn.in_transaction
+            if began:
+                conn.execute("BEGIN")
+            try:
+                version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM term_count_buckets").fetchone()[0]
+                if self.version is None or start < self.start:
+                    self.hours = {}
+                    self._load(conn, "bucket >= ?", [start])
+                elif version > self.version:
+                    changed = [bucket for (bucket,) in conn.execute('''
+                    SELECT bucket FROM term_count_buckets WHERE version > ? AND bucket >= ?
+                    ''', (self.version, start))]
+                    for bucket in changed:
+                        self.hours.pop(bucket, None)
+                    # SQLiteのパラメータ数上限を考慮して分割
+                    for i in range(0, len(changed), 500):
+                        chunk = changed[i:i + 500]
+                        self._load(conn, f"bucket IN ({','.join('?' * len(chunk))})", chunk)
+                self.version = version
+                self.start = start
+            finally:
+                if began:
+                    conn.commit()
+            for bucket in [bucket for bucket in self.hours if bucket < start]:
+                del self.hours[bucket]
+            self._compact()
+
+    def matrix(self, start, now, recent_start, min_count=BURST_MIN_COUNT):
+        """単語×時間のカウント行列を作る
+
+        戻り値は (単語の配列, 行列, 直近の期間の列数, ベースラインの開始列)。
+        列は start からの1時間単位で、最後の列が現在の時間。
+        直近の期間に min_count 回以上出現した単語だけを行にする（行列の大きさを候補の数に抑える）。
+        集計を始める前の時間はベースラインに含めない。
+        """
+        first_hour = np.datetime64(start, 'h')
+        columns = int((np.datetime64(hour_bucket(now), 'h') - first_hour).astype(np.int64)) + 1
+        recent_columns = columns - int((np.datetime64(recent_start, 'h') - first_hour).astype(np.int64))
+        with self._lock:
+            keys = sorted(bucket for bucket in self.hours if bucket >= start)
+            if not keys:
+                return np.array([], dtype=object), np.zeros((0, columns)), recent_columns, 0
+            ids = np.concatenate([self.hours[bucket][0] for bucket in keys])
+            counts = np.concatenate([self.hours[bucket][1] for bucket in keys])
+            offsets = (np.array(keys, dtype='datetime64[h]') - first_hour).astype(np.int64)
+            cols = np.repeat(offsets, [len(self.hours[bucket][0]) for bucket in keys])
+            terms = np.array(self.terms, dtype=object)
+
+        # 直近の期間の出現回数で候補を絞り、候補の行だけの密な行列にする
+        in_recent = cols >= columns - recent_columns
+        recent = np.bincount(ids[in_recent], weights=counts[in_recent], minlength=len(terms))
+        candidates = np.flatnonzero(recent >= min_count)
+        position = np.full(len(terms), -1, dtype=np.int64)
+        position[candidates] = np.arange(len(candidates))
+        rows = position[ids]
+        keep = rows >= 0
+        matrix = np.zeros((len(candidates), columns))
+        matrix[rows[keep], cols[keep]] = counts[keep]
+        return terms[candidates], matrix, recent_columns, max(0, int(offsets.min()))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_count_cache(conn, streams=BURST_STREAMS):
+    """DBファイルとストリームごとにプロセス内で共有するキャッシュ"""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    key = (path, tuple(streams))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = HourlyCountCache(streams)
+        return cache
+
+
+def _zscores(recent, mean, variance, recent_columns):
+    """直近の出現回数と1時間あたりの平均・分散からスコアを計算"""
+    expected = mean * recent_columns
+    return (recent - expected) / np.sqrt(variance * recent_columns + BURST_PRIOR_VARIANCE)
+
+
+def burst_scores(matrix, recent_columns, baseline_start=0):
+    """直近の期間の合計が、それ以前の1時間あたりの平均・分散から見てどれだけ多いか（zスコア）を全単語まとめて計算
+
+    期待値は 平均×時間数、分散は max(分散, 平均)×時間数（ポアソン分布を下限とする）に事前値を足したもの。
+    ベースラインがない場合は期待値0となり、スコアは出現回数の順になる。
+    戻り値は (直近の出現回数, スコア)。
+    """
+    recent = matrix[:, -recent_columns:].sum(axis=1)
+    baseline = matrix[:, baseline_start:-recent_columns]
+    if baseline.shape[1]:
+        mean = baseline.mean(axis=1)
+        variance = np.maximum(baseline.var(axis=1), mean)
+    else:
+        mean = variance = np.zeros(len(matrix))
+    return recent, _zscores(recent, mean, variance, recent_columns)
+
+
+def top_k(scores, k, min_score=BURST_MIN_SCORE):
+    """スコアが min_score を超える上位 k 件の添字（スコアの高い順）
+
+    全体を並べ替えず、argpartition で上位 k 件を選んでから k 件だけを並べ替える。
+    """
+    candidates = np.flatnonzero(scores > min_score)
+    k = min(k, len(candidates))
+    if k == 0:
+        return candidates[:0]
+    selected = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return selected[np.argsort(-scores[selected], kind="stable")]
+
+
+def _hours_between(start, end):
+    """'YYYY-MM-DD HH:00:00' 形式のバケット間の時間数"""
+    return int((np.datetime64(end, 'h') - np.datetime64(start, 'h')).astype(np.int64))
+
+
+def stream_bursts(conn, start, now, recent_start, k, min_count=BURST_MIN_COUNT, streams=BURST_STREAMS,
+                  chunk_size=BURST_CHUNK_SIZE):
+    """単語×時間の行列を作らずに、単語ごとの合計・二乗和をDBで集計して上位 k 件を選ぶ
+
+    ベースラインの平均・分散は (合計, 二乗和, 時間数) から求まるため、単語ごとに1行を読み流せばよい。
+    メモリに保持するのはチャンク1つ分と上位 k 件だけで、期間の長さによらない。
+    """
+    placeholders = ",".join("?" * len(streams))
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    SELECT MIN(bucket) FROM term_counts_hourly WHERE stream IN ({placeholders}) AND bucket >= ?
+    ''', list(streams) + [start])
+    first = cursor.fetchone()[0]
+    if first is None:
+        return []
+    # 集計を始める前の時間はベースラインに含めない
+    baseline_columns = max(0, _hours_between(max(first, start), recent_start))
+    recent_columns = _hours_between(recent_start, hour_bucket(now)) + 1
+
+    cursor.execute(f'''
+    SELECT term,
+           SUM(CASE WHEN bucket >= ? THEN total ELSE 0 END) AS recent,
+           SUM(CASE WHEN bucket < ? THEN total ELSE 0 END),
+           SUM(CASE WHEN bucket < ? THEN total * total ELSE 0 END)
+    FROM (
+        SELECT bucket, term, SUM(count) AS total FROM term_counts_hourly
+        WHERE stream IN ({placeholders}) AND bucket >= ?
+        GROUP BY bucket, term
+    )
+    GROUP BY term
+    HAVING recent >= ?
+    ''', [recent_start] * 3 + list(streams) + [start, min_count])
+
+    best_terms = np.array([], dtype=object)
+    best_recent = best_scores = np.array([])
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        terms, recent, total, squares = zip(*rows)
+        recent = np.array(recent, dtype=np.float64)
+        if baseline_columns:
+            mean = np.array(total, dtype=np.float64) / baseline_columns
+            variance = np.maximum(np.array(squares, dtype=np.float64) / baseline_columns - mean ** 2, mean)
+        else:
+            mean = variance = np.zeros(len(rows))
+        # これまでの上位 k 件とチャンクを合わせて上位 k 件だけを残す
+        best_terms = np.concatenate((best_terms, np.array(terms, dtype=object)))
+        best_recent = np.concatenate((best_recent, recent))
+        best_scores = np.concatenate((best_scores, _zscores(recent, mean, variance, recent_columns)))
+        selected = top_k(best_scores, k)
+        best_terms, best_recent, best_scores = best_terms[selected], best_recent[selected], best_scores[selected]
+    return [(best_terms[i], int(best_recent[i]), round(float(best_scores[i]), 2)) for i in range(len(best_terms))]
+
+
+def score_bursts(conn, hours=24, k=20, baseline_hours=BURST_BASELINE_HOURS, min_count=BURST_MIN_COUNT,
+                 streams=BURST_STREAMS, now=None):
+    """直近 hours 時間に急増した単語の上位 k 件を [(単語, 出現回数, スコア)] で返す
+
+    期間（hours + baseline_hours）が BURST_CACHE_MAX_HOURS 以内なら単語×時間の集計をプロセス内に保持して
+    更新された時間だけを読み直す。それより長い期間は stream_bursts で読み流し、メモリ使用量を一定に保つ。
+    """
+    now = now or datetime.datetime.now()
+    start = hour_bucket(now - datetime.timedelta(hours=hours + baseline_hours))
+    recent_start = hour_bucket(now - datetime.timedelta(hours=hours))
+    if hours + baseline_hours > BURST_CACHE_MAX_HOURS:
+        return stream_bursts(conn, start, now, recent_start, k, min_count, streams)
+
+    cache = get_count_cache(conn, streams)
+    cache.refresh(conn, start)
+    terms, matrix, recent_columns, baseline_start = cache.matrix(start, now, recent_start, min_count)
+    if not len(terms):
+        return []
+    recent, scores = burst_scores(matrix, recent_columns, baseline_start)
+    return [(terms[i], int(recent[i]), round(float(scores[i]), 2)) for i in top_k(scores, k)]
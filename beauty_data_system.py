@@ -1,12 +1,10 @@
 #!/usr/bin/env python3
 import os
 import sys
-import time
 import logging
 import datetime
+import argparse
 import subprocess
-import schedule
-from dotenv import load_dotenv
 
 # ロギング設定
 logging.basicConfig(
@@ -19,17 +17,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger("BeautyDataSystem")
 
-# 環境変数の読み込み
-load_dotenv()
+# 環境変数の読み込み（install-deps は python-dotenv のインストール前にも実行できるようにする）
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    logger.warning("python-dotenv がインストールされていないため .env を読み込みません")
+else:
+    load_dotenv()
+
+# スケジュール設定
+HOUR = 60 * 60
+JOB_JITTER = 5 * 60  # 次回実行時刻に加える揺らぎの最大値（秒）
 
 # 設定確認
 def check_environment():
     """環境設定の確認"""
+    # recent search はアプリのBearerトークンだけで認証する
     required_vars = [
-        "TWITTER_API_KEY",
-        "TWITTER_API_SECRET", 
-        "TWITTER_ACCESS_TOKEN",
-        "TWITTER_ACCESS_SECRET",
         "TWITTER_BEARER_TOKEN"
     ]
     
@@ -45,7 +49,7 @@ def check_environment():
     
     return True
 
-# 依存関係のインストール
+# 依存関係のインストール（実行時には行わない。`install-deps` サブコマンドで明示的に実行）
 def install_dependencies():
     """必要なパッケージのインストール"""
     try:
@@ -56,36 +60,18 @@ def install_dependencies():
         logger.error(f"依存関係のインストールに失敗しました: {e}")
         return False
 
-# requirements.txtファイルの作成
-def create_requirements():
-    """requirements.txtファイルの作成"""
-    requirements = [
-        "feedparser",
-        "pandas",
-        "beautifulsoup4",
-        "requests",
-        "tweepy",
-        "schedule",
-        "matplotlib",
-        "seaborn",
-        "nltk",
-        "python-dotenv"
-    ]
-    
-    with open("requirements.txt", "w") as f:
-        for req in requirements:
-            f.write(f"{req}\n")
-    
-    logger.info("requirements.txtファイルを作成しました")
-
 # RSSフィード収集の実行
-def run_rss_collector():
-    """RSSフィード収集システムの実行"""
+def run_rss_collector(due_only=False):
+    """RSSフィード収集システムの実行（due_only=True なら取得予定時刻を過ぎたフィードだけ）"""
     try:
         logger.info("RSSフィード収集システムを実行します")
         from beauty_rss_collector import fetch_rss_feeds, export_to_csv
-        new_entries = fetch_rss_feeds()
-        export_to_csv()
+        from beauty_export import export_new_articles
+        new_entries = fetch_rss_feeds(due_only=due_only)
+        # 新着がなければエクスポートは前回のまま
+        if new_entries or not due_only:
+            export_to_csv()
+            export_new_articles()
         logger.info(f"RSSフィード収集完了: {new_entries}件の新規記事")
         return True
     except Exception as e:
@@ -107,19 +93,220 @@ def run_api_collector():
         return False
 
 # トレンド監視の実行
-def run_trend_monitor():
-    """トレンド監視システムの更新実行"""
+def run_trend_monitor(hours=None, monitor=None, wait_for_charts=True):
+    """トレンド監視システムの更新実行（hours を省略すると既定の期間）
+
+    常駐モードでは monitor を使い回し、グラフの描画はバックグラウンドに任せて待たない。
+    1回だけ実行する場合は、プロセスの終了前に描画が終わるよう待つ。
+    """
     try:
         logger.info("トレンド監視システムを実行します")
-        from beauty_trend_monitor import BeautyTrendMonitor
-        monitor = BeautyTrendMonitor()
-        trends = monitor.update_trends()
+        from beauty_trend_monitor import BeautyTrendMonitor, TREND_WINDOW_HOURS
+        monitor = monitor or BeautyTrendMonitor()
+        trends = monitor.update_trends(hours or TREND_WINDOW_HOURS)
+        if wait_for_charts:
+            monitor.renderer.wait()
         logger.info(f"トレンド監視完了: {len(trends)}個のトレンドを検出")
         return True
     except Exception as e:
         logger.error(f"トレンド監視エラー: {e}")
         return False
 
+# 全文検索
+def run_search(query, tweets=False, since=None, until=None, source=None, limit=20, facets=False):
+    """記事（またはツイート）を全文検索して結果を表示"""
+    from beauty_storage import get_connection, FEEDS_DB, TRENDS_DB
+    from beauty_search import (setup_article_search, setup_tweet_search, search_articles,
+                               search_tweets, article_source_facets)
+    
+    db_path, table = (TRENDS_DB, 'tweets') if tweets else (FEEDS_DB, 'beauty_articles')
+    conn = get_connection(db_path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone():
+            logger.error(f"{db_path} にデータがありません。先に収集を実行してください")
+            return False
+        
+        if tweets:
+            setup_tweet_search(conn)
+            results = search_tweets(conn, query, since, until, limit)
+            for i, tweet in enumerate(results, 1):
+                print(f"[{i}] {tweet['created_at']}  ♥{tweet['like_count']}  {tweet['text']}")
+        else:
+            setup_article_search(conn)
+            results = search_articles(conn, query, since, until, source, limit)
+            for i, article in enumerate(results, 1):
+                print(f"[{i}] {article['added_date']}  {article['source']}  {article['title']}")
+                print(f"    {article['snippet']}")
+                print(f"    {article['link']}")
+            if facets:
+                counts = article_source_facets(conn, query, since, until)
+                print("ソース別件数: " + ", ".join(f"{name} {count}" for name, count in counts))
+        print(f"{len(results)}件")
+        return True
+    except ValueError as e:
+        logger.error(f"検索エラー: {e}")
+        return False
+
+# フィードの状態
+def run_feed_health(problems_only=False):
+    """フィードごとの取得間隔・新着ペース・失敗状態を表示"""
+    from beauty_storage import get_connection, FEEDS_DB
+    from beauty_feed_schedule import setup_feed_schedule, feed_health
+    
+    conn = get_connection(FEEDS_DB)
+    setup_feed_schedule(conn)
+    report = feed_health(conn)
+    if problems_only:
+        report = [entry for entry in report if entry['status'] in ('failing', 'retrying', 'dormant')]
+    if not report:
+        print("対象のフィードはありません")
+        return True
+    
+    def when(timestamp):
+        if not timestamp:
+            return "-"
+        return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+    
+    print(f"{'状態':<9}{'ソース':<20}{'間隔':>7}{'新着/日':>8}  {'次回取得':<17}{'最終成功':<17}{'失敗':>4}")
+    for entry in report:
+        interval = f"{(entry['interval_seconds'] or 0) / 3600:.1f}h"
+        rate = f"{(entry['entry_rate'] or 0) * 24:.1f}" if entry['entry_rate'] is not None else "-"
+        print(f"{entry['status']:<9}{entry['source'][:18]:<20}{interval:>7}{rate:>8}  "
+              f"{when(entry['next_poll']):<17}{when(entry['last_success']):<17}"
+              f"{entry['consecutive_failures']:>4}")
+        if entry['consecutive_failures'] and entry['last_error']:
+            print(f"    {entry['last_error']}")
+    failing = sum(1 for entry in report if entry['status'] == 'failing')
+    print(f"{len(report)}件（failing {failing}件）")
+    return failing == 0
+
+# 近似重複の記事
+def run_duplicates(limit=10):
+    """件数の多い近似重複クラスタと、その記事を表示"""
+    from beauty_storage import get_connection, FEEDS_DB
+    from beauty_dedup import setup_dedup_tables, largest_clusters, cluster_members
+    
+    conn = get_connection(FEEDS_DB)
+    setup_dedup_tables(conn)
+    clusters = largest_clusters(conn, limit)
+    if not clusters:
+        print("近似重複の記事はありません")
+        return True
+    for cluster_id, size in clusters:
+        print(f"クラスタ {cluster_id}（{size}件）")
+        for article_id, title, link, source, similarity in cluster_members(conn, cluster_id):
+            score = f"{similarity:.2f}" if similarity is not None else "代表"
+            print(f"  [{score:>4}] {source}: {title}")
+            print(f"         {link}")
+    return True
+
+# トレンドの推移
+def run_trend_history(term, days=30, resolution="day"):
+    """時系列ストアから単語の推移を表示"""
+    from beauty_storage import get_connection, TRENDS_DB
+    from beauty_trend_store import setup_trend_store, term_history
+    
+    conn = get_connection(TRENDS_DB)
+    setup_trend_store(conn)
+    history = term_history(conn, term, days, resolution)
+    if not history:
+        print(f"'{term}' は過去{days}日間のトレンドに含まれていません")
+        return True
+    peak = max(count for _, count in history)
+    for timestamp, count in history:
+        bar = "#" * max(1, round(count / peak * 40))
+        print(f"{timestamp}  {count:>6}  {bar}")
+    return True
+
+# 作業キュー（複数のワーカープロセス・ホストで収集を分担）
+QUEUE_KINDS = ("rss", "twitter")
+
+def _collection_handlers():
+    """作業の種類ごとの処理（ワーカープロセス内で読み込む）"""
+    from beauty_rss_collector import collect_feed
+    from beauty_api_collector import collect_twitter_data
+    
+    def collect_keywords(payload):
+        collect_twitter_data(payload["keywords"], raise_errors=True)
+    
+    return {"rss": collect_feed, "twitter": collect_keywords}
+
+def run_enqueue(kinds=QUEUE_KINDS, all_feeds=False):
+    """収集作業を作業キューに追加
+
+    RSSは取得予定時刻を過ぎたフィードを1件ずつ、Twitterは検索クエリ（OR結合したキーワード）単位で追加する。
+    未完了の同じ作業がキューに残っていれば追加しない。
+    """
+    from beauty_work_queue import get_queue
+    queue = get_queue()
+    added = {kind: 0 for kind in kinds}
+    
+    if "rss" in kinds:
+        from beauty_rss_collector import beauty_feeds, setup_database
+        from beauty_feed_schedule import load_schedule, due_feeds
+        feeds = beauty_feeds if all_feeds else due_feeds(beauty_feeds, load_schedule(setup_database()))
+        for feed in feeds:
+            # 取得の失敗はフィードごとのバックオフで再試行するため、キューでは再試行しない
+            added["rss"] += queue.enqueue("rss", feed["url"], feed, max_attempts=1)
+    
+    if "twitter" in kinds:
+        from beauty_api_collector import beauty_keywords
+        from beauty_twitter_planner import plan_queries
+        # since_id は実行時に読み直すため、キューにはキーワードだけを入れる
+        for batch in plan_queries(beauty_keywords):
+            added["twitter"] += queue.enqueue("twitter", batch.query, {"keywords": batch.keywords})
+    
+    purged = queue.purge()
+    logger.info("作業キューに追加: " + ", ".join(f"{kind} {count}件" for kind, count in added.items())
+                + (f"（古い作業{purged}件を削除）" if purged else ""))
+    return True
+
+def _worker_process(kinds, exit_when_empty):
+    from beauty_work_queue import get_queue, run_worker
+    try:
+        run_worker(get_queue(), _collection_handlers(), kinds=kinds, exit_when_empty=exit_when_empty)
+    except KeyboardInterrupt:
+        logger.info("ワーカー停止（ユーザー割り込み）")
+
+def run_workers(processes=1, kinds=QUEUE_KINDS, exit_when_empty=False):
+    """作業キューのワーカーを起動（processes > 1 ならプロセスを分けて並列に処理）"""
+    if processes <= 1:
+        _worker_process(kinds, exit_when_empty)
+        return True
+    
+    import multiprocessing
+    workers = [multiprocessing.Process(target=_worker_process, args=(kinds, exit_when_empty),
+                                       name=f"beauty-worker-{i + 1}")
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # 割り込みは各ワーカーにも届くため、終了を待つだけ
+        for worker in workers:
+            worker.join()
+    return all(worker.exitcode == 0 for worker in workers)
+
+def run_queue_status():
+    """作業キューの件数と、失敗が確定した作業を表示"""
+    from beauty_work_queue import get_queue
+    queue = get_queue()
+    stats = queue.stats()
+    if not stats:
+        print("作業キューは空です")
+        return True
+    for kind, status, count in stats:
+        print(f"{kind:<10}{status:<10}{count:>6}")
+    failures = queue.failures()
+    if failures:
+        print("\n失敗した作業:")
+        for kind, key, attempts, error, finished_at in failures:
+            finished = datetime.datetime.fromtimestamp(finished_at).strftime("%Y-%m-%d %H:%M")
+            print(f"  {finished}  {kind}  {key}（{attempts}回）: {error}")
+    return True
+
 # 全システム実行
 def run_all_systems():
     """全サブシステムの実行"""
@@ -139,47 +326,157 @@ def run_all_systems():
     else:
         logger.warning("一部システムの実行に失敗しました")
 
-# メイン処理
-def main():
-    logger.info("美容データ収集システム起動")
-    
-    # 環境のセットアップ
-    create_requirements()
+# 常駐モード
+def run_daemon(metrics_port=None):
+    """スケジューラーで各サブシステムを並行して定期実行"""
+    from beauty_scheduler import JobScheduler
     
     if not check_environment():
         logger.error("環境変数の設定を確認してください")
         sys.exit(1)
     
-    if not install_dependencies():
-        logger.error("依存関係のインストールに失敗しました")
-        sys.exit(1)
+    # メトリクスのHTTPエンドポイント（textfileは各処理の終了時に metrics/ に出力される）
+    if metrics_port:
+        from beauty_metrics import serve_metrics
+        serve_metrics(metrics_port)
     
-    # 初回実行
-    run_all_systems()
+    # 全システム: 毎日0時（依存関係に従い、収集の後にトレンド分析）
+    scheduler = JobScheduler(full_run_at="00:00")
     
-    # スケジュール設定
-    # RSSフィード: 4時間ごと
-    schedule.every(4).hours.do(run_rss_collector)
+    # RSSフィード: 15分ごとに取得予定を確認し、予定時刻を過ぎたフィードだけを取得
+    # （フィードごとの間隔は新着ペースと ttl / sy:updatePeriod から決まり、失敗時はバックオフ）
+    from beauty_feed_schedule import FEED_POLL_TICK
+    scheduler.add_job("rss", lambda: run_rss_collector(due_only=True), FEED_POLL_TICK)
     
     # APIデータ: 2時間ごと
-    schedule.every(2).hours.do(run_api_collector)
+    scheduler.add_job("api", run_api_collector, 2 * HOUR, jitter=JOB_JITTER)
     
-    # トレンド分析: 6時間ごと
-    schedule.every(6).hours.do(run_trend_monitor)
-    
-    # 全システム: 毎日0時
-    schedule.every().day.at("00:00").do(run_all_systems)
+    # トレンド分析: 6時間ごと（収集ジョブの実行中は待機）
+    # 描画のワーカーは常駐中に1つだけ使い、ジョブは描画の終了を待たない
+    from beauty_trend_monitor import BeautyTrendMonitor
+    trend_monitor = BeautyTrendMonitor()
+    scheduler.add_job("trends", lambda: run_trend_monitor(monitor=trend_monitor, wait_for_charts=False),
+                      6 * HOUR, depends_on=["rss", "api"], jitter=JOB_JITTER)
     
     logger.info("スケジュール設定完了。システム実行中...")
     
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        # 前回実行から間隔が空いたジョブ（初回起動時は全ジョブ）はすぐに実行される
+        scheduler.run_forever()
     except KeyboardInterrupt:
         logger.info("システム停止（ユーザー割り込み）")
     except Exception as e:
         logger.error(f"予期せぬエラー: {e}")
 
+def build_parser():
+    """コマンドライン引数の定義"""
+    parser = argparse.ArgumentParser(
+        prog="beauty_data_system.py",
+        description="美容データ収集システム（サブコマンド省略時は daemon）",
+    )
+    # メトリクスのポートは環境変数 BEAUTY_METRICS_PORT でも指定できる（サブコマンド省略時も有効）
+    metrics_port = int(os.getenv("BEAUTY_METRICS_PORT", 0)) or None
+    parser.set_defaults(metrics_port=metrics_port)
+    subparsers = parser.add_subparsers(dest="command")
+    rss_parser = subparsers.add_parser("collect-rss", help="RSSフィードを1回収集")
+    rss_parser.add_argument("--due", action="store_true", help="取得予定時刻を過ぎたフィードだけを取得")
+    subparsers.add_parser("collect-api", help="X/Twitter APIからデータを1回収集")
+    trends_parser = subparsers.add_parser("trends", help="トレンド分析を1回実行")
+    trends_parser.add_argument("--hours", type=int,
+                               help="集計期間（時間、既定は24。例: 7日間なら168、30日間なら720）")
+    subparsers.add_parser("all", help="全サブシステムを1回ずつ実行")
+    daemon_parser = subparsers.add_parser("daemon", help="スケジュールに従って常駐実行")
+    daemon_parser.add_argument("--metrics-port", type=int, default=metrics_port,
+                               help="/metrics を公開するポート（127.0.0.1で待ち受け）")
+    export_parser = subparsers.add_parser("export", help="記事をCSV/Parquetにエクスポート")
+    export_parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    export_parser.add_argument("--full", action="store_true", help="差分ではなく全件を1ファイルに出力")
+    search_parser = subparsers.add_parser("search", help="記事・ツイートを全文検索")
+    search_parser.add_argument("query", help="検索語（空白区切りですべてを含むものを検索）")
+    search_parser.add_argument("--tweets", action="store_true", help="記事ではなくツイートを検索")
+    search_parser.add_argument("--since", help="この日時以降（YYYY-MM-DD）")
+    search_parser.add_argument("--until", help="この日時まで（YYYY-MM-DD はその日を含む）")
+    search_parser.add_argument("--source", help="記事のソースで絞り込み")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--facets", action="store_true", help="ソース別の件数も表示")
+    health_parser = subparsers.add_parser("feed-health", help="フィードごとの取得間隔・失敗状態を表示")
+    health_parser.add_argument("--problems", action="store_true",
+                               help="failing / retrying / dormant のフィードだけを表示")
+    enqueue_parser = subparsers.add_parser("enqueue", help="収集作業を作業キューに追加")
+    enqueue_parser.add_argument("--kinds", nargs="+", choices=QUEUE_KINDS, default=list(QUEUE_KINDS))
+    enqueue_parser.add_argument("--all-feeds", action="store_true",
+                                help="取得予定時刻に関係なく全フィードを追加")
+    worker_parser = subparsers.add_parser("worker", help="作業キューから収集作業を取得して実行")
+    worker_parser.add_argument("--processes", type=int, default=1, help="ワーカープロセス数")
+    worker_parser.add_argument("--kinds", nargs="+", choices=QUEUE_KINDS, default=list(QUEUE_KINDS))
+    worker_parser.add_argument("--exit-when-empty", action="store_true", help="キューが空になったら終了")
+    subparsers.add_parser("queue-status", help="作業キューの状態を表示")
+    duplicates_parser = subparsers.add_parser("duplicates", help="近似重複としてまとめた記事を表示")
+    duplicates_parser.add_argument("--limit", type=int, default=10, help="表示するクラスタ数")
+    subparsers.add_parser("compact-reports", help="reports/*.json をトレンド時系列ストアに取り込む")
+    history_parser = subparsers.add_parser("trend-history", help="単語のトレンドの推移を表示")
+    history_parser.add_argument("term", help="単語")
+    history_parser.add_argument("--days", type=int, default=30, help="表示する期間（日）")
+    history_parser.add_argument("--resolution", choices=["raw", "hour", "day"], default="day",
+                                help="集計の粒度（raw は保存した回ごと）")
+    render_parser = subparsers.add_parser("render-trends", help="保存済みのトレンドの推移をまとめて画像に描画")
+    render_parser.add_argument("--limit", type=int, default=100, help="描画する直近の回数")
+    subparsers.add_parser("install-deps", help="requirements.txt の依存関係をインストール")
+    return parser
+
+# メイン処理
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command = args.command or "daemon"
+    logger.info(f"美容データ収集システム起動 ({command})")
+    
+    # 重い依存関係は各サブコマンドの実行時にだけ読み込まれる
+    if command == "install-deps":
+        return 0 if install_dependencies() else 1
+    if command == "collect-rss":
+        return 0 if run_rss_collector(args.due) else 1
+    if command == "collect-api":
+        if not check_environment():
+            return 1
+        return 0 if run_api_collector() else 1
+    if command == "trends":
+        return 0 if run_trend_monitor(args.hours) else 1
+    if command == "export":
+        from beauty_export import export_new_articles, export_all_articles
+        if args.full:
+            export_all_articles(args.format)
+        else:
+            export_new_articles(args.format)
+        return 0
+    if command == "search":
+        return 0 if run_search(args.query, args.tweets, args.since, args.until, args.source,
+                               args.limit, args.facets) else 1
+    if command == "enqueue":
+        return 0 if run_enqueue(args.kinds, args.all_feeds) else 1
+    if command == "worker":
+        return 0 if run_workers(args.processes, args.kinds, args.exit_when_empty) else 1
+    if command == "queue-status":
+        return 0 if run_queue_status() else 1
+    if command == "feed-health":
+        return 0 if run_feed_health(args.problems) else 1
+    if command == "duplicates":
+        return 0 if run_duplicates(args.limit) else 1
+    if command == "compact-reports":
+        from beauty_trend_monitor import BeautyTrendMonitor
+        BeautyTrendMonitor().compact_reports()
+        return 0
+    if command == "trend-history":
+        return 0 if run_trend_history(args.term, args.days, args.resolution) else 1
+    if command == "render-trends":
+        from beauty_trend_monitor import BeautyTrendMonitor
+        filenames = BeautyTrendMonitor().render_history(args.limit)
+        print(f"{len(filenames)}件の画像を保存しました")
+        return 0
+    if command == "all":
+        run_all_systems()
+        return 0
+    run_daemon(args.metrics_port)
+    return 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import hashlib
+import re
+import unicodedata
+import zlib
+import numpy as np
+
+# 近似重複検出の設定
+DEDUP_SHINGLE_SIZE = 5         # 文字n-gramの長さ（分かち書きのない日本語にも使える）
+DEDUP_NUM_PERM = 128           # MinHashの次元数
+DEDUP_BANDS = 16               # LSHのバンド数（バンドあたり8行、類似度0.7前後から候補になる）
+DEDUP_THRESHOLD = 0.7          # 推定Jaccard類似度がこれ以上なら同じ記事とみなす
+DEDUP_MIN_SHINGLES = 10        # これより短いテキストは判定しない（短い見出し同士の誤判定を防ぐ）
+DEDUP_MAX_BUCKET_CANDIDATES = 50  # 1つのバケットから取り出す候補の上限（定型文で膨らんだバケット対策）
+DEDUP_CHUNK_SIZE = 1000        # 未登録の記事を一度に読み込む件数
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def setup_dedup_tables(conn):
+    """記事のMinHashシグネチャとLSHバケットのテーブルを作成（beauty_feeds.db内）"""
+    cursor = conn.cursor()
+    # cluster_id はクラスタ内で最初に登録された記事のid
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS article_minhash (
+        article_id INTEGER PRIMARY KEY,
+        signature BLOB,
+        cluster_id INTEGER,
+        similarity REAL
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_article_minhash_cluster
+    ON article_minhash (cluster_id)
+    ''')
+    # バンドごとのハッシュ値 -> 記事（インデックスで引くため、候補検索は記事数に対して準線形）
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS article_lsh (
+        band INTEGER,
+        bucket INTEGER,
+        article_id INTEGER,
+        PRIMARY KEY (band, bucket, article_id)
+    ) WITHOUT ROWID
+    ''')
+    conn.commit()
+
+
+def shingles(text, size=DEDUP_SHINGLE_SIZE):
+    """正規化したテキストの文字n-gramのハッシュ値の集合"""
+    normalized = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text or "").casefold()).strip()
+    return {zlib.crc32(normalized[i:i + size].encode("utf-8"))
+            for i in range(len(normalized) - size + 1)}
+
+
+class MinHasher:
+    """(a * x + b) mod p の置換族でMinHashシグネチャを計算（シード固定で永続化可能）"""
+
+    def __init__(self, num_perm=DEDUP_NUM_PERM, seed=1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = generator.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        """ハッシュ値の集合からシグネチャ（uint32の配列）を計算"""
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        # (シングル数, 次元数) の行列で一度に計算（uint64のオーバーフローは許容）
+        permuted = (np.outer(values, self._a) + self._b) % np.uint64(_MERSENNE_PRIME)
+        return (permuted & np.uint64(_MAX_HASH)).min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature, bands=DEDUP_BANDS):
+    """シグネチャをバンドに分割し、バンドごとのバケットキー（符号付き64bit整数）を返す"""
+    rows = len(signature) // bands
+    keys = []
+    for band in range(bands):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def estimate_similarity(signature, other):
+    """2つのシグネチャの一致率（Jaccard類似度の推定値）"""
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH による記事の近似重複インデックス（DBに永続化）
+
+    新しい記事はLSHで候補を引き、シグネチャの一致率がしきい値以上の記事があれば
+    その記事のクラスタに入る。なければ自分自身が新しいクラスタの代表になる。
+    """
+
+    def __init__(self, conn, threshold=DEDUP_THRESHOLD, bands=DEDUP_BANDS, hasher=None):
+        self.conn = conn
+        self.threshold = threshold
+        self.bands = bands
+        self.hasher = hasher or MinHasher()
+
+    def candidates(self, keys):
+        """いずれかのバンドでバケットが一致する記事id"""
+        cursor = self.conn.cursor()
+        found = set()
+        for band, bucket in enumerate(keys):
+            cursor.execute('''
+            SELECT article_id FROM article_lsh WHERE band = ? AND bucket = ? LIMIT ?
+            ''', (band, bucket, DEDUP_MAX_BUCKET_CANDIDATES))
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+    def best_match(self, signature, candidate_ids):
+        """候補のうち最も類似度が高い記事の (cluster_id, 類似度)"""
+        best = (None, 0.0)
+        if not candidate_ids:
+            return best
+        cursor = self.conn.cursor()
+        ids = list(candidate_ids)
+        placeholders = ",".join("?" * len(ids))
+        cursor.execute(f'''
+        SELECT cluster_id, signature FROM article_minhash WHERE article_id IN ({placeholders})
+        ''', ids)
+        for cluster_id, blob in cursor.fetchall():
+            similarity = estimate_similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if similarity > best[1]:
+                best = (cluster_id, similarity)
+        return best
+
+    def add(self, article_id, text):
+        """記事を登録し、所属するクラスタのidを返す（呼び出し側でコミットする）"""
+        hashes = shingles(text)
+        if len(hashes) < DEDUP_MIN_SHINGLES:
+            # 短すぎるテキストは判定せず単独のクラスタにする
+            self.conn.execute('''
+            INSERT OR REPLACE INTO article_minhash (article_id, signature, cluster_id, similarity)
+            VALUES (?, NULL, ?, NULL)
+            ''', (article_id, article_id))
+            return article_id
+
+        signature = self.hasher.signature(hashes)
+        keys = band_keys(signature, self.bands)
+        cluster_id, similarity = self.best_match(signature, self.candidates(keys))
+        if cluster_id is None or similarity < self.threshold:
+            cluster_id, similarity = article_id, None
+
+        self.conn.execute('''
+        INSERT OR REPLACE INTO article_minhash (article_id, signature, cluster_id, similarity)
+        VALUES (?, ?, ?, ?)
+        ''', (article_id, signature.tobytes(), cluster_id, similarity))
+        self.conn.executemany('''
+        INSERT OR IGNORE INTO article_lsh (band, bucket, article_id) VALUES (?, ?, ?)
+        ''', [(band, bucket, article_id) for band, bucket in enumerate(keys)])
+        return cluster_id
+
+
+def indexed_position(conn):
+    """インデックスに登録済みの最大の記事id"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(article_id), 0) FROM article_minhash")
+    return cursor.fetchone()[0]
+
+
+def index_new_articles(conn, chunk_size=DEDUP_CHUNK_SIZE):
+    """未登録の記事をid順にインデックスに追加し、(登録件数, 重複件数) を返す
+
+    収集のたびに呼び出して差分だけを登録する。初回は既存の全記事が登録される。
+    複数のプロセスから同時に呼ばれても同じ記事を二重に登録しないよう、
+    チャンクごとに書き込みロックを取ってから未登録の位置を確認する。
+    """
+    setup_dedup_tables(conn)
+    index = NearDuplicateIndex(conn)
+
+    indexed = duplicates = 0
+    while True:
+        # チャンク単位でコミット（途中で止まっても次回は続きから登録される）
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT id, title, summary FROM beauty_articles WHERE id > ? ORDER BY id LIMIT ?
+            ''', (indexed_position(conn), chunk_size))
+            rows = cursor.fetchall()
+            for article_id, title, summary in rows:
+                if index.add(article_id, f"{title or ''} {summary or ''}") != article_id:
+                    duplicates += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if not rows:
+            break
+        indexed += len(rows)
+    return indexed, duplicates
+
+
+def cluster_members(conn, cluster_id):
+    """クラスタに属する記事（代表の記事を含む）"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT a.id, a.title, a.link, a.source, m.similarity
+    FROM article_minhash m
+    JOIN beauty_articles a ON a.id = m.article_id
+    WHERE m.cluster_id = ?
+    ORDER BY a.id
+    ''', (cluster_id,))
+    return cursor.fetchall()
+
+
+def largest_clusters(conn, limit=10):
+    """2件以上の記事を含むクラスタの (cluster_id, 件数)（件数の多い順）"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT cluster_id, COUNT(*) AS size FROM article_minhash
+    GROUP BY cluster_id HAVING size > 1
+    ORDER BY size DESC, cluster_id DESC
+    LIMIT ?
+    ''', (limit,))
+    return cursor.fetchall()
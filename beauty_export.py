@@ -0,0 +1,180 @@
+import csv
+import datetime
+import os
+from beauty_storage import get_connection, FEEDS_DB
+
+# エクスポート設定
+EXPORT_DIR = "exports"
+EXPORT_CHUNK_SIZE = 5000  # 一度に読み込む行数（メモリ使用量の上限を決める）
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+def setup_export_state(conn):
+    """エクスポート済み位置（最後に出力したid）を保存するテーブル"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS export_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER,
+        updated_date TEXT
+    )
+    ''')
+    conn.commit()
+
+
+def get_export_position(conn, name):
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_id FROM export_state WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def set_export_position(conn, name, last_id):
+    conn.execute('''
+    INSERT INTO export_state (name, last_id, updated_date) VALUES (?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, updated_date = excluded.updated_date
+    ''', (name, last_id, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+
+
+def iter_article_chunks(conn, after_id=0, chunk_size=EXPORT_CHUNK_SIZE):
+    """id順に記事をチャンク単位で返す（列名, 行リスト）"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT * FROM beauty_articles
+    WHERE id > ?
+    ORDER BY id
+    ''', (after_id,))
+    columns = [description[0] for description in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield columns, rows
+
+
+def _partition_key(columns, row):
+    """added_date の日付をパーティションキーにする"""
+    added_date = row[columns.index("added_date")]
+    return str(added_date)[:10] if added_date else "unknown"
+
+
+class CsvPartitionWriter:
+    """日付ごとのCSVファイルに追記"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+
+    def write(self, columns, rows):
+        partitions = {}
+        for row in rows:
+            partitions.setdefault(_partition_key(columns, row), []).append(row)
+        for date, partition_rows in partitions.items():
+            path = os.path.join(self.out_dir, f"beauty_articles_{date}.csv")
+            is_new = not os.path.exists(path)
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if is_new:
+                    writer.writerow(columns)
+                writer.writerows(partition_rows)
+
+
+def _arrow_table(columns, rows):
+    import pyarrow as pa
+
+    data = {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+    schema = pa.schema([(name, pa.int64() if name == "id" else pa.string()) for name in columns])
+    return pa.table(data, schema=schema)
+
+
+class ParquetPartitionWriter:
+    """日付ごとのディレクトリ（date=YYYY-MM-DD）にチャンク単位のParquetファイルを追加"""
+
+    def __init__(self, out_dir):
+        # pyarrowがなければ書き込み前にここで失敗させる
+        import pyarrow.parquet  # noqa: F401
+        self.out_dir = out_dir
+
+    def write(self, columns, rows):
+        import pyarrow.parquet as pq
+
+        partitions = {}
+        for row in rows:
+            partitions.setdefault(_partition_key(columns, row), []).append(row)
+        id_index = columns.index("id")
+        for date, partition_rows in partitions.items():
+            directory = os.path.join(self.out_dir, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            first_id, last_id = partition_rows[0][id_index], partition_rows[-1][id_index]
+            path = os.path.join(directory, f"part-{first_id:010d}-{last_id:010d}.parquet")
+            pq.write_table(_arrow_table(columns, partition_rows), path)
+
+
+def _partition_writer(fmt, out_dir):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"未対応の形式: {fmt}")
+    os.makedirs(out_dir, exist_ok=True)
+    if fmt == "parquet":
+        return ParquetPartitionWriter(out_dir)
+    return CsvPartitionWriter(out_dir)
+
+
+def export_new_articles(fmt="csv", db_path=FEEDS_DB, out_dir=None,
+                        chunk_size=EXPORT_CHUNK_SIZE):
+    """前回のエクスポート以降に追加された記事だけを日付別パーティションに追記
+
+    チャンクを書き出すたびにエクスポート済み位置を更新する。
+    書き込み後・位置の更新前に中断した場合、そのチャンクは次回もう一度出力される。
+    """
+    out_dir = out_dir or os.path.join(EXPORT_DIR, "beauty_articles", fmt)
+    writer = _partition_writer(fmt, out_dir)
+    state_name = f"beauty_articles_{fmt}"
+
+    conn = get_connection(db_path)
+    setup_export_state(conn)
+    last_id = get_export_position(conn, state_name)
+    exported = 0
+    for columns, rows in iter_article_chunks(conn, last_id, chunk_size):
+        writer.write(columns, rows)
+        set_export_position(conn, state_name, rows[-1][columns.index("id")])
+        exported += len(rows)
+
+    print(f"差分エクスポート完了 ({fmt}): {exported}件")
+    return exported
+
+
+def export_all_articles(fmt="csv", db_path=FEEDS_DB, path=None,
+                        chunk_size=EXPORT_CHUNK_SIZE):
+    """全記事を1ファイルにエクスポート（チャンク単位で書き出すため、メモリ使用量は一定）"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"未対応の形式: {fmt}")
+    if path is None:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(EXPORT_DIR, f"beauty_articles_full_{timestamp}.{fmt}")
+
+    conn = get_connection(db_path)
+    exported = 0
+    parquet_writer = None
+    try:
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            for columns, rows in iter_article_chunks(conn, 0, chunk_size):
+                table = _arrow_table(columns, rows)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(path, table.schema)
+                parquet_writer.write_table(table)
+                exported += len(rows)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                for columns, rows in iter_article_chunks(conn, 0, chunk_size):
+                    if exported == 0:
+                        writer.writerow(columns)
+                    writer.writerows(rows)
+                    exported += len(rows)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    print(f"全件エクスポート完了 ({fmt}): {exported}件 -> {path}")
+    return exported
@@ -0,0 +1,245 @@
+import datetime
+import email.utils
+import random
+import time
+
+# フィードごとの取得間隔の設定
+FEED_DEFAULT_INTERVAL = 4 * 60 * 60    # 新しいフィード・更新頻度が分からないフィードの間隔（秒）
+FEED_MIN_INTERVAL = 30 * 60            # 更新の多いフィードでもこれより短くしない
+FEED_MAX_INTERVAL = 24 * 60 * 60       # 更新のないフィードでも1日1回は確認する
+FEED_TARGET_NEW_ENTRIES = 3            # 1回の取得で新着がこの件数になる間隔を目標にする
+FEED_RATE_ALPHA = 0.3                  # 新着ペース（件/時）の指数移動平均の重み
+FEED_POLL_TICK = 15 * 60               # 取得予定のフィードを確認する間隔（常駐モード）
+
+# 失敗時のバックオフ
+FEED_BACKOFF_BASE = 30 * 60            # 1回目の失敗後の待ち時間（秒）、以降は失敗のたびに倍
+FEED_MAX_BACKOFF = 24 * 60 * 60
+FEED_BACKOFF_JITTER = 0.1              # 待ち時間に加える揺らぎの割合（同時に復帰しないように）
+FEED_FAILING_AFTER = 3                 # 連続でこの回数失敗したら failing として報告
+FEED_DORMANT_DAYS = 14                 # この日数新着がなければ dormant として報告
+
+# sy:updatePeriod の期間（秒）
+_UPDATE_PERIODS = {
+    "hourly": 60 * 60,
+    "daily": 24 * 60 * 60,
+    "weekly": 7 * 24 * 60 * 60,
+    "monthly": 30 * 24 * 60 * 60,
+    "yearly": 365 * 24 * 60 * 60,
+}
+
+
+def setup_feed_schedule(conn):
+    """フィードごとの取得予定と状態のテーブルを作成（beauty_feeds.db内）"""
+    cursor = conn.cursor()
+    # 日時はUNIX時刻（秒）、entry_rate は新着件数/時の移動平均
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS feed_schedule (
+        url TEXT PRIMARY KEY,
+        source TEXT,
+        interval_seconds REAL,
+        hint_seconds REAL,
+        entry_rate REAL,
+        next_poll REAL,
+        last_poll REAL,
+        last_success REAL,
+        last_new_entry REAL,
+        consecutive_failures INTEGER DEFAULT 0,
+        last_error TEXT,
+        total_polls INTEGER DEFAULT 0,
+        total_failures INTEGER DEFAULT 0,
+        first_success REAL
+    )
+    ''')
+    # first_success のない既存のテーブルには列を追加する（追跡開始時期は分からないため最終成功時刻で埋める）
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(feed_schedule)")}
+    if "first_success" not in columns:
+        cursor.execute("ALTER TABLE feed_schedule ADD COLUMN first_success REAL")
+        cursor.execute("UPDATE feed_schedule SET first_success = last_success")
+    conn.commit()
+
+
+def feed_hint_seconds(feed_meta):
+    """RSSの ttl（分）と sy:updatePeriod / sy:updateFrequency から配信元が示す最短間隔（秒）を返す
+
+    どちらもなければ None。両方あれば長い方に従う。
+    """
+    hints = []
+    try:
+        ttl = int(feed_meta.get("ttl") or 0)
+        if ttl > 0:
+            hints.append(ttl * 60)
+    except (TypeError, ValueError):
+        pass
+    period = _UPDATE_PERIODS.get(str(feed_meta.get("sy_updateperiod") or "").strip().lower())
+    if period:
+        try:
+            frequency = max(1, int(feed_meta.get("sy_updatefrequency") or 1))
+        except (TypeError, ValueError):
+            frequency = 1
+        hints.append(period / frequency)
+    return max(hints) if hints else None
+
+
+def retry_after_seconds(value):
+    """Retry-After ヘッダー（秒数またはHTTP日付）を秒数に変換（不明ならNone）"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+def next_interval(entry_rate, hint_seconds=None):
+    """新着ペース（件/時）から次の取得間隔（秒）を決める
+
+    目標件数が溜まる頃に取得し、配信元の指定より短くはしない。
+    """
+    if entry_rate and entry_rate > 0:
+        interval = FEED_TARGET_NEW_ENTRIES / entry_rate * 60 * 60
+    else:
+        interval = FEED_MAX_INTERVAL
+    lower = max(FEED_MIN_INTERVAL, min(hint_seconds or 0, FEED_MAX_INTERVAL))
+    return min(max(interval, lower), FEED_MAX_INTERVAL)
+
+
+def backoff_seconds(failures, retry_after=None):
+    """連続失敗回数に応じた待ち時間（指数バックオフ、Retry-After があればそれ以上待つ）"""
+    delay = min(FEED_BACKOFF_BASE * 2 ** (max(failures, 1) - 1), FEED_MAX_BACKOFF)
+    delay *= 1 + random.uniform(0, FEED_BACKOFF_JITTER)
+    if retry_after:
+        delay = max(delay, min(retry_after, FEED_MAX_BACKOFF))
+    return delay
+
+
+def load_schedule(conn):
+    """url -> 状態（辞書）"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM feed_schedule")
+    columns = [description[0] for description in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+
+def get_feed_state(conn, url):
+    """1つのフィードの状態（未登録なら None）"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM feed_schedule WHERE url = ?", (url,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([description[0] for description in cursor.description], row))
+
+
+def due_feeds(feeds, schedule, now=None):
+    """取得予定時刻を過ぎたフィード（未登録のフィードを含む）"""
+    now = time.time() if now is None else now
+    return [feed for feed in feeds
+            if feed["url"] not in schedule or (schedule[feed["url"]]["next_poll"] or 0) <= now]
+
+
+def record_success(conn, feed_info, new_entries, hint_seconds=None, state=None, now=None):
+    """取得成功（変更なしを含む）を記録し、新着ペースから次の取得時刻を決める
+
+    初回の取得は溜まっていた記事をまとめて読むため、ペースの推定には使わない。
+    hint_seconds が None の場合は前回のフィードの指定を引き継ぐ。
+    """
+    now = time.time() if now is None else now
+    state = state or {}
+    rate = state.get("entry_rate")
+    if hint_seconds is None:
+        hint_seconds = state.get("hint_seconds")
+    previous = state.get("last_success")
+    if previous is not None and now > previous:
+        sample = new_entries / ((now - previous) / (60 * 60))
+        rate = sample if rate is None else FEED_RATE_ALPHA * sample + (1 - FEED_RATE_ALPHA) * rate
+        interval = next_interval(rate, hint_seconds)
+    else:
+        interval = max(FEED_DEFAULT_INTERVAL, min(hint_seconds or 0, FEED_MAX_INTERVAL))
+    last_new_entry = now if new_entries else state.get("last_new_entry")
+
+    conn.execute('''
+    INSERT INTO feed_schedule (url, source, interval_seconds, hint_seconds, entry_rate, next_poll,
+                               last_poll, last_success, last_new_entry, consecutive_failures,
+                               last_error, total_polls, total_failures, first_success)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, NULL, 1, 0, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        source = excluded.source,
+        interval_seconds = excluded.interval_seconds,
+        hint_seconds = excluded.hint_seconds,
+        entry_rate = excluded.entry_rate,
+        next_poll = excluded.next_poll,
+        last_poll = excluded.last_poll,
+        last_success = excluded.last_success,
+        last_new_entry = excluded.last_new_entry,
+        consecutive_failures = 0,
+        total_polls = total_polls + 1,
+        first_success = COALESCE(first_success, excluded.first_success)
+    ''', (feed_info["url"], feed_info["source"], interval, hint_seconds, rate, now + interval,
+          now, now, last_new_entry, now))
+    conn.commit()
+    return interval
+
+
+def record_failure(conn, feed_info, error, retry_after=None, state=None, now=None):
+    """取得失敗を記録し、バックオフ後の時刻を次の取得時刻にする（成功時の間隔は変えない）"""
+    now = time.time() if now is None else now
+    state = state or {}
+    failures = (state.get("consecutive_failures") or 0) + 1
+    delay = backoff_seconds(failures, retry_after)
+
+    conn.execute('''
+    INSERT INTO feed_schedule (url, source, interval_seconds, next_poll, last_poll,
+                               consecutive_failures, last_error, total_polls, total_failures)
+    VALUES (?, ?, ?, ?, ?, 1, ?, 1, 1)
+    ON CONFLICT(url) DO UPDATE SET
+        source = excluded.source,
+        next_poll = excluded.next_poll,
+        last_poll = excluded.last_poll,
+        consecutive_failures = consecutive_failures + 1,
+        last_error = excluded.last_error,
+        total_polls = total_polls + 1,
+        total_failures = total_failures + 1
+    ''', (feed_info["url"], feed_info["source"], FEED_DEFAULT_INTERVAL, now + delay, now,
+          str(error)[:500]))
+    conn.commit()
+    return delay
+
+
+def feed_status(state, now=None):
+    """フィードの状態: new / ok / retrying / failing / dormant
+
+    新着を一度も取得していないフィードは、最初に取得に成功してからの日数で dormant を判定する
+    （既存のDBで追跡を始めた直後は、新着なしや304でも dormant にしない）。
+    """
+    now = time.time() if now is None else now
+    failures = state.get("consecutive_failures") or 0
+    if failures >= FEED_FAILING_AFTER:
+        return "failing"
+    if failures:
+        return "retrying"
+    if state.get("last_success") is None:
+        return "new"
+    last_new_entry = (state.get("last_new_entry") or state.get("first_success")
+                      or state["last_success"])
+    if now - last_new_entry > FEED_DORMANT_DAYS * 24 * 60 * 60:
+        return "dormant"
+    return "ok"
+
+
+def feed_health(conn, now=None):
+    """全フィードの状態（問題のあるフィードを先頭に、次回取得時刻の順）"""
+    now = time.time() if now is None else now
+    order = {"failing": 0, "retrying": 1, "dormant": 2, "new": 3, "ok": 4}
+    report = []
+    for state in load_schedule(conn).values():
+        entry = dict(state)
+        entry["status"] = feed_status(state, now)
+        report.append(entry)
+    report.sort(key=lambda entry: (order[entry["status"]], entry["next_poll"] or 0))
+    return report
@@ -0,0 +1,108 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+# 中身をテキストとして扱わないタグ
+SKIP_TAGS = frozenset({"script", "style", "noscript", "template", "iframe", "svg", "head"})
+# 前後で単語が繋がらないよう区切りを入れるタグ
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+    "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main",
+    "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+})
+
+HTML_TEXT_CACHE_SIZE = 4096  # キャッシュする要約の件数
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class _TextExtractor(HTMLParser):
+    """タグを読み進めながらテキストだけを集める（木構造は作らない）"""
+
+    def __init__(self):
+        # 文字参照（&amp; &#x3042; など）はパーサーがテキストに展開する
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """HTMLからテキストを取り出す
+
+    script/style などの中身は除き、ブロック要素の境界には空白を入れ、
+    連続する空白は1つにまとめる。
+    """
+    if not html:
+        return ""
+    # タグも文字参照も含まなければパースしない
+    if "<" not in html and "&" not in html:
+        return _WHITESPACE_RE.sub(" ", html).strip()
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return _WHITESPACE_RE.sub(" ", "".join(extractor.parts)).strip()
+
+
+class HtmlTextCache:
+    """コンテンツのハッシュをキーにした html_to_text の結果のLRUキャッシュ
+
+    複数のフィードに配信された同じ本文は1回だけ処理する。
+    キーには本文そのものではなくハッシュを使い、長い本文をキャッシュに保持しない。
+    """
+
+    def __init__(self, maxsize=HTML_TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def strip(self, html):
+        if not html:
+            return ""
+        key = hashlib.blake2b(html.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+        text = html_to_text(html)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = text
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return text
+
+
+# プロセス全体で共有するキャッシュ
+_default_cache = HtmlTextCache()
+
+
+def strip_html(html):
+    """キャッシュ付きでHTMLからテキストを取り出す"""
+    return _default_cache.strip(html)
@@ -0,0 +1,106 @@
+import re
+import unicodedata
+from beauty_keyword_matcher import get_matcher
+
+# 日本語の文字（ひらがな・カタカナ・漢字・半角カナ）
+_JA_CHAR_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff66-\uff9f]")
+# 文字として数える範囲（記号・数字・空白を除く）
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+# この割合以上が日本語の文字なら日本語とみなす（英語のブランド名が混在しても日本語に振り分ける）
+JA_RATIO_THRESHOLD = 0.2
+
+# 文字種ごとの連続部分（漢字・カタカナ・ひらがな・英字）
+_RUN_RE = re.compile(
+    r"(?P<kanji>[\u3400-\u4dbf\u4e00-\u9fff\u3005\u3006\u30f6]+)"
+    r"|(?P<katakana>[\u30a1-\u30fa\u30fc]+)"
+    r"|(?P<hiragana>[\u3041-\u3096\u309d\u309e]+)"
+    r"|(?P<latin>[^\W\d_\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]+)"
+)
+
+# 漢字の連続がこれより長い場合は文字bigramに分割する
+KANJI_MAX_RUN = 4
+
+# 分割時に優先する美容関連の複合語辞書
+JA_BEAUTY_DICTIONARY = [
+    "スキンケア", "美容液", "化粧水", "乳液", "クレンジング", "洗顔料", "日焼け止め",
+    "メイク", "ファンデーション", "リップ", "アイシャドウ", "マスカラ", "下地", "コンシーラー",
+    "ヘアケア", "シャンプー", "トリートメント", "ヘアオイル", "ヘアカラー",
+    "美容トレンド", "コスメ", "新作コスメ", "韓国コスメ", "プチプラコスメ", "デパコス",
+    "美白", "保湿", "毛穴", "敏感肌", "乾燥肌", "脂性肌", "混合肌", "エイジングケア",
+    "ニキビ", "シミ", "くすみ", "ツヤ肌", "美肌", "限定", "新発売", "人気",
+]
+
+
+def japanese_ratio(text):
+    """文字のうち日本語の文字が占める割合"""
+    if not text:
+        return 0.0
+    letters = len(_LETTER_RE.findall(text))
+    if not letters:
+        return 0.0
+    return len(_JA_CHAR_RE.findall(text)) / letters
+
+
+def detect_language(text):
+    """文字種の割合で 'ja' / 'en' を判定"""
+    return 'ja' if japanese_ratio(text) >= JA_RATIO_THRESHOLD else 'en'
+
+
+class JapaneseSegmenter:
+    """辞書と文字種・n-gramによる簡易な日本語分割器（外部サービス不要）
+
+    辞書にある語を最長一致で優先的に切り出し、残りは文字種の連続で区切る。
+    漢字・カタカナの連続を語とし、ひらがなの連続（助詞・送り仮名など）は捨てる。
+    長すぎる漢字の連続は文字bigramに分割する。
+    """
+
+    def __init__(self, dictionary=None, stop_words=()):
+        self.dictionary = list(dictionary or JA_BEAUTY_DICTIONARY)
+        self.stop_words = frozenset(stop_words)
+        self._matcher = get_matcher(self.dictionary)
+        self._lengths = [len(unicodedata.normalize("NFKC", w).casefold()) for w in self.dictionary]
+
+    def _dictionary_spans(self, text):
+        """辞書語の出現位置を左から最長一致で重ならないように選ぶ"""
+        candidates = sorted(
+            ((end - self._lengths[index] + 1, end + 1) for end, index in self._matcher.iter_matches(text)),
+            key=lambda span: (span[0], -span[1]),
+        )
+        spans = []
+        position = 0
+        for start, end in candidates:
+            if start >= position:
+                spans.append((start, end))
+                position = end
+        return spans
+
+    def _segment_run(self, text):
+        words = []
+        for match in _RUN_RE.finditer(text):
+            kind = match.lastgroup
+            word = match.group()
+            if kind == 'hiragana':
+                continue
+            if kind == 'kanji' and len(word) > KANJI_MAX_RUN:
+                words.extend(word[i:i + 2] for i in range(len(word) - 1))
+            elif kind == 'latin':
+                if len(word) > 2:
+                    words.append(word)
+            elif len(word) >= 2:
+                words.append(word)
+        return words
+
+    def segment(self, text):
+        """テキストを単語のリストに分割（NFKC正規化・小文字化済みの語を返す）"""
+        if not text:
+            return []
+        normalized = unicodedata.normalize("NFKC", text).casefold()
+        words = []
+        position = 0
+        for start, end in self._dictionary_spans(normalized):
+            words.extend(self._segment_run(normalized[position:start]))
+            words.append(normalized[start:end])
+            position = end
+        words.extend(self._segment_run(normalized[position:]))
+        return [word for word in words if word not in self.stop_words]
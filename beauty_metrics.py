@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("BeautyMetrics")
+
+# Prometheus textfile の出力先（node_exporter の textfile collector から読み込む想定）
+METRICS_DIR = os.getenv("BEAUTY_METRICS_DIR", "metrics")
+METRIC_PREFIX = "beauty_"
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+class MetricsRegistry:
+    """カウンター・ゲージ・所要時間（回数と合計）を保持するレジストリ
+
+    値の更新はロック内で辞書を1回更新するだけなので、本番でも常時有効にしておける。
+    メトリクス名は beauty_<処理名>_... の形式にし、run() の処理名で絞り込めるようにする。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}   # (name, labels) -> 値
+        self._gauges = {}     # (name, labels) -> 値
+        self._timings = {}    # (name, labels) -> [回数, 合計秒数, 最大秒数]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                self._timings[key] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """with文の中の処理時間を記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self, prefix=""):
+        """現在の値のコピー（prefixで始まるメトリクスのみ）"""
+        with self._lock:
+            return {
+                "counters": {k: v for k, v in self._counters.items() if k[0].startswith(prefix)},
+                "gauges": {k: v for k, v in self._gauges.items() if k[0].startswith(prefix)},
+                "timings": {k: list(v) for k, v in self._timings.items() if k[0].startswith(prefix)},
+            }
+
+    def render(self, prefix=""):
+        """Prometheus のテキスト形式で出力"""
+        snapshot = self.snapshot(prefix)
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, key), value in sorted(snapshot["counters"].items()):
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), value in sorted(snapshot["gauges"].items()):
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), (count, total, _) in sorted(snapshot["timings"].items()):
+            header(name, "summary")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+            lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+        return "\n".join(lines) + "\n"
+
+    @contextmanager
+    def run(self, name):
+        """1回の処理（収集・分析）を計測し、終了時に構造化ログとtextfileを出力
+
+        同時に実行される他の処理と混ざらないよう、beauty_<name>_ で始まるメトリクスの
+        実行前後の差分をその回の値としてログに出す。
+        """
+        prefix = f"{METRIC_PREFIX}{name}_"
+        before = self.snapshot(prefix)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield self
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(f"{prefix}run_seconds", elapsed)
+            self.inc(f"{prefix}runs_total", status=status)
+            self.set(f"{prefix}last_run_timestamp_seconds", round(time.time(), 3))
+            logger.info(json.dumps({
+                "event": "run_finished",
+                "run": name,
+                "status": status,
+                "seconds": round(elapsed, 3),
+                "metrics": _delta(before, self.snapshot(prefix)),
+            }, ensure_ascii=False))
+            self.write_textfile(name)
+
+    def write_textfile(self, name, directory=None):
+        """beauty_<name>_ のメトリクスを <directory>/beauty_<name>.prom に書き出す"""
+        directory = directory or METRICS_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{METRIC_PREFIX}{name}.prom")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render(f"{METRIC_PREFIX}{name}_"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"メトリクスの書き出しに失敗しました: {e}")
+
+
+def _series_name(name, key):
+    return name + _format_labels(key)
+
+
+def _delta(before, after):
+    """2つのスナップショットの差分（ログ出力用のフラットな辞書）"""
+    delta = {}
+    for key, value in after["counters"].items():
+        change = value - before["counters"].get(key, 0)
+        if change:
+            delta[_series_name(*key)] = change
+    for key, (count, total, maximum) in after["timings"].items():
+        prev_count, prev_total, _ = before["timings"].get(key, (0, 0.0, 0.0))
+        if count != prev_count:
+            delta[_series_name(*key)] = {
+                "count": count - prev_count,
+                "sum": round(total - prev_total, 6),
+                "max": round(maximum, 6),
+            }
+    return delta
+
+
+# プロセス全体で共有するレジストリ
+metrics = MetricsRegistry()
+
+
+def serve_metrics(port, host="127.0.0.1", registry=None):
+    """/metrics でPrometheus形式のメトリクスを返すHTTPサーバーをバックグラウンドで起動"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = registry or metrics
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"メトリクスエンドポイント起動: http://{host}:{server.server_address[1]}/metrics")
+    return server
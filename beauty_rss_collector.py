@@ -1,28 +1,28 @@
 import feedparser
-import pandas as pd
 import time
 import datetime
-import sqlite3
-from bs4 import BeautifulSoup
+import hashlib
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+from beauty_keyword_matcher import get_matcher
+from beauty_html_text import strip_html
+from beauty_dedup import index_new_articles
+from beauty_search import setup_article_search
+from beauty_metrics import metrics
+from beauty_storage import get_connection, format_utc, FEEDS_DB
+from beauty_feed_schedule import (setup_feed_schedule, load_schedule, get_feed_state, due_feeds,
+                                  feed_hint_seconds, retry_after_seconds, record_success,
+                                  record_failure)
 
-# DBの設定
+# DBの設定（テーブルとインデックスは beauty_storage の移行手順で作成）
 def setup_database():
-    conn = sqlite3.connect('beauty_feeds.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS beauty_articles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT,
-        link TEXT UNIQUE,
-        published TEXT,
-        summary TEXT,
-        source TEXT,
-        keywords TEXT,
-        added_date TEXT
-    )
-    ''')
-    conn.commit()
+    conn = get_connection(FEEDS_DB)
+    # 全文検索インデックス（記事の追加に合わせてトリガーで更新）
+    setup_article_search(conn)
+    # フィードごとの取得間隔・失敗状態
+    setup_feed_schedule(conn)
     return conn
 
 # 主要な美容関連RSSフィードリスト
@@ -43,76 +43,313 @@ beauty_feeds = [
 beauty_keywords = ["skincare", "makeup", "haircare", "beauty", "cosmetics", 
                   "スキンケア", "メイク", "コスメ", "美容", "ヘアケア"]
 
+# 取得設定
+FETCH_MAX_WORKERS = 8       # 全体の同時ダウンロード数
+FETCH_PER_HOST_LIMIT = 2    # 同一ホストへの同時接続数
+FETCH_TIMEOUT = 20          # 接続・1回の読み込みのタイムアウト（秒、requests の timeout）
+FETCH_TOTAL_TIMEOUT = 60    # 1フィードの本文の読み込みにかける時間の上限（秒）
+FETCH_USER_AGENT = "beauty-data-collect/1.0 (+feedparser)"
+
 def extract_keywords(text, keywords):
-    """記事内容からキーワードを抽出"""
-    found_keywords = []
-    if text:
-        text_lower = text.lower()
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                found_keywords.append(keyword)
-    return ", ".join(found_keywords)
-
-def fetch_rss_feeds():
-    """RSSフィードを取得してDBに保存"""
-    conn = setup_database()
+    """記事内容からキーワードを抽出（Aho–Corasick法で1回の走査）"""
+    if not text:
+        return ""
+    return ", ".join(get_matcher(keywords).extract(text))
+
+def _host_of(url):
+    return urlparse(url).netloc.lower()
+
+def load_feed_cache(conn):
+    """フィードごとのETag / Last-Modified / コンテンツハッシュを読み込む"""
     cursor = conn.cursor()
-    
+    cursor.execute("SELECT url, etag, last_modified, content_hash FROM feed_cache")
+    return {url: {"etag": etag, "last_modified": last_modified, "content_hash": content_hash}
+            for url, etag, last_modified, content_hash in cursor.fetchall()}
+
+def save_feed_cache(conn, url, etag, last_modified, content_hash):
+    """フィードキャッシュを更新"""
+    conn.execute('''
+    INSERT OR REPLACE INTO feed_cache (url, etag, last_modified, content_hash, checked_date)
+    VALUES (?, ?, ?, ?, ?)
+    ''', (url, etag, last_modified, content_hash,
+          datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+
+def _read_body(response, deadline):
+    """本文を読み込む（deadline を過ぎたら打ち切る。1回の読み込みは requests の timeout で制限される）"""
+    chunks = []
+    for chunk in response.iter_content(64 * 1024):
+        chunks.append(chunk)
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{FETCH_TOTAL_TIMEOUT}秒以内に読み込みが完了しませんでした")
+    return b"".join(chunks)
+
+def download_feed(feed_info, timeout=FETCH_TIMEOUT, cache=None, total_timeout=FETCH_TOTAL_TIMEOUT):
+    """フィードをダウンロード（ワーカースレッドで実行、パースは行わない）
+
+    cacheにETag / Last-Modifiedがあれば条件付きリクエストを送る。
+    304応答の場合はcontentがNoneになる。
+    """
+    headers = {"User-Agent": FETCH_USER_AGENT}
+    if cache:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    source = feed_info["source"]
+    start = time.perf_counter()
+    deadline = time.monotonic() + total_timeout
+    try:
+        with requests.get(feed_info["url"], timeout=timeout, headers=headers, stream=True) as response:
+            metrics.inc("beauty_rss_fetch_total", source=source, status=str(response.status_code))
+            if response.status_code == 304:
+                return None, dict(response.headers)
+            response.raise_for_status()
+            content = _read_body(response, deadline)
+    except requests.HTTPError:
+        raise
+    except Exception:
+        metrics.inc("beauty_rss_fetch_total", source=source, status="error")
+        raise
+    finally:
+        metrics.observe("beauty_rss_fetch_seconds", time.perf_counter() - start, source=source)
+    metrics.inc("beauty_rss_fetch_bytes_total", len(content), source=source)
+    return content, dict(response.headers)
+
+def iter_downloads(feeds, max_workers=FETCH_MAX_WORKERS, per_host_limit=FETCH_PER_HOST_LIMIT,
+                   timeout=FETCH_TIMEOUT, feed_cache=None):
+    """ホストごとの同時接続数を守りながら並列にダウンロードし、(feed_info, future) を完了順に返す
+
+    接続数が上限に達したホストのフィードはスレッドプールに投入せずに待たせ、その間は
+    他のホストのフィードを先に投入する（ワーカースレッドがホストの空きを待って止まらない）。
+    """
+    feed_cache = feed_cache or {}
+    max_workers = max(1, max_workers)
+    waiting = {}   # ホスト -> 未投入のフィード
+    for feed_info in feeds:
+        waiting.setdefault(_host_of(feed_info["url"]), deque()).append(feed_info)
+    active = dict.fromkeys(waiting, 0)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit_ready():
+            # 空きのあるホストから1件ずつ順に投入し、同じホストのフィードが続かないようにする
+            submitted = True
+            while submitted and len(running) < max_workers:
+                submitted = False
+                for host, queue in waiting.items():
+                    if queue and active[host] < per_host_limit and len(running) < max_workers:
+                        feed_info = queue.popleft()
+                        active[host] += 1
+                        future = executor.submit(download_feed, feed_info, timeout,
+                                                 feed_cache.get(feed_info["url"]))
+                        running[future] = feed_info
+                        submitted = True
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            finished = [(running.pop(future), future) for future in done]
+            for feed_info, _ in finished:
+                active[_host_of(feed_info["url"])] -= 1
+            # 結果を処理している間も次のダウンロードを進める
+            submit_ready()
+            yield from finished
+
+def load_known_links(conn, links):
+    """指定したリンクのうち、すでにDBに存在するものの集合を返す"""
+    known = set()
+    links = list(links)
+    cursor = conn.cursor()
+    # SQLiteのパラメータ数上限を考慮して分割
+    for i in range(0, len(links), 500):
+        chunk = links[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT link FROM beauty_articles WHERE link IN ({placeholders})", chunk)
+        known.update(row[0] for row in cursor.fetchall())
+    return known
+
+def store_feed_entries(conn, feed_info, feed):
+    """パース済みフィードのエントリーをDBに保存し、新規件数を返す
+
+    既知のリンクはHTML除去やキーワード抽出の前に除外し、
+    新規記事はフィード単位の1トランザクションでまとめて挿入する。
+    """
+    source = feed_info["source"]
+    with metrics.timer("beauty_rss_db_seconds", source=source, operation="lookup"):
+        known_links = load_known_links(conn, {entry.get("link", "") for entry in feed.entries})
+    added_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    skipped = 0
+    strip_seconds = 0.0
+    keyword_seconds = 0.0
+
+    for entry in feed.entries:
+        title = entry.get("title", "")
+        link = entry.get("link", "")
+
+        # すでに存在する記事（同一フィード内の重複を含む）はスキップ
+        if link in known_links:
+            skipped += 1
+            continue
+        known_links.add(link)
+
+        published = entry.get("published", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        # 比較・範囲検索用にUTCのISO 8601へ正規化（feedparserの *_parsed はUTC）
+        published_at = format_utc(entry.get("published_parsed") or entry.get("updated_parsed"))
+        
+        # 要約を取得（サマリーがない場合は本文から）
+        summary = ""
+        if hasattr(entry, "summary"):
+            summary = entry.summary
+        elif hasattr(entry, "content"):
+            summary = entry.content[0].value
+        
+        # HTML要素の除去（木構造を作らずに処理し、同じ本文はキャッシュから返す）
+        start = time.perf_counter()
+        summary = strip_html(summary)
+        
+        # キーワード抽出
+        keyword_start = time.perf_counter()
+        keywords = extract_keywords(title + " " + summary, beauty_keywords)
+        strip_seconds += keyword_start - start
+        keyword_seconds += time.perf_counter() - keyword_start
+
+        rows.append((title, link, published, published_at, summary, feed_info["source"], keywords,
+                     added_date))
+
+    if not rows:
+        metrics.inc("beauty_rss_articles_duplicate_total", skipped, source=source)
+        return 0
+
+    # 記事単位の時間はフィードごとに合計して1回だけ記録する
+    metrics.observe("beauty_rss_strip_seconds", strip_seconds, source=source)
+    metrics.observe("beauty_rss_keyword_seconds", keyword_seconds, source=source)
+
+    # 一括挿入（他プロセスとの競合で重複した場合はUNIQUE制約で無視）
+    # rowcount は全文検索トリガーによる変更を含まない（total_changes は含む）
+    with metrics.timer("beauty_rss_db_seconds", source=source, operation="insert"):
+        with conn:
+            inserted = conn.executemany('''
+            INSERT OR IGNORE INTO beauty_articles (title, link, published, published_at, summary, source,
+                                                   keywords, added_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows).rowcount
+    metrics.inc("beauty_rss_articles_inserted_total", inserted, source=source)
+    metrics.inc("beauty_rss_articles_duplicate_total", skipped + len(rows) - inserted, source=source)
+    return inserted
+
+def fetch_rss_feeds(feeds=None, max_workers=FETCH_MAX_WORKERS,
+                    per_host_limit=FETCH_PER_HOST_LIMIT, timeout=FETCH_TIMEOUT, due_only=False):
+    """RSSフィードを取得してDBに保存
+
+    ダウンロードはスレッドプールで並列に行い、パースとDB書き込みは
+    呼び出し元スレッドで取得完了順に1件ずつ処理する。
+    max_workers=1 で従来どおりの逐次取得になる。
+    due_only=True の場合は、フィードごとの取得予定時刻を過ぎたものだけを取得する。
+    """
+    if feeds is None:
+        feeds = beauty_feeds
+
+    with metrics.run("rss"):
+        return _fetch_rss_feeds(feeds, max_workers, per_host_limit, timeout, due_only)
+
+def _fetch_rss_feeds(feeds, max_workers, per_host_limit, timeout, due_only=False):
+    conn = setup_database()
+    feed_cache = load_feed_cache(conn)
+    schedule = load_schedule(conn)
     total_new_entries = 0
-    
-    for feed_info in beauty_feeds:
+
+    if due_only:
+        due = due_feeds(feeds, schedule)
+        metrics.inc("beauty_rss_feeds_not_due_total", len(feeds) - len(due))
+        if len(due) < len(feeds):
+            print(f"取得予定のフィード: {len(due)}/{len(feeds)}件")
+        feeds = due
+
+    # ホストごとの同時接続数を制限しつつ、取得できたものから順に処理する
+    for feed_info, future in iter_downloads(feeds, max_workers, per_host_limit, timeout,
+                                            feed_cache):
+        state = schedule.get(feed_info["url"])
         try:
-            feed = feedparser.parse(feed_info["url"])
-            print(f"処理中: {feed_info['source']} - エントリー数: {len(feed.entries)}")
-            
-            for entry in feed.entries:
-                title = entry.get("title", "")
-                link = entry.get("link", "")
-                published = entry.get("published", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-                
-                # 要約を取得（サマリーがない場合は本文から）
-                summary = ""
-                if hasattr(entry, "summary"):
-                    summary = entry.summary
-                elif hasattr(entry, "content"):
-                    summary = entry.content[0].value
-                
-                # HTML要素の除去
-                if summary:
-                    soup = BeautifulSoup(summary, "html.parser")
-                    summary = soup.get_text()
-                
-                # キーワード抽出
-                keywords = extract_keywords(title + " " + summary, beauty_keywords)
-                
-                # DBに挿入（重複チェック）
-                try:
-                    cursor.execute('''
-                    INSERT INTO beauty_articles (title, link, published, summary, source, keywords, added_date)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (title, link, published, summary, feed_info["source"], keywords, 
-                          datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-                    conn.commit()
-                    total_new_entries += 1
-                except sqlite3.IntegrityError:
-                    # すでに存在する記事はスキップ
-                    pass
-                    
+            content, headers = future.result()
+            cached = feed_cache.get(feed_info["url"], {})
+            new_entries = 0
+            hint_seconds = None
+
+            # 304 またはハッシュ一致なら変更なしとしてスキップ
+            if content is None:
+                metrics.inc("beauty_rss_feeds_unchanged_total", source=feed_info["source"])
+                print(f"変更なし (304): {feed_info['source']}")
+            else:
+                content_hash = hashlib.sha256(content).hexdigest()
+                lowered = {k.lower(): v for k, v in headers.items()}
+                if content_hash == cached.get("content_hash"):
+                    metrics.inc("beauty_rss_feeds_unchanged_total", source=feed_info["source"])
+                    print(f"変更なし (ハッシュ一致): {feed_info['source']}")
+                else:
+                    with metrics.timer("beauty_rss_parse_seconds", source=feed_info["source"]):
+                        feed = feedparser.parse(content, response_headers=headers)
+                    # HTMLのエラーページなど、フィードとして読めない応答は失敗として扱う
+                    if not feed.version and not feed.entries:
+                        raise ValueError("フィードとして解析できませんでした")
+                    print(f"処理中: {feed_info['source']} - エントリー数: {len(feed.entries)}")
+                    new_entries = store_feed_entries(conn, feed_info, feed)
+                    total_new_entries += new_entries
+                    hint_seconds = feed_hint_seconds(feed.feed)
+
+                # 保存が完了してからキャッシュを更新する
+                save_feed_cache(conn, feed_info["url"], lowered.get("etag"),
+                                lowered.get("last-modified"), content_hash)
+
+            # 新着ペースから次の取得時刻を決める
+            interval = record_success(conn, feed_info, new_entries, hint_seconds, state=state)
+            metrics.set("beauty_rss_feed_interval_seconds", interval, source=feed_info["source"])
+            metrics.set("beauty_rss_feed_consecutive_failures", 0, source=feed_info["source"])
         except Exception as e:
-            print(f"エラー ({feed_info['source']}): {e}")
+            metrics.inc("beauty_rss_feed_errors_total", source=feed_info["source"])
+            # 失敗が続くフィードは指数バックオフ（429/503 の Retry-After にも従う）
+            response = getattr(e, "response", None)
+            retry_after = None
+            if response is not None:
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            delay = record_failure(conn, feed_info, e, retry_after, state=state)
+            failures = ((state or {}).get("consecutive_failures") or 0) + 1
+            metrics.set("beauty_rss_feed_consecutive_failures", failures, source=feed_info["source"])
+            print(f"エラー ({feed_info['source']}): {e}（連続{failures}回目、{delay / 60:.0f}分後に再試行）")
+    
+    # 新しい記事を近似重複インデックスに登録（別URLで配信された同じ記事をクラスタにまとめる）
+    with metrics.timer("beauty_rss_dedup_seconds"):
+        indexed, duplicates = index_new_articles(conn)
+    metrics.inc("beauty_rss_near_duplicates_total", duplicates)
+    if duplicates:
+        print(f"近似重複: {indexed}件中{duplicates}件を既存の記事とまとめました")
     
-    conn.close()
     return total_new_entries
 
+def collect_feed(feed_info, timeout=FETCH_TIMEOUT):
+    """1つのフィードを取得してDBに保存し、新規件数を返す（作業キューのワーカーから呼ぶ）
+
+    取得に失敗した場合は、フィードごとのバックオフを記録したうえで例外を送出する。
+    """
+    started = time.time()
+    new_entries = fetch_rss_feeds([feed_info], max_workers=1, per_host_limit=1, timeout=timeout)
+    state = get_feed_state(setup_database(), feed_info["url"])
+    if state and state["consecutive_failures"] and (state["last_poll"] or 0) >= started:
+        raise RuntimeError(state["last_error"])
+    return new_entries
+
 def export_to_csv():
     """最新の記事をCSVにエクスポート"""
-    conn = sqlite3.connect('beauty_feeds.db')
+    import pandas as pd
+    
+    conn = get_connection(FEEDS_DB)
     df = pd.read_sql_query('''
     SELECT * FROM beauty_articles 
     ORDER BY added_date DESC LIMIT 1000
     ''', conn)
     df.to_csv('beauty_articles_latest.csv', index=False)
-    conn.close()
     print(f"CSVエクスポート完了: {len(df)}件")
 
 if __name__ == "__main__":
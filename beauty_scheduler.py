@@ -0,0 +1,165 @@
+import datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("BeautyScheduler")
+
+# 状態ファイル（最終実行時刻など）
+SCHEDULER_STATE_FILE = "scheduler_state.json"
+# 次の実行予定がない場合でもこの間隔で状態を確認する（秒）
+SCHEDULER_MAX_POLL = 60
+
+
+class Job:
+    """定期実行ジョブの定義"""
+
+    def __init__(self, name, func, interval, depends_on=(), jitter=0):
+        self.name = name
+        self.func = func
+        self.interval = interval          # 実行間隔（秒）
+        self.depends_on = tuple(depends_on)
+        self.jitter = jitter              # 次回実行時刻に加える揺らぎの最大値（秒）
+        self.next_run = None
+        self.running = False
+        self.full_run_pending = False     # 定時の全ジョブ実行を待っている（実行中なら終了後に実行）
+
+
+class JobScheduler:
+    """ワーカープールでジョブを並行実行するスケジューラー
+
+    - 同じジョブは自分自身と重ならない（実行中なら次の機会まで待つ）
+    - depends_on のジョブが実行中・実行待ちの間は開始しない（例: 収集の後にトレンド分析）
+    - 次回実行時刻にジッターを加えて実行タイミングを分散する
+    - 最終実行時刻を保存し、再起動時に実行し損ねたジョブを1回だけ追いかけ実行する
+    - full_run_at（"HH:MM"）を指定すると毎日その時刻に全ジョブを実行する
+    """
+
+    def __init__(self, state_path=SCHEDULER_STATE_FILE, max_workers=None, full_run_at=None,
+                 clock=time.time):
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.full_run_at = full_run_at
+        self.jobs = {}
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._state = self._load_state()
+
+    # --- 状態の保存と読み込み ---
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {"jobs": {}}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            state.setdefault("jobs", {})
+            return state
+        except (OSError, ValueError) as e:
+            logger.warning(f"スケジューラー状態の読み込みに失敗しました: {e}")
+            return {"jobs": {}}
+
+    def _save_state(self):
+        # 書き込み途中のファイルを読まないよう、一時ファイルから置き換える
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    # --- ジョブ登録 ---
+
+    def add_job(self, name, func, interval, depends_on=(), jitter=0):
+        """ジョブを登録（前回実行から interval 秒以上経っていれば起動直後に実行）"""
+        job = Job(name, func, interval, depends_on, jitter)
+        last_run = self._state["jobs"].get(name, {}).get("last_run")
+        # 前回実行時刻がなければ即時、過ぎていれば即時（追いかけ実行は1回だけ）
+        job.next_run = self._clock() if last_run is None else max(last_run + interval, self._clock())
+        self.jobs[name] = job
+        return job
+
+    # --- 実行制御 ---
+
+    def _is_due(self, job, now):
+        return job.full_run_pending or job.next_run <= now
+
+    def _is_blocked(self, job, now):
+        """依存ジョブが実行中、または実行待ちなら開始しない"""
+        for dependency in job.depends_on:
+            other = self.jobs.get(dependency)
+            if other and (other.running or self._is_due(other, now)):
+                return True
+        return False
+
+    def _check_full_run(self, now):
+        """毎日の全ジョブ実行時刻を過ぎていれば全ジョブを実行待ちにする"""
+        if not self.full_run_at:
+            return
+        current = datetime.datetime.fromtimestamp(now)
+        hour, minute = map(int, self.full_run_at.split(":"))
+        scheduled = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        today = current.strftime("%Y-%m-%d")
+        if current < scheduled or self._state.get("last_full_run") == today:
+            return
+        logger.info("全ジョブの定時実行")
+        # 実行中のジョブの next_run は終了時に上書きされるため、フラグで実行待ちにする
+        for job in self.jobs.values():
+            job.full_run_pending = True
+        self._state["last_full_run"] = today
+        self._save_state()
+
+    def run_pending(self, executor):
+        """実行予定を過ぎたジョブを executor に投入し、次に確認するまでの秒数を返す"""
+        now = self._clock()
+        with self._lock:
+            self._check_full_run(now)
+            for job in self.jobs.values():
+                if job.running or not self._is_due(job, now) or self._is_blocked(job, now):
+                    continue
+                job.running = True
+                job.full_run_pending = False
+                executor.submit(self._run_job, job)
+            # 実行中・依存待ちのジョブは待ち時間に含めない（終了時に _wake で起こされる）
+            pending = [job.next_run - now for job in self.jobs.values()
+                       if not job.running and not self._is_blocked(job, now)]
+        delay = min(pending, default=SCHEDULER_MAX_POLL)
+        return min(max(delay, 1), SCHEDULER_MAX_POLL)
+
+    def _run_job(self, job):
+        started = self._clock()
+        logger.info(f"ジョブ開始: {job.name}")
+        try:
+            result = job.func()
+            status = "error" if result is False else "ok"
+        except Exception as e:
+            logger.error(f"ジョブエラー ({job.name}): {e}")
+            status = "error"
+        finished = self._clock()
+
+        with self._lock:
+            job.running = False
+            job.next_run = finished + job.interval + random.uniform(0, job.jitter)
+            self._state["jobs"][job.name] = {
+                "last_run": started,
+                "last_status": status,
+                "last_duration": round(finished - started, 3),
+            }
+            self._save_state()
+        logger.info(f"ジョブ終了: {job.name} ({status}, {finished - started:.1f}秒)")
+
+        # 依存しているジョブをすぐに開始できるようにする
+        self._wake.set()
+
+    def run_forever(self, stop_event=None):
+        """停止イベントがセットされるまでジョブを実行し続ける"""
+        stop_event = stop_event or threading.Event()
+        workers = self.max_workers or max(1, len(self.jobs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job") as executor:
+            while not stop_event.is_set():
+                # 投入中に終了したジョブの通知を失わないよう、先にクリアする
+                self._wake.clear()
+                self._wake.wait(self.run_pending(executor))
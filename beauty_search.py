@@ -0,0 +1,208 @@
+import datetime
+
+# 全文検索の設定
+# trigram トークナイザーは分かち書きなしで日本語にも部分一致する（3文字以上の語が対象）
+SEARCH_TOKENIZE = "trigram"
+SEARCH_MIN_TERM_LENGTH = 3      # これより短い語はインデックスを使えないため LIKE で絞り込む
+SEARCH_DEFAULT_LIMIT = 20
+# bm25 の列ごとの重み（タイトル, 要約, キーワード）
+ARTICLE_RANK_WEIGHTS = (5.0, 1.0, 2.0)
+
+
+def _table_exists(conn, name):
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def setup_article_search(conn):
+    """beauty_articles の全文検索インデックス（FTS5）と同期用トリガーを作成
+
+    初回作成時は既存の記事からインデックスを構築する。
+    """
+    created = not _table_exists(conn, "articles_fts")
+    cursor = conn.cursor()
+    # 本文は beauty_articles から参照する（外部コンテンツテーブル）
+    cursor.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        title, summary, keywords,
+        content='beauty_articles', content_rowid='id',
+        tokenize='{SEARCH_TOKENIZE}'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS beauty_articles_fts_insert AFTER INSERT ON beauty_articles BEGIN
+        INSERT INTO articles_fts (rowid, title, summary, keywords)
+        VALUES (new.id, new.title, new.summary, new.keywords);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS beauty_articles_fts_delete AFTER DELETE ON beauty_articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, summary, keywords)
+        VALUES ('delete', old.id, old.title, old.summary, old.keywords);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS beauty_articles_fts_update AFTER UPDATE ON beauty_articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, summary, keywords)
+        VALUES ('delete', old.id, old.title, old.summary, old.keywords);
+        INSERT INTO articles_fts (rowid, title, summary, keywords)
+        VALUES (new.id, new.title, new.summary, new.keywords);
+    END
+    ''')
+    if created:
+        cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def setup_tweet_search(conn):
+    """tweets の全文検索インデックス（FTS5）と同期用トリガーを作成
+
+    外部コンテンツではなく tweet_id と本文をインデックス側にも持つ
+    （tweets を作り直す移行があってもインデックスの対応が崩れない）。
+    """
+    created = not _table_exists(conn, "tweets_fts")
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS tweets_fts USING fts5(
+        tweet_id UNINDEXED, text,
+        tokenize='{SEARCH_TOKENIZE}'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS tweets_fts_insert AFTER INSERT ON tweets BEGIN
+        INSERT INTO tweets_fts (tweet_id, text) VALUES (new.tweet_id, new.text);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS tweets_fts_delete AFTER DELETE ON tweets BEGIN
+        DELETE FROM tweets_fts WHERE tweet_id = old.tweet_id;
+    END
+    ''')
+    if created:
+        cursor.execute("INSERT INTO tweets_fts (tweet_id, text) SELECT tweet_id, text FROM tweets")
+    conn.commit()
+
+
+def split_terms(query):
+    """検索文字列を語に分割（空白区切り、すべての語を含むものを検索する）"""
+    terms = [term for term in query.split() if term]
+    if not terms:
+        raise ValueError("検索語を指定してください")
+    return terms
+
+
+def _match_expression(terms):
+    """FTS5のMATCH式（各語をフレーズとして引用し、AND で結合）"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _until_bound(until):
+    """日付（YYYY-MM-DD）だけの指定はその日を含むよう翌日の0時を上限にする"""
+    if len(until) == 10:
+        day = datetime.datetime.strptime(until, "%Y-%m-%d") + datetime.timedelta(days=1)
+        return day.strftime("%Y-%m-%d")
+    return until
+
+
+def _build_filter(query, fts_table, table, join_on, text_columns, date_column, since, until):
+    """(FROM句, WHERE句, パラメータ, MATCHを使うか) を作る
+
+    3文字以上の語はFTS5のインデックスで絞り込み、短い語はその結果に LIKE を適用する。
+    短い語しかない場合は全件を LIKE で走査する。
+    """
+    terms = split_terms(query)
+    long_terms = [t for t in terms if len(t) >= SEARCH_MIN_TERM_LENGTH]
+    short_terms = [t for t in terms if len(t) < SEARCH_MIN_TERM_LENGTH]
+    clauses = []
+    params = []
+
+    if long_terms:
+        from_clause = f"{fts_table} JOIN {table} ON {join_on}"
+        clauses.append(f"{fts_table} MATCH ?")
+        params.append(_match_expression(long_terms))
+    else:
+        from_clause = table
+    for term in short_terms:
+        clauses.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in text_columns) + ")")
+        params.extend([_like_pattern(term)] * len(text_columns))
+    if since:
+        clauses.append(f"{date_column} >= ?")
+        params.append(since)
+    if until:
+        clauses.append(f"{date_column} < ?")
+        params.append(_until_bound(until))
+    return from_clause, " AND ".join(clauses), params, bool(long_terms)
+
+
+def _article_filter(query, since, until, source):
+    from_clause, where, params, matched = _build_filter(
+        query, "articles_fts", "beauty_articles a", "a.id = articles_fts.rowid",
+        ("a.title", "a.summary", "a.keywords"), "a.added_date", since, until)
+    if source:
+        where += " AND a.source = ?"
+        params.append(source)
+    return from_clause, where, params, matched
+
+
+def search_articles(conn, query, since=None, until=None, source=None, limit=SEARCH_DEFAULT_LIMIT):
+    """記事を検索し、関連度順（bm25）に返す
+
+    since / until は追加日時（added_date）で絞り込む（YYYY-MM-DD または日時文字列）。
+    """
+    from_clause, where, params, matched = _article_filter(query, since, until, source)
+    if matched:
+        weights = ", ".join(str(w) for w in ARTICLE_RANK_WEIGHTS)
+        columns = f"snippet(articles_fts, -1, '[', ']', '…', 12), bm25(articles_fts, {weights})"
+        order = f"bm25(articles_fts, {weights})"
+    else:
+        columns = "substr(a.summary, 1, 80), NULL"
+        order = "a.added_date DESC"
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    SELECT a.id, a.title, a.link, a.source, a.added_date, {columns}
+    FROM {from_clause}
+    WHERE {where}
+    ORDER BY {order}
+    LIMIT ?
+    ''', params + [limit])
+    return [{"id": row[0], "title": row[1], "link": row[2], "source": row[3], "added_date": row[4],
+             "snippet": row[5], "score": row[6]}
+            for row in cursor.fetchall()]
+
+
+def article_source_facets(conn, query, since=None, until=None):
+    """検索にヒットした記事のソース別件数（多い順）"""
+    from_clause, where, params, _ = _article_filter(query, since, until, None)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    SELECT a.source, COUNT(*) FROM {from_clause}
+    WHERE {where}
+    GROUP BY a.source
+    ORDER BY COUNT(*) DESC
+    ''', params)
+    return cursor.fetchall()
+
+
+def search_tweets(conn, query, since=None, until=None, limit=SEARCH_DEFAULT_LIMIT):
+    """ツイートを検索し、関連度順に返す（since / until は投稿日時 created_at）"""
+    from_clause, where, params, matched = _build_filter(
+        query, "tweets_fts", "tweets t", "t.tweet_id = tweets_fts.tweet_id",
+        ("t.text",), "t.created_at", since, until)
+    order = "bm25(tweets_fts)" if matched else "t.created_at DESC"
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    SELECT t.tweet_id, t.text, t.created_at, t.like_count, t.retweet_count
+    FROM {from_clause}
+    WHERE {where}
+    ORDER BY {order}
+    LIMIT ?
+    ''', params + [limit])
+    return [{"tweet_id": row[0], "text": row[1], "created_at": row[2],
+             "like_count": row[3], "retweet_count": row[4]}
+            for row in cursor.fetchall()]
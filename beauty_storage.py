@@ -0,0 +1,281 @@
+import datetime
+import email.utils
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("BeautyStorage")
+
+# データベースファイル
+FEEDS_DB = "beauty_feeds.db"
+TRENDS_DB = "beauty_trends.db"
+
+# 接続設定
+SQLITE_BUSY_TIMEOUT = 30  # 書き込みロックの待ち時間（秒）
+# WALは書き込み中も読み込みをブロックしないが、同一ホストのプロセス間でしか使えない。
+# 複数ホストから共有ストレージ上のDBを使う場合は DELETE を指定する
+SQLITE_JOURNAL_MODE = os.getenv("BEAUTY_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_JOURNAL_MODES = ("WAL", "DELETE", "TRUNCATE", "PERSIST")
+SQLITE_PRAGMAS = (
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -32000",     # ページキャッシュ約32MB
+    "PRAGMA mmap_size = 268435456",   # 256MBまでメモリマップで読み込む
+)
+
+_local = threading.local()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def connect(db_path, journal_mode=None):
+    """設定済みの新しい接続を作成（スキーマの移行も行う）
+
+    journal_mode を省略すると BEAUTY_SQLITE_JOURNAL_MODE（既定は WAL）を使う。
+    """
+    journal_mode = (journal_mode or SQLITE_JOURNAL_MODE).upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"未対応のジャーナルモード: {journal_mode}")
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    # WALではコミットごとのfsyncを省略しても破損しない（それ以外は既定の FULL のまま）
+    if journal_mode == "WAL":
+        conn.execute("PRAGMA synchronous = NORMAL")
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    migrate(conn, db_path)
+    return conn
+
+
+def get_connection(db_path):
+    """スレッドごとに使い回す接続を返す（呼び出し側では close しない）
+
+    カレントディレクトリが変わっても別のDBとして扱うよう、絶対パスで管理する。
+    """
+    key = os.path.abspath(db_path)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = connect(db_path)
+    return conn
+
+
+def close_connections():
+    """このスレッドで開いた接続をすべて閉じる"""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+
+# --- 日時の正規化 ---
+
+def format_utc(value):
+    """time.struct_time（UTC）や datetime を 'YYYY-MM-DDTHH:MM:SSZ' に変換"""
+    if value is None:
+        return None
+    if isinstance(value, time.struct_time):
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", value)
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_published(text):
+    """RFC 822 / ISO 8601 形式の日時文字列をUTCの 'YYYY-MM-DDTHH:MM:SSZ' に変換（不明ならNone）"""
+    if not text:
+        return None
+    try:
+        return format_utc(email.utils.parsedate_to_datetime(text))
+    except (TypeError, ValueError, IndexError):
+        pass
+    try:
+        return format_utc(datetime.datetime.fromisoformat(text.replace("Z", "+00:00")))
+    except ValueError:
+        return None
+
+
+# --- スキーマの移行（PRAGMA user_version で適用済みの版を管理） ---
+
+def _feeds_v1_base(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS beauty_articles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        link TEXT UNIQUE,
+        published TEXT,
+        summary TEXT,
+        source TEXT,
+        keywords TEXT,
+        added_date TEXT
+    )
+    ''')
+    # 条件付きGET用のフィードキャッシュ
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS feed_cache (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        content_hash TEXT,
+        checked_date TEXT
+    )
+    ''')
+
+
+def _feeds_v2_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_beauty_articles_added_date ON beauty_articles (added_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_beauty_articles_source_added_date "
+                 "ON beauty_articles (source, added_date)")
+
+
+def _feeds_v3_published_at(conn):
+    """公開日時をUTCのISO 8601で持つ列を追加し、既存の記事は published 文字列から埋める"""
+    conn.execute("ALTER TABLE beauty_articles ADD COLUMN published_at TEXT")
+    cursor = conn.execute("SELECT id, published FROM beauty_articles")
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        conn.executemany("UPDATE beauty_articles SET published_at = ? WHERE id = ?",
+                         [(parse_published(published), row_id) for row_id, published in rows])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_beauty_articles_published_at ON beauty_articles (published_at)")
+
+
+def _trends_v1_base(conn):
+    # X/Twitterトレンド用テーブル
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS twitter_trends (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        keyword TEXT,
+        tweet_count INTEGER,
+        tweets_text TEXT,
+        collection_date TEXT
+    )
+    ''')
+    # ツイート単位の正規化テーブル（ツイートIDで重複排除）
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tweets (
+        tweet_id TEXT PRIMARY KEY,
+        text TEXT,
+        created_at TEXT,
+        retweet_count INTEGER,
+        reply_count INTEGER,
+        like_count INTEGER,
+        quote_count INTEGER,
+        collection_date TEXT
+    )
+    ''')
+    # キーワードとツイートの対応
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS keyword_tweets (
+        keyword TEXT,
+        tweet_id TEXT,
+        PRIMARY KEY (keyword, tweet_id)
+    )
+    ''')
+    # キーワードごとの差分取得位置
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS twitter_since_ids (
+        keyword TEXT PRIMARY KEY,
+        since_id TEXT,
+        updated_date TEXT
+    )
+    ''')
+    # Instagram用テーブル
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS instagram_trends (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hashtag TEXT,
+        post_count INTEGER,
+        recent_posts TEXT,
+        collection_date TEXT
+    )
+    ''')
+
+
+def _trends_v2_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_twitter_trends_keyword_date "
+                 "ON twitter_trends (keyword, collection_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_twitter_trends_collection_date "
+                 "ON twitter_trends (collection_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tweets_collection_date ON tweets (collection_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tweets_created_at ON tweets (created_at)")
+    # 期間で絞ったツイートからキーワードを引くための逆引き
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_keyword_tweets_tweet_id ON keyword_tweets (tweet_id)")
+
+
+def _trends_v3_twitter_resume(conn):
+    """ページングを途中で打ち切ったキーワードの再開位置
+
+    until_id より古く since_id より新しいツイートが未取得で、until_id から pending_newest_id までは取得済み。
+    """
+    conn.execute("ALTER TABLE twitter_since_ids ADD COLUMN until_id TEXT")
+    conn.execute("ALTER TABLE twitter_since_ids ADD COLUMN pending_newest_id TEXT")
+
+
+def _trends_v4_tweets_id(conn):
+    """tweets に INTEGER PRIMARY KEY の id を付けて作り直す（単語集計の処理済み位置に使う）
+
+    暗黙のrowidはVACUUMで振り直されうるため、既存の rowid をそのまま id にして処理済み位置を引き継ぐ。
+    全文検索の同期トリガーは表と一緒に削除され、setup_tweet_search で作り直される。
+    """
+    conn.execute('''
+    CREATE TABLE tweets_v4 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tweet_id TEXT UNIQUE,
+        text TEXT,
+        created_at TEXT,
+        retweet_count INTEGER,
+        reply_count INTEGER,
+        like_count INTEGER,
+        quote_count INTEGER,
+        collection_date TEXT
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO tweets_v4 (id, tweet_id, text, created_at, retweet_count, reply_count, like_count,
+                           quote_count, collection_date)
+    SELECT rowid, tweet_id, text, created_at, retweet_count, reply_count, like_count, quote_count,
+           collection_date
+    FROM tweets ORDER BY rowid
+    ''')
+    conn.execute("DROP TABLE tweets")
+    conn.execute("ALTER TABLE tweets_v4 RENAME TO tweets")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tweets_collection_date ON tweets (collection_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tweets_created_at ON tweets (created_at)")
+
+
+# DBファイル名ごとの移行手順（追加のみ。既存の手順は変更しない）
+MIGRATIONS = {
+    FEEDS_DB: [_feeds_v1_base, _feeds_v2_indexes, _feeds_v3_published_at],
+    TRENDS_DB: [_trends_v1_base, _trends_v2_indexes, _trends_v3_twitter_resume,
+                _trends_v4_tweets_id],
+}
+
+
+def migrate(conn, db_path):
+    """未適用の移行手順を順に適用（プロセス内ではDBごとに1回だけ確認）"""
+    migrations = MIGRATIONS.get(os.path.basename(db_path), [])
+    key = os.path.abspath(db_path)
+    if not migrations or key in _migrated:
+        return
+    with _migrate_lock:
+        if key in _migrated:
+            return
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < len(migrations):
+            # 他のプロセスと同時に移行しないよう書き込みロックを取ってから版を確認し直す
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for number, migration in enumerate(migrations[version:], version + 1):
+                    migration(conn)
+                    conn.execute(f"PRAGMA user_version = {number}")
+                    logger.info(f"{db_path}: スキーマを版{number}に移行 ({migration.__name__})")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        _migrated.add(key)
@@ -0,0 +1,122 @@
+import datetime
+
+# 時間別の単語カウント集計テーブル
+# stream: 'rss' / 'twitter'、source: 配信元（Twitterは 'twitter'）、lang: 'en' / 'ja'
+
+
+def setup_term_count_tables(conn):
+    """集計テーブルと処理済み位置テーブルを作成"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS term_counts_hourly (
+        bucket TEXT,
+        stream TEXT,
+        source TEXT,
+        lang TEXT,
+        term TEXT,
+        count INTEGER,
+        PRIMARY KEY (bucket, stream, source, lang, term)
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_term_counts_stream_bucket
+    ON term_counts_hourly (stream, bucket)
+    ''')
+    # バケットごとの更新の版（集計を読み込んで保持する側が、更新されたバケットだけを読み直すため）
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS term_count_buckets (
+        bucket TEXT PRIMARY KEY,
+        version INTEGER
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_term_count_buckets_version
+    ON term_count_buckets (version)
+    ''')
+    # 各ストリームでどこまで集計したか（元テーブルのid）
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS term_count_progress (
+        stream TEXT PRIMARY KEY,
+        last_id INTEGER
+    )
+    ''')
+    conn.commit()
+
+
+def hour_bucket(timestamp):
+    """'YYYY-MM-DD HH:MM:SS' 形式の日時を1時間単位のバケットに丸める"""
+    if isinstance(timestamp, datetime.datetime):
+        return timestamp.strftime("%Y-%m-%d %H:00:00")
+    return f"{str(timestamp)[:13]}:00:00"
+
+
+def window_start(hours):
+    """現在から hours 時間前を含むバケットの開始時刻"""
+    return hour_bucket(datetime.datetime.now() - datetime.timedelta(hours=hours))
+
+
+def get_progress(conn, stream):
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_id FROM term_count_progress WHERE stream = ?", (stream,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def set_progress(conn, stream, last_id):
+    conn.execute('''
+    INSERT INTO term_count_progress (stream, last_id) VALUES (?, ?)
+    ON CONFLICT(stream) DO UPDATE SET last_id = excluded.last_id
+    ''', (stream, last_id))
+
+
+def add_term_counts(conn, stream, grouped_counts):
+    """{(bucket, source, lang): Counter} を集計テーブルに加算（コミットは呼び出し側）"""
+    rows = [(bucket, stream, source, lang, term, count)
+            for (bucket, source, lang), counts in grouped_counts.items()
+            for term, count in counts.items()]
+    conn.executemany('''
+    INSERT INTO term_counts_hourly (bucket, stream, source, lang, term, count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bucket, stream, source, lang, term) DO UPDATE SET count = count + excluded.count
+    ''', rows)
+    # 更新したバケットに新しい版を付ける（上の書き込みでロックを取った後なので版は重複しない）
+    buckets = sorted({bucket for bucket, _, _ in grouped_counts})
+    if buckets:
+        version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM term_count_buckets").fetchone()[0]
+        conn.executemany('''
+        INSERT INTO term_count_buckets (bucket, version) VALUES (?, ?)
+        ON CONFLICT(bucket) DO UPDATE SET version = excluded.version
+        ''', [(bucket, version) for bucket in buckets])
+
+
+def iter_term_totals(conn, stream, hours=24, min_count=1, lang=None, chunk_size=5000):
+    """過去 hours 時間の単語ごとの合計を (term, count) として順に返す
+
+    しきい値未満の単語はDB側で除くため、期間を長くしても返す件数は増えにくい。
+    結果はチャンク単位で読み込み、全件をメモリに載せない。
+    """
+    query = '''
+    SELECT term, SUM(count) FROM term_counts_hourly
+    WHERE stream = ? AND bucket >= ?
+    '''
+    params = [stream, window_start(hours)]
+    if lang:
+        query += " AND lang = ?"
+        params.append(lang)
+    query += " GROUP BY term"
+    if min_count > 1:
+        query += " HAVING SUM(count) >= ?"
+        params.append(min_count)
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def sum_term_counts(conn, stream, hours=24, lang=None, min_count=1):
+    """過去 hours 時間の単語カウントをバケットの合計として返す"""
+    return dict(iter_term_totals(conn, stream, hours, min_count, lang))
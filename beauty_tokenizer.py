@@ -0,0 +1,163 @@
+import os
+import re
+from beauty_language import JapaneseSegmenter
+
+# 英語のストップワード（NLTK stopwords コーパスの english と同じ内容）
+STOP_WORDS_EN = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself
+yourselves he him his himself she she's her hers herself it it's its itself they them
+their theirs themselves what which who whom this that that'll these those am is are was
+were be been being have has had having do does did doing a an the and but if or because
+as until while of at by for with about against between into through during before after
+above below to from up down in out on off over under again further then once here there
+when where why how all any both each few more most other some such no nor not only own
+same so than too very s t can will just don don't should should've now d ll m o re ve y
+ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven
+haven't isn isn't ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn
+shouldn't wasn wasn't weren weren't won won't wouldn wouldn't
+""".split())
+
+# 日本語のストップワード
+STOP_WORDS_JA = frozenset(["これ", "それ", "あれ", "この", "その", "あの", "ここ", "そこ", "あそこ", "こちら", "どこ", "だれ", "なに", "なん", "何", "私", "貴方", "貴方方", "我々", "私達", "あの人", "あのかた", "彼女", "彼", "です", "あります", "おります", "います", "は", "が", "の", "に", "を", "で", "と", "や", "へ", "から", "より", "も", "どの", "と", "し", "それで", "しかし"])
+
+# 使用するトークナイザー（'regex' または 'nltk'）
+TOKENIZER_BACKEND = os.getenv("BEAUTY_TOKENIZER", "regex")
+
+# NLTK (word_tokenize) が常に単語から切り離す記号と空白で分割する
+# カンマ・コロンは直後が数字でない場合のみ区切りとして扱う
+_SPLIT_RE = re.compile(r"""[\s;@#$%&?!*()\[\]{}<>"`«»“”‘’„\u2012-\u2015]+|\.{2,}|--|''|[:,](?!\d)""")
+# 語頭のアポストロフィ（短縮形の一部でない場合はNLTKが切り離す）
+_LEADING_QUOTE_RE = re.compile(r"^'(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)")
+# 語末の短縮形（'s, n't など）。NLTKはこれらを別トークンにする
+_CONTRACTION_RE = re.compile(r"(?<=[^' ])(?:'s|'m|'d|'ll|'re|'ve|n't|')$")
+# Punktが文末とみなさない略語（3文字以上のアルファベットのみ）
+_ABBREVIATIONS = frozenset("""
+mrs etc inc corp ltd est approx dept univ jan feb mar apr jun jul aug sep sept oct nov dec
+""".split())
+# NLTKが2語に分割する語
+_SPLIT_WORDS = {
+    "cannot": ("can", "not"),
+    "gonna": ("gon", "na"),
+    "gotta": ("got", "ta"),
+    "wanna": ("wan", "na"),
+    "lemme": ("lem", "me"),
+    "gimme": ("gim", "me"),
+}
+
+
+_ja_segmenter = None
+
+
+def tokenize_japanese(text):
+    """日本語テキストを辞書・文字種ベースで分割（どのバックエンドでも共通）"""
+    global _ja_segmenter
+    if _ja_segmenter is None:
+        _ja_segmenter = JapaneseSegmenter(stop_words=STOP_WORDS_JA | STOP_WORDS_EN)
+    if not text or not isinstance(text, str):
+        return []
+    return _ja_segmenter.segment(text)
+
+
+def _keep(word, stop_words):
+    return len(word) > 2 and word.isalpha() and word not in stop_words
+
+
+class RegexTokenizer:
+    """正規表現ベースの高速トークナイザー
+
+    小文字化・分割・ストップワード除去・長さと文字種のフィルタを1回の走査で行う。
+    英語の結果はNLTK経路（word_tokenize + 同じフィルタ）と一致するように作られている。
+    日本語は JapaneseSegmenter で分割する。
+    """
+
+    name = "regex"
+
+    def tokenize(self, text, lang='en'):
+        if lang == 'ja':
+            return tokenize_japanese(text)
+        if not text or not isinstance(text, str):
+            return []
+        stop_words = STOP_WORDS_EN
+        words = []
+        chunks = [chunk for chunk in _SPLIT_RE.split(text.lower()) if chunk]
+        last = len(chunks) - 1
+        for i, chunk in enumerate(chunks):
+            # 文末のピリオド（略語を除く）と語頭・語末の引用符、短縮形を切り離す
+            if chunk.endswith(".") and (i == last or chunk[:-1] not in _ABBREVIATIONS):
+                chunk = chunk[:-1]
+            chunk = _CONTRACTION_RE.sub("", _LEADING_QUOTE_RE.sub("", chunk))
+            if chunk in _SPLIT_WORDS:
+                words.extend(w for w in _SPLIT_WORDS[chunk] if _keep(w, stop_words))
+            elif _keep(chunk, stop_words):
+                words.append(chunk)
+        return words
+
+
+class NltkTokenizer:
+    """NLTK (Punkt + word_tokenize) によるトークナイザー（オプション）"""
+
+    name = "nltk"
+
+    def __init__(self):
+        import nltk
+        from nltk.corpus import stopwords
+        from nltk.tokenize import word_tokenize
+
+        # NLTKのダウンロード（初回のみ。NLTK 3.9以降は punkt_tab を使用）
+        for path, package in [('tokenizers/punkt', 'punkt'),
+                              ('tokenizers/punkt_tab', 'punkt_tab'),
+                              ('corpora/stopwords', 'stopwords')]:
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                nltk.download(package)
+
+        self._word_tokenize = word_tokenize
+        self._stop_words_en = set(stopwords.words('english'))
+
+    def tokenize(self, text, lang='en'):
+        if lang == 'ja':
+            return tokenize_japanese(text)
+        if not text or not isinstance(text, str):
+            return []
+        stop_words = self._stop_words_en
+
+        # トークン化
+        words = self._word_tokenize(text.lower())
+
+        # ストップワード、短い単語、数字を除去
+        return [word for word in words
+                if word not in stop_words
+                and len(word) > 2
+                and not word.isdigit()
+                and word.isalpha()]
+
+
+_BACKENDS = {
+    "regex": RegexTokenizer,
+    "nltk": NltkTokenizer,
+}
+_instances = {}
+
+
+def get_tokenizer(name=None):
+    """トークナイザーを取得（同じバックエンドは使い回す）"""
+    name = name or TOKENIZER_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"未知のトークナイザー: {name}")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+
+def compare_tokenizers(texts, lang='en', reference="nltk", candidate="regex"):
+    """参照コーパスで2つのトークナイザーの結果を比較し、一致しないテキストを返す"""
+    ref = get_tokenizer(reference)
+    cand = get_tokenizer(candidate)
+    mismatches = []
+    for text in texts:
+        expected = ref.tokenize(text, lang)
+        actual = cand.tokenize(text, lang)
+        if expected != actual:
+            mismatches.append((text, expected, actual))
+    return mismatches
@@ -1,17 +1,22 @@
-import pandas as pd
-import sqlite3
-import matplotlib.pyplot as plt
-import seaborn as sns
-import schedule
 import time
 import json
 import datetime
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from collections import Counter
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
 import os
 import logging
+from beauty_tokenizer import get_tokenizer
+from beauty_language import detect_language
+from beauty_trend_viz import TrendRenderer
+from beauty_metrics import metrics
+from beauty_storage import get_connection, FEEDS_DB, TRENDS_DB
+from beauty_dedup import setup_dedup_tables, indexed_position
+from beauty_burst import score_bursts
+from beauty_trend_store import (setup_trend_store, save_snapshot, load_recent_snapshots,
+                                apply_retention, compact_reports)
+from beauty_term_counts import (setup_term_count_tables, hour_bucket, get_progress,
+                                set_progress, add_term_counts, sum_term_counts)
 
 # ロギング設定
 logging.basicConfig(
@@ -21,56 +26,105 @@ logging.basicConfig(
 )
 logger = logging.getLogger("BeautyTrendMonitor")
 
-# NLTKのダウンロード（初回のみ）
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-
-# 日本語と英語のストップワード
-stop_words_en = set(stopwords.words('english'))
-# 日本語のストップワードは別途定義が必要
-stop_words_ja = set(["これ", "それ", "あれ", "この", "その", "あの", "ここ", "そこ", "あそこ", "こちら", "どこ", "だれ", "なに", "なん", "何", "私", "貴方", "貴方方", "我々", "私達", "あの人", "あのかた", "彼女", "彼", "です", "あります", "おります", "います", "は", "が", "の", "に", "を", "で", "と", "や", "へ", "から", "より", "も", "どの", "と", "し", "それで", "しかし"])
-
 # トレンド抽出設定
 TREND_THRESHOLD = 5  # 言及回数がこの値以上のキーワードをトレンドとみなす
+TERM_COUNT_CHUNK_SIZE = 5000  # 集計時にDBから一度に読み込む行数
+TERM_EXTRACTION_WORKERS = int(os.getenv("TERM_EXTRACTION_WORKERS", os.cpu_count() or 1))  # 単語カウントの並列数
+PARALLEL_MIN_TEXTS = 2000  # これ未満のテキスト数では並列化しない
+PARALLEL_CHUNK_SIZE = 2000  # 件数の分からない入力（ジェネレーター）をワーカーに渡す単位
+TREND_WINDOW_HOURS = 24  # トレンドを集計する期間（時間）
+TREND_TOP_K = 20  # 保存・表示するトレンドの件数
+# トレンドの順位付け: 'burst'（過去のペースからの急増度）または 'count'（期間内の出現回数）
+TREND_SCORING = os.getenv("BEAUTY_TREND_SCORING", "burst")
+
+def tokenize_text(text, lang='en'):
+    """1つのテキストをトークン化し、フィルタ済みの単語リストを返す
+
+    バックエンドは BEAUTY_TOKENIZER 環境変数で選択（既定は高速な 'regex'、'nltk' も可）。
+    """
+    return get_tokenizer().tokenize(text, lang)
+
+def _count_terms_chunk(items):
+    """(key, lang, text) のリストを key ごとにカウント（ワーカープロセスで実行）"""
+    partial = defaultdict(Counter)
+    for key, lang, text in items:
+        partial[key].update(tokenize_text(text, lang))
+    return partial
+
+def iter_chunks(iterable, size):
+    """イテラブルを size 件ずつのリストに分けて順に返す"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def count_terms_by_key(items, workers=None):
+    """(key, lang, text) を key ごとにカウント
+
+    テキスト数が PARALLEL_MIN_TEXTS 以上ならチャンクに分割してプロセスプールで
+    カウントし（map）、ワーカーごとのCounterをマージする（reduce）。
+    少量の場合やworkers=1の場合は逐次処理。
+    items はジェネレーターでもよく、その場合は処理中のチャンクだけをメモリに保持する。
+    """
+    if workers is None:
+        workers = TERM_EXTRACTION_WORKERS
+    
+    if workers <= 1:
+        return _count_terms_chunk(items)
+    
+    if hasattr(items, '__len__'):
+        if len(items) < PARALLEL_MIN_TEXTS:
+            return _count_terms_chunk(items)
+        # ワーカー間の負荷の偏りを抑えるため、ワーカー数より多めに分割
+        chunk_size = -(-len(items) // (workers * 4))
+    else:
+        # 件数が分からない場合は先頭を読んで並列化するか決める
+        items = iter(items)
+        head = list(islice(items, PARALLEL_MIN_TEXTS))
+        if len(head) < PARALLEL_MIN_TEXTS:
+            return _count_terms_chunk(head)
+        items = (item for chunk in (head, items) for item in chunk)
+        chunk_size = PARALLEL_CHUNK_SIZE
+    
+    merged = defaultdict(Counter)
+    
+    def merge(done):
+        for future in done:
+            for key, counts in future.result().items():
+                merged[key].update(counts)
+    
+    # 送り出すチャンクはワーカー数の2倍までにし、読み込みが集計を追い越さないようにする
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in iter_chunks(items, chunk_size):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                merge(done)
+            pending.add(executor.submit(_count_terms_chunk, chunk))
+        merge(pending)
+    return merged
 
 class BeautyTrendMonitor:
     def __init__(self):
         self.setup_dirs()
         self.current_trends = {}
-        self.trend_history = []
+        self.renderer = TrendRenderer()
         
     def setup_dirs(self):
         """必要なディレクトリを作成"""
         os.makedirs("reports", exist_ok=True)
         os.makedirs("visualizations", exist_ok=True)
     
-    def extract_trending_terms(self, texts, lang='en'):
+    def count_terms(self, texts, lang='en', workers=None):
+        """テキストコレクションの単語出現回数をカウント"""
+        items = ((None, lang, text) for text in texts)
+        return count_terms_by_key(items, workers).get(None, Counter())
+    
+    def extract_trending_terms(self, texts, lang='en', workers=None):
         """テキストコレクションからトレンドワードを抽出"""
-        all_words = []
-        stop_words = stop_words_en if lang == 'en' else stop_words_ja
-        
-        for text in texts:
-            if not text or not isinstance(text, str):
-                continue
-                
-            # トークン化
-            words = word_tokenize(text.lower())
-            
-            # ストップワード、短い単語、数字を除去
-            filtered_words = [word for word in words 
-                             if word not in stop_words 
-                             and len(word) > 2 
-                             and not word.isdigit()
-                             and word.isalpha()]
-            
-            all_words.extend(filtered_words)
-        
-        # 出現頻度をカウント
-        word_counts = Counter(all_words)
+        word_counts = self.count_terms(texts, lang, workers)
         
         # しきい値以上の単語を抽出
         trending_terms = {word: count for word, count in word_counts.items() 
@@ -78,39 +132,118 @@ class BeautyTrendMonitor:
         
         return trending_terms
     
-    def analyze_rss_trends(self):
-        """RSSフィードからトレンド抽出"""
+    def _ingest_term_counts(self, conn, stream, rows, progress_key=None):
+        """(id, bucket, source, lang, texts) の行をトークン化して集計テーブルに加算"""
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        
+        # (bucket, source, lang) ごとにまとめてカウント（件数が多ければ並列）
+        items = [((bucket, source, lang), lang, text)
+                 for _, bucket, source, lang, texts in rows
+                 for text in texts]
+        with metrics.timer("beauty_trends_tokenize_seconds", stream=stream):
+            grouped = count_terms_by_key(items)
+        metrics.inc("beauty_trends_texts_total", len(items), stream=stream)
+        
+        # 集計結果と処理済み位置を同一トランザクションで保存
+        with metrics.timer("beauty_trends_db_seconds", stream=stream, operation="add_counts"):
+            with conn:
+                add_term_counts(conn, stream, grouped)
+                set_progress(conn, progress_key or stream, last_id)
+    
+    def update_rss_term_counts(self, conn):
+        """未集計のRSS記事だけをトークン化して時間別集計に加算
+
+        近似重複インデックスに登録済みの記事だけを対象にし、
+        同じ記事のクラスタからは代表の1件だけを数える。
+        """
+        last_id = get_progress(conn, 'rss')
+        feeds_conn = get_connection(FEEDS_DB)
+        setup_dedup_tables(feeds_conn)
+        cursor = feeds_conn.cursor()
+        cursor.execute('''
+        SELECT a.id, a.title, a.summary, a.source, a.added_date, m.cluster_id
+        FROM beauty_articles a
+        JOIN article_minhash m ON m.article_id = a.id
+        WHERE a.id > ? AND a.id <= ?
+        ORDER BY a.id
+        ''', (last_id, indexed_position(feeds_conn)))
+        
+        processed = 0
+        while True:
+            chunk = cursor.fetchmany(TERM_COUNT_CHUNK_SIZE)
+            if not chunk:
+                break
+            rows = []
+            for row_id, title, summary, source, added_date, cluster_id in chunk:
+                if cluster_id != row_id:
+                    # 重複記事は数えない（処理済み位置は進める）
+                    metrics.inc("beauty_trends_duplicates_skipped_total", stream='rss')
+                    rows.append((row_id, hour_bucket(added_date), source, None, []))
+                    continue
+                # 文字種の割合で言語を判定
+                lang = detect_language(f"{title or ''} {summary or ''}")
+                rows.append((row_id, hour_bucket(added_date), source, lang, [title, summary]))
+            self._ingest_term_counts(conn, 'rss', rows)
+            processed += len(chunk)
+        
+        if processed:
+            logger.info(f"RSS記事{processed}件を時間別集計に追加")
+        return processed
+    
+    def _iter_new_tweets(self, cursor):
+        """カーソルからツイートを1件ずつ読み、(id, バケット, ソース, 言語, [本文]) にして返す"""
+        while True:
+            chunk = cursor.fetchmany(TERM_COUNT_CHUNK_SIZE)
+            if not chunk:
+                return
+            for row_id, text, collection_date in chunk:
+                # 文字種の割合で英語と日本語のツイートを振り分け
+                yield (row_id, hour_bucket(collection_date), 'twitter', detect_language(text), [text])
+    
+    def update_twitter_term_counts(self, conn):
+        """未集計のツイートだけをトークン化して時間別集計に加算
+
+        カーソルからの読み込み・言語判定・集計をジェネレーターでつなぎ、
+        メモリに載るのは TERM_COUNT_CHUNK_SIZE 件分だけにする。
+        """
+        # ツイートはIDで重複排除済みのため、各ツイートは1回だけ集計される
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tweets'")
+        if not cursor.fetchone():
+            return 0
+        
+        last_id = get_progress(conn, 'tweets')
+        cursor.execute('''
+        SELECT id, text, collection_date 
+        FROM tweets 
+        WHERE id > ? 
+        ORDER BY id
+        ''', (last_id,))
+        
+        processed = 0
+        for rows in iter_chunks(self._iter_new_tweets(cursor), TERM_COUNT_CHUNK_SIZE):
+            self._ingest_term_counts(conn, 'twitter', rows, progress_key='tweets')
+            processed += len(rows)
+        
+        if processed:
+            logger.info(f"ツイート{processed}件を時間別集計に追加")
+        return processed
+    
+    def analyze_rss_trends(self, hours=TREND_WINDOW_HOURS):
+        """RSSフィードからトレンド抽出（時間別集計の合計）"""
         try:
-            conn = sqlite3.connect('beauty_feeds.db')
+            conn = get_connection(TRENDS_DB)
+            setup_term_count_tables(conn)
             
-            # 過去24時間の記事を取得
-            df = pd.read_sql_query('''
-            SELECT title, summary, source 
-            FROM beauty_articles 
-            WHERE added_date >= datetime('now', '-1 day')
-            ''', conn)
+            # 新しい記事だけを集計してから、期間内のバケットを合計
+            self.update_rss_term_counts(conn)
+            with metrics.timer("beauty_trends_db_seconds", stream='rss', operation="sum_counts"):
+                # しきい値未満の単語はDB側で除く（期間が長くても結果の件数はトレンド語の数まで）
+                all_trends = sum_term_counts(conn, 'rss', hours, min_count=TREND_THRESHOLD)
             
-            if df.empty:
-                logger.info("過去24時間のRSS記事がありません")
-                return {}
-            
-            # 英語と日本語の記事を分離
-            # 簡易的に最初の文字のUnicodeコードポイントで判断
-            jp_mask = df['title'].apply(lambda x: ord(str(x)[0]) > 1000 if x and isinstance(x, str) else False)
-            
-            df_en = df[~jp_mask]
-            df_jp = df[jp_mask]
-            
-            # トレンド抽出
-            en_titles = df_en['title'].tolist() + df_en['summary'].tolist()
-            jp_titles = df_jp['title'].tolist() + df_jp['summary'].tolist()
-            
-            en_trends = self.extract_trending_terms(en_titles, 'en')
-            jp_trends = self.extract_trending_terms(jp_titles, 'ja')
-            
-            # 結合
-            all_trends = {**en_trends, **jp_trends}
-            logger.info(f"RSSから{len(all_trends)}個のトレンドキーワードを抽出")
+            logger.info(f"RSSから{len(all_trends)}個のトレンドキーワードを抽出（過去{hours}時間）")
             
             return all_trends
             
@@ -118,42 +251,19 @@ class BeautyTrendMonitor:
             logger.error(f"RSS分析エラー: {e}")
             return {}
     
-    def analyze_twitter_trends(self):
-        """Twitterデータからトレンド抽出"""
+    def analyze_twitter_trends(self, hours=TREND_WINDOW_HOURS):
+        """Twitterデータからトレンド抽出（時間別集計の合計）"""
         try:
-            conn = sqlite3.connect('beauty_trends.db')
-            
-            # 過去24時間のTwitterデータを取得
-            df = pd.read_sql_query('''
-            SELECT keyword, tweets_text 
-            FROM twitter_trends 
-            WHERE collection_date >= datetime('now', '-1 day')
-            ''', conn)
-            
-            if df.empty:
-                logger.info("過去24時間のTwitterデータがありません")
-                return {}
-            
-            # 各キーワードごとのツイートをパース
-            all_tweets = []
-            for _, row in df.iterrows():
-                try:
-                    tweets = json.loads(row['tweets_text'])
-                    all_tweets.extend(tweets)
-                except:
-                    continue
+            conn = get_connection(TRENDS_DB)
+            setup_term_count_tables(conn)
             
-            # 英語と日本語のツイートを分離（簡易的に）
-            jp_tweets = [t for t in all_tweets if t and isinstance(t, str) and ord(t[0]) > 1000]
-            en_tweets = [t for t in all_tweets if t and isinstance(t, str) and t not in jp_tweets]
+            # 新しいデータだけを集計してから、期間内のバケットを合計
+            self.update_twitter_term_counts(conn)
+            with metrics.timer("beauty_trends_db_seconds", stream='twitter', operation="sum_counts"):
+                # しきい値未満の単語はDB側で除く（期間が長くても結果の件数はトレンド語の数まで）
+                all_trends = sum_term_counts(conn, 'twitter', hours, min_count=TREND_THRESHOLD)
             
-            # トレンド抽出
-            en_trends = self.extract_trending_terms(en_tweets, 'en')
-            jp_trends = self.extract_trending_terms(jp_tweets, 'ja')
-            
-            # 結合
-            all_trends = {**en_trends, **jp_trends}
-            logger.info(f"Twitterから{len(all_trends)}個のトレンドキーワードを抽出")
+            logger.info(f"Twitterから{len(all_trends)}個のトレンドキーワードを抽出（過去{hours}時間）")
             
             return all_trends
             
@@ -161,13 +271,37 @@ class BeautyTrendMonitor:
             logger.error(f"Twitter分析エラー: {e}")
             return {}
     
-    def update_trends(self):
-        """全ソースからのトレンドを更新"""
-        logger.info("トレンド更新処理開始")
-        
+    def update_trends(self, hours=TREND_WINDOW_HOURS):
+        """全ソースからのトレンドを更新（過去 hours 時間の集計）"""
+        with metrics.run("trends"):
+            return self._update_trends(hours)
+    
+    def analyze_bursts(self, hours=TREND_WINDOW_HOURS):
+        """RSSとTwitterを合わせた単語×時間の行列から、直近 hours 時間に急増した単語を抽出
+
+        [(単語, 出現回数, スコア)] をスコアの高い順に返す。
+        """
+        try:
+            conn = get_connection(TRENDS_DB)
+            setup_term_count_tables(conn)
+            
+            # 新しいデータだけを集計に加えてから、集計テーブルで比較する
+            self.update_rss_term_counts(conn)
+            self.update_twitter_term_counts(conn)
+            with metrics.timer("beauty_trends_score_seconds"):
+                bursts = score_bursts(conn, hours, TREND_TOP_K)
+            logger.info(f"{len(bursts)}個の急増キーワードを抽出（過去{hours}時間）")
+            return bursts
+            
+        except Exception as e:
+            logger.error(f"急増キーワードの分析エラー: {e}")
+            return []
+    
+    def _top_by_count(self, hours):
+        """RSSとTwitterのトレンドを合算し、出現回数の多い順に上位を返す"""
         # 各ソースからトレンドを取得
-        rss_trends = self.analyze_rss_trends()
-        twitter_trends = self.analyze_twitter_trends()
+        rss_trends = self.analyze_rss_trends(hours)
+        twitter_trends = self.analyze_twitter_trends(hours)
         
         # トレンドをマージ
         all_trends = {}
@@ -183,62 +317,74 @@ class BeautyTrendMonitor:
         # 重要度でソート
         sorted_trends = dict(sorted(all_trends.items(), key=lambda x: x[1], reverse=True))
         
-        # トップ20のトレンドを保存
-        top_trends = {k: sorted_trends[k] for k in list(sorted_trends)[:20]} if sorted_trends else {}
+        # 上位のトレンドを保存
+        return {k: sorted_trends[k] for k in list(sorted_trends)[:TREND_TOP_K]} if sorted_trends else {}
+    
+    def _update_trends(self, hours=TREND_WINDOW_HOURS):
+        logger.info(f"トレンド更新処理開始（過去{hours}時間）")
+        
+        scores = None
+        if TREND_SCORING == 'burst':
+            # 急増度の順に並べる（値はグラフ・履歴用に期間内の出現回数）
+            bursts = self.analyze_bursts(hours)
+            top_trends = {term: count for term, count, _ in bursts}
+            scores = {term: score for term, _, score in bursts}
+        else:
+            top_trends = self._top_by_count(hours)
         
         # 時刻とともに保存
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.current_trends = {"timestamp": timestamp, "trends": top_trends}
-        self.trend_history.append(self.current_trends)
-        
-        # 履歴は最大100エントリまで保持
-        if len(self.trend_history) > 100:
-            self.trend_history.pop(0)
+        if scores is not None:
+            self.current_trends["scores"] = scores
         
-        # レポート生成
+        # レポート生成（履歴は時系列ストアに保存）
         self.generate_trend_report()
         self.visualize_trends()
         
         logger.info(f"トレンド更新完了: {len(top_trends)}個のトレンドを検出")
         return top_trends
     
+    @property
+    def trend_history(self):
+        """直近100回分のトレンド履歴（時系列ストアから読み込み）"""
+        conn = get_connection(TRENDS_DB)
+        setup_trend_store(conn)
+        return load_recent_snapshots(conn, 100)
+    
     def generate_trend_report(self):
-        """トレンドレポートをJSON形式で保存"""
+        """トレンドを時系列ストアに保存し、最新レポートをJSON形式で上書き保存"""
         if not self.current_trends:
             return
-            
-        timestamp = self.current_trends["timestamp"].replace(":", "-").replace(" ", "_")
-        filename = f"reports/beauty_trends_{timestamp}.json"
         
+        conn = get_connection(TRENDS_DB)
+        setup_trend_store(conn)
+        with metrics.timer("beauty_trends_db_seconds", stream='all', operation="save_snapshot"):
+            save_snapshot(conn, self.current_trends)
+        # 保持期間を過ぎたスナップショットは日次に集約
+        apply_retention(conn)
+        
+        filename = "reports/beauty_trends_latest.json"
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(self.current_trends, f, ensure_ascii=False, indent=2)
         
         logger.info(f"トレンドレポート保存: {filename}")
     
+    def compact_reports(self):
+        """過去に出力したレポートJSONを時系列ストアに取り込んで削除"""
+        conn = get_connection(TRENDS_DB)
+        setup_trend_store(conn)
+        return compact_reports(conn, "reports")
+    
     def visualize_trends(self):
-        """トレンド可視化（棒グラフ）"""
-        if not self.current_trends or not self.current_trends.get("trends"):
-            return
-        
-        trends = self.current_trends["trends"]
-        timestamp = self.current_trends["timestamp"].replace(":", "-").replace(" ", "_")
-        
-        # トップ15のトレンドを可視化
-        top_n = dict(list(trends.items())[:15])
-        
-        plt.figure(figsize=(12, 8))
-        sns.barplot(x=list(top_n.values()), y=list(top_n.keys()))
-        plt.title(f"美容トレンドワード分析: {self.current_trends['timestamp']}")
-        plt.xlabel("言及回数")
-        plt.ylabel("トレンドキーワード")
-        plt.tight_layout()
-        
-        # 保存
-        filename = f"visualizations/trend_viz_{timestamp}.png"
-        plt.savefig(filename)
-        plt.close()
-        
-        logger.info(f"トレンド可視化保存: {filename}")
+        """トレンド可視化（棒グラフ）をバックグラウンドで描画（前回と同じ内容ならスキップ）"""
+        return self.renderer.submit(self.current_trends)
+    
+    def render_history(self, limit=100):
+        """時系列ストアの直近 limit 回分のトレンドを一括で描画し、保存したファイル名を返す"""
+        conn = get_connection(TRENDS_DB)
+        setup_trend_store(conn)
+        return self.renderer.render_series(load_recent_snapshots(conn, limit))
     
     def run_scheduled_job(self):
         """定期実行ジョブ"""
@@ -246,6 +392,8 @@ class BeautyTrendMonitor:
     
     def start_monitoring(self):
         """モニタリング開始"""
+        import schedule
+        
         logger.info("美容トレンド監視システム起動")
         
         # 初回実行
@@ -0,0 +1,152 @@
+import datetime
+import glob
+import json
+import logging
+import os
+
+logger = logging.getLogger("BeautyTrendMonitor")
+
+# 保持期間
+TREND_RAW_RETENTION_DAYS = 30      # スナップショット単位のデータを保持する日数
+TREND_DAILY_RETENTION_DAYS = 730   # 日次に集約したデータを保持する日数
+
+
+def setup_trend_store(conn):
+    """トレンドの時系列テーブルを作成"""
+    cursor = conn.cursor()
+    # スナップショット単位（update_trends 1回ごと）
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS trend_snapshots (
+        ts TEXT,
+        term TEXT,
+        count INTEGER,
+        rank INTEGER,
+        PRIMARY KEY (ts, term)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_trend_snapshots_term_ts
+    ON trend_snapshots (term, ts)
+    ''')
+    # 保持期間を過ぎたスナップショットを日次に集約したもの
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS trend_snapshots_daily (
+        day TEXT,
+        term TEXT,
+        max_count INTEGER,
+        sum_count INTEGER,
+        samples INTEGER,
+        PRIMARY KEY (day, term)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_trend_snapshots_daily_term_day
+    ON trend_snapshots_daily (term, day)
+    ''')
+    conn.commit()
+
+
+def save_snapshot(conn, snapshot):
+    """{"timestamp": ..., "trends": {term: count}} 形式のスナップショットを保存"""
+    rows = [(snapshot["timestamp"], term, count, rank)
+            for rank, (term, count) in enumerate(snapshot["trends"].items(), 1)]
+    with conn:
+        conn.executemany('''
+        INSERT OR REPLACE INTO trend_snapshots (ts, term, count, rank) VALUES (?, ?, ?, ?)
+        ''', rows)
+    return len(rows)
+
+
+def load_recent_snapshots(conn, limit=100):
+    """直近のスナップショットを古い順に返す"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT ts, term, count FROM trend_snapshots
+    WHERE ts IN (SELECT DISTINCT ts FROM trend_snapshots ORDER BY ts DESC LIMIT ?)
+    ORDER BY ts, rank
+    ''', (limit,))
+    snapshots = []
+    for ts, term, count in cursor.fetchall():
+        if not snapshots or snapshots[-1]["timestamp"] != ts:
+            snapshots.append({"timestamp": ts, "trends": {}})
+        snapshots[-1]["trends"][term] = count
+    return snapshots
+
+
+def _days_ago(days):
+    return (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def term_history(conn, term, days=30, resolution="raw"):
+    """単語の推移を返す（resolution: 'raw' / 'hour' / 'day'）
+
+    'day' の場合は日次に集約済みの古いデータも含める（値は日ごとの最大値）。
+    """
+    since = _days_ago(days)
+    cursor = conn.cursor()
+    if resolution == "raw":
+        cursor.execute('''
+        SELECT ts, count FROM trend_snapshots
+        WHERE term = ? AND ts >= ?
+        ORDER BY ts
+        ''', (term, since))
+    elif resolution == "hour":
+        cursor.execute('''
+        SELECT substr(ts, 1, 13) || ':00:00' AS bucket, MAX(count) FROM trend_snapshots
+        WHERE term = ? AND ts >= ?
+        GROUP BY bucket ORDER BY bucket
+        ''', (term, since))
+    elif resolution == "day":
+        cursor.execute('''
+        SELECT day, MAX(max_count) FROM (
+            SELECT substr(ts, 1, 10) AS day, count AS max_count FROM trend_snapshots
+            WHERE term = ? AND ts >= ?
+            UNION ALL
+            SELECT day, max_count FROM trend_snapshots_daily
+            WHERE term = ? AND day >= ?
+        )
+        GROUP BY day ORDER BY day
+        ''', (term, since, term, since[:10]))
+    else:
+        raise ValueError(f"未対応の粒度: {resolution}")
+    return cursor.fetchall()
+
+
+def apply_retention(conn, raw_days=TREND_RAW_RETENTION_DAYS, daily_days=TREND_DAILY_RETENTION_DAYS):
+    """保持期間を過ぎたスナップショットを日次に集約して削除し、古い日次データも削除"""
+    raw_cutoff = _days_ago(raw_days)
+    daily_cutoff = _days_ago(daily_days)[:10]
+    with conn:
+        conn.execute('''
+        INSERT INTO trend_snapshots_daily (day, term, max_count, sum_count, samples)
+        SELECT substr(ts, 1, 10), term, MAX(count), SUM(count), COUNT(*)
+        FROM trend_snapshots WHERE ts < ?
+        GROUP BY substr(ts, 1, 10), term
+        ON CONFLICT(day, term) DO UPDATE SET
+            max_count = MAX(max_count, excluded.max_count),
+            sum_count = sum_count + excluded.sum_count,
+            samples = samples + excluded.samples
+        ''', (raw_cutoff,))
+        folded = conn.execute("DELETE FROM trend_snapshots WHERE ts < ?", (raw_cutoff,)).rowcount
+        conn.execute("DELETE FROM trend_snapshots_daily WHERE day < ?", (daily_cutoff,))
+    return folded
+
+
+def compact_reports(conn, reports_dir="reports", remove=True):
+    """reports/beauty_trends_*.json をストアに取り込み、取り込んだファイルを削除"""
+    imported = 0
+    for path in sorted(glob.glob(os.path.join(reports_dir, "beauty_trends_*.json"))):
+        if path.endswith("_latest.json"):
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            save_snapshot(conn, snapshot)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"レポートの取り込みに失敗しました ({path}): {e}")
+            continue
+        if remove:
+            os.remove(path)
+        imported += 1
+    logger.info(f"トレンドレポート{imported}件をストアに取り込み")
+    return imported
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("BeautyTrendMonitor")
+
+# 可視化設定
+VISUALIZATION_DIR = "visualizations"
+VISUALIZATION_TOP_N = 15  # 可視化するトレンド数
+
+
+def trend_fingerprint(trends, top_n=VISUALIZATION_TOP_N):
+    """描画内容（上位N件の単語と回数）のフィンガープリント"""
+    payload = json.dumps(list(trends.items())[:top_n], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _new_figure():
+    """ヘッドレス（Agg）で描画するFigureを作成（pyplotのグローバル状態を使わない）"""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    return Figure(figsize=(12, 8))
+
+
+def _draw_snapshot(fig, snapshot, top_n):
+    import seaborn as sns
+
+    top = dict(list(snapshot["trends"].items())[:top_n])
+    ax = fig.add_subplot()
+    sns.barplot(x=list(top.values()), y=list(top.keys()), ax=ax)
+    ax.set_title(f"美容トレンドワード分析: {snapshot['timestamp']}")
+    ax.set_xlabel("言及回数")
+    ax.set_ylabel("トレンドキーワード")
+    fig.tight_layout()
+
+
+def _snapshot_filename(out_dir, snapshot):
+    timestamp = snapshot["timestamp"].replace(":", "-").replace(" ", "_")
+    return os.path.join(out_dir, f"trend_viz_{timestamp}.png")
+
+
+class TrendRenderer:
+    """トレンドの可視化をバックグラウンドで行う
+
+    直前に描画した内容と同じ場合は描画をスキップする。
+    描画は専用のワーカースレッド1本で行い、トレンド計算をブロックしない。
+    """
+
+    def __init__(self, out_dir=VISUALIZATION_DIR, top_n=VISUALIZATION_TOP_N):
+        self.out_dir = out_dir
+        self.top_n = top_n
+        self._state_path = os.path.join(out_dir, ".last_fingerprint")
+        self._lock = threading.Lock()
+        self._last_fingerprint = self._load_fingerprint()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+
+    def _load_fingerprint(self):
+        try:
+            with open(self._state_path, encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _save_fingerprint(self, fingerprint):
+        with open(self._state_path, "w", encoding="utf-8") as f:
+            f.write(fingerprint)
+
+    def submit(self, snapshot):
+        """スナップショットの描画を予約（変化がなければNoneを返す）"""
+        if not snapshot or not snapshot.get("trends"):
+            return None
+        fingerprint = trend_fingerprint(snapshot["trends"], self.top_n)
+        with self._lock:
+            if fingerprint == self._last_fingerprint:
+                logger.info("トレンドに変化がないため可視化をスキップ")
+                return None
+            self._last_fingerprint = fingerprint
+        return self._executor.submit(self._render, snapshot, fingerprint)
+
+    def _render(self, snapshot, fingerprint):
+        try:
+            fig = _new_figure()
+            _draw_snapshot(fig, snapshot, self.top_n)
+            filename = _snapshot_filename(self.out_dir, snapshot)
+            fig.savefig(filename)
+            self._save_fingerprint(fingerprint)
+            logger.info(f"トレンド可視化保存: {filename}")
+            return filename
+        except Exception as e:
+            logger.error(f"トレンド可視化エラー: {e}")
+            # 次回は同じ内容でも描画し直す
+            with self._lock:
+                if self._last_fingerprint == fingerprint:
+                    self._last_fingerprint = None
+            return None
+
+    def render_series(self, snapshots):
+        """複数のスナップショットを1つのFigureを使い回して一括描画（同じ内容の連続はスキップ）"""
+        fig = _new_figure()
+        filenames = []
+        previous = None
+        for snapshot in snapshots:
+            if not snapshot.get("trends"):
+                continue
+            fingerprint = trend_fingerprint(snapshot["trends"], self.top_n)
+            if fingerprint == previous:
+                continue
+            previous = fingerprint
+            fig.clf()
+            _draw_snapshot(fig, snapshot, self.top_n)
+            filename = _snapshot_filename(self.out_dir, snapshot)
+            fig.savefig(filename)
+            filenames.append(filename)
+        logger.info(f"トレンド可視化を一括保存: {len(filenames)}件")
+        return filenames
+
+    def wait(self):
+        """予約済みの描画がすべて終わるまで待つ"""
+        self._executor.submit(lambda: None).result()
@@ -0,0 +1,168 @@
+import os
+import time
+import requests
+from beauty_keyword_matcher import get_matcher
+from beauty_metrics import metrics
+
+# 検索クエリの設定
+TWITTER_API_BASE_URL = os.getenv("TWITTER_API_BASE_URL", "https://api.twitter.com")
+TWITTER_QUERY_MAX_LENGTH = 512   # recent search のクエリ長上限
+TWITTER_QUERY_SUFFIX = "-is:retweet"
+TWITTER_MAX_RESULTS = 100        # 1リクエストあたりの最大件数
+# 1クエリあたりの最大ページ数（0なら上限なし。クォータに余裕がある間だけ次ページを取得する）
+TWITTER_MAX_PAGES = int(os.getenv("TWITTER_MAX_PAGES", 0))
+TWITTER_REQUEST_TIMEOUT = 30
+
+
+def format_query_term(keyword):
+    """キーワードを検索クエリ用の語に変換（記号や空白を含む場合は引用符で囲む）"""
+    if all(char.isalnum() for char in keyword):
+        return keyword
+    return '"' + keyword.replace('"', '') + '"'
+
+
+def _build_query(terms):
+    if len(terms) == 1:
+        return f"{terms[0]} {TWITTER_QUERY_SUFFIX}"
+    return f"({' OR '.join(terms)}) {TWITTER_QUERY_SUFFIX}"
+
+
+class QueryBatch:
+    """OR結合した1つの検索クエリと、その対象キーワード"""
+
+    def __init__(self, query, keywords, since_id=None, until_id=None):
+        self.query = query
+        self.keywords = keywords
+        self.since_id = since_id
+        self.until_id = until_id
+
+    def __repr__(self):
+        return f"QueryBatch({self.query!r}, since_id={self.since_id!r}, until_id={self.until_id!r})"
+
+
+def plan_queries(keywords, since_ids=None, until_ids=None, max_length=TWITTER_QUERY_MAX_LENGTH):
+    """キーワードをクエリ長の上限までOR結合したクエリに詰め込む
+
+    since_id はバッチ内で最も古いもの（1つでも未取得のキーワードがあれば指定なし）を使う。
+    until_id は前回ページングを途中で打ち切ったキーワードの再開位置で、バッチ内の全キーワードが
+    再開待ちの場合だけ最も新しいものを使う（それ以外は最新から取得し直す）。
+    重複して取得したツイートは保存時にIDで除外される。
+    """
+    since_ids = since_ids or {}
+    until_ids = until_ids or {}
+    batches = []
+    current_keywords = []
+    current_terms = []
+
+    def flush():
+        if not current_keywords:
+            return
+        ids = [since_ids.get(k) for k in current_keywords]
+        since_id = None if None in ids else min(ids, key=int)
+        ids = [until_ids.get(k) for k in current_keywords]
+        until_id = None if None in ids else max(ids, key=int)
+        batches.append(QueryBatch(_build_query(current_terms), list(current_keywords), since_id,
+                                  until_id))
+        current_keywords.clear()
+        current_terms.clear()
+
+    for keyword in keywords:
+        term = format_query_term(keyword)
+        if current_terms and len(_build_query(current_terms + [term])) > max_length:
+            flush()
+        current_keywords.append(keyword)
+        current_terms.append(term)
+    flush()
+
+    return batches
+
+
+def attribute_tweets(tweets, keywords):
+    """取得したツイートを本文に含まれるキーワードに振り分ける"""
+    matcher = get_matcher(keywords)
+    attributed = {keyword: [] for keyword in keywords}
+    for tweet in tweets:
+        for keyword in matcher.extract(tweet.get("text", "")):
+            attributed[keyword].append(tweet)
+    return attributed
+
+
+class RateLimiter:
+    """レート制限ヘッダー（x-rate-limit-remaining / reset）に基づいてリクエストを調整"""
+
+    def __init__(self, sleep=time.sleep, clock=time.time):
+        self.remaining = None
+        self.reset_at = None
+        self._sleep = sleep
+        self._clock = clock
+
+    def update(self, headers):
+        remaining = headers.get("x-rate-limit-remaining")
+        reset_at = headers.get("x-rate-limit-reset")
+        if remaining is not None:
+            self.remaining = int(remaining)
+        if reset_at is not None:
+            self.reset_at = int(reset_at)
+
+    def exhausted(self, headers):
+        """429応答を受けたとき（リセット時刻が不明なら1分後に再試行）"""
+        self.remaining = 0
+        if headers.get("x-rate-limit-reset") is None:
+            self.reset_at = int(self._clock()) + 60
+
+    def wait(self):
+        """残りリクエスト数が0ならリセット時刻まで待機"""
+        if self.remaining is None or self.remaining > 0 or self.reset_at is None:
+            return
+        delay = self.reset_at - self._clock() + 1
+        if delay > 0:
+            print(f"レート制限に達したため {int(delay)} 秒待機します")
+            self._sleep(delay)
+        self.remaining = None
+
+    def has_spare(self, reserved):
+        """予定しているリクエスト数を残しても余裕があるか（不明な場合は余裕なしとみなす）"""
+        return self.remaining is not None and self.remaining > reserved
+
+
+class RecentSearchClient:
+    """Twitter API v2 recent search のクライアント（ベースURLを差し替え可能）"""
+
+    def __init__(self, bearer_token, base_url=None, timeout=TWITTER_REQUEST_TIMEOUT,
+                 rate_limiter=None):
+        self.base_url = (base_url or TWITTER_API_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.rate_limit = rate_limiter or RateLimiter()
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {bearer_token}"
+
+    def search(self, query, since_id=None, next_token=None, max_results=TWITTER_MAX_RESULTS,
+               until_id=None):
+        """1ページ分を検索し、レスポンスのJSONを返す（429の場合はリセットまで待って再試行）"""
+        params = {
+            "query": query,
+            "max_results": max_results,
+            "tweet.fields": "created_at,public_metrics",
+        }
+        if since_id:
+            params["since_id"] = since_id
+        if until_id:
+            params["until_id"] = until_id
+        if next_token:
+            params["next_token"] = next_token
+
+        while True:
+            self.rate_limit.wait()
+            with metrics.timer("beauty_twitter_api_seconds", endpoint="search_recent"):
+                response = self.session.get(f"{self.base_url}/2/tweets/search/recent",
+                                            params=params, timeout=self.timeout)
+            metrics.inc("beauty_twitter_api_requests_total", endpoint="search_recent",
+                        status=str(response.status_code))
+            self.rate_limit.update(response.headers)
+            if self.rate_limit.remaining is not None:
+                metrics.set("beauty_twitter_rate_limit_remaining", self.rate_limit.remaining)
+            if response.status_code == 429:
+                self.rate_limit.exhausted(response.headers)
+                continue
+            response.raise_for_status()
+            return response.json()
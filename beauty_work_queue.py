@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from beauty_storage import connect
+
+logger = logging.getLogger("BeautyWorkQueue")
+
+# 作業キューの設定
+QUEUE_BACKEND = os.getenv("BEAUTY_QUEUE_BACKEND", "sqlite")
+QUEUE_DB = os.getenv("BEAUTY_QUEUE_DB", "beauty_queue.db")
+# キューだけ別のジャーナルモードにする場合に指定（省略時は BEAUTY_SQLITE_JOURNAL_MODE に従う）
+QUEUE_JOURNAL_MODE = os.getenv("BEAUTY_QUEUE_JOURNAL_MODE")
+WORK_LEASE_SECONDS = 10 * 60      # 取得した作業の期限（過ぎると他のワーカーが取得できる）
+WORK_HEARTBEAT_SECONDS = 60       # 処理中はこの間隔で期限を延長する
+WORK_MAX_ATTEMPTS = 3             # 失敗・期限切れを含めた最大試行回数
+WORK_RETRY_BASE = 60              # 1回目の失敗後の再試行までの秒数（以降は倍）
+WORK_MAX_RETRY_DELAY = 60 * 60
+WORK_POLL_INTERVAL = 5            # キューが空のときの確認間隔（秒）
+WORK_RETENTION_DAYS = 7           # 完了・失敗した作業を残す日数
+
+
+def default_worker_id():
+    """ホスト名とプロセスIDからワーカーIDを作る"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkItem:
+    """ワーカーが取得した作業（lease_token はこの取得を識別し、期限切れ後の完了報告を無視するのに使う）"""
+
+    def __init__(self, item_id, kind, key, payload, attempts, max_attempts, lease_token):
+        self.id = item_id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.lease_token = lease_token
+
+    def __repr__(self):
+        return f"WorkItem({self.id}, {self.kind!r}, {self.key!r}, attempt={self.attempts})"
+
+
+class SQLiteWorkQueue:
+    """SQLiteのテーブルを使った作業キュー
+
+    - 作業は pending -> leased -> done / failed と遷移する
+    - claim は書き込みロック（BEGIN IMMEDIATE）の中で取得するため、同じ作業を2つのワーカーが同時に持つことはない
+    - 期限（リース）内に完了しなかった作業は、ワーカーが落ちたものとみなして再び取得できる
+    - 同じ (kind, key) の作業は未完了のものが1件だけになるよう、重複して追加しない
+
+    別のバックエンドを使う場合は enqueue / claim / extend / complete / fail / stats / purge を
+    同じ引数で実装し、_BACKENDS に登録する。
+    """
+
+    def __init__(self, db_path=None, journal_mode=None):
+        self.db_path = db_path or QUEUE_DB
+        self.journal_mode = journal_mode or QUEUE_JOURNAL_MODE
+        self._local = threading.local()
+
+    def _conn(self):
+        # 処理中の期限延長は別スレッドから行うため、接続はスレッドごとに持つ
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path, self.journal_mode)
+            setup_work_queue(conn)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, key, payload, max_attempts=WORK_MAX_ATTEMPTS, delay=0):
+        """作業を追加（同じ作業が未完了で残っていれば追加せず False を返す）"""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute('''
+            INSERT OR IGNORE INTO work_items (kind, item_key, payload, status, attempts, max_attempts,
+                                              available_at, enqueued_at)
+            VALUES (?, ?, ?, 'pending', 0, ?, ?, ?)
+            ''', (kind, key, json.dumps(payload, ensure_ascii=False), max_attempts, now + delay, now))
+        return cursor.rowcount > 0
+
+    def claim(self, worker_id, kinds=None, lease_seconds=WORK_LEASE_SECONDS):
+        """実行可能な作業を1件取得して期限付きで確保する（なければ None）"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 期限切れのまま試行回数を使い切った作業は失敗として確定する
+            conn.execute('''
+            UPDATE work_items SET status = 'failed', finished_at = ?,
+                last_error = COALESCE(last_error, 'リースの期限切れ')
+            WHERE status = 'leased' AND lease_expires <= ? AND attempts >= max_attempts
+            ''', (now, now))
+            query = '''
+            SELECT id, kind, item_key, payload, attempts, max_attempts FROM work_items
+            WHERE ((status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires <= ?))
+            '''
+            params = [now, now]
+            if kinds:
+                query += f" AND kind IN ({','.join('?' * len(kinds))})"
+                params.extend(kinds)
+            query += " ORDER BY available_at, id LIMIT 1"
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                conn.commit()
+                return None
+            item_id, kind, key, payload, attempts, max_attempts = row
+            if attempts:
+                logger.info(f"作業を再取得: {kind} {key}（{attempts + 1}回目）")
+            token = uuid.uuid4().hex
+            conn.execute('''
+            UPDATE work_items SET status = 'leased', attempts = attempts + 1, leased_by = ?,
+                lease_token = ?, lease_expires = ?
+            WHERE id = ?
+            ''', (worker_id, token, now + lease_seconds, item_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return WorkItem(item_id, kind, key, json.loads(payload), attempts + 1, max_attempts, token)
+
+    def extend(self, item, lease_seconds=WORK_LEASE_SECONDS):
+        """処理中の作業の期限を延長（期限切れで他のワーカーに移っていれば False）"""
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute('''
+            UPDATE work_items SET lease_expires = ?
+            WHERE id = ? AND lease_token = ? AND status = 'leased'
+            ''', (time.time() + lease_seconds, item.id, item.lease_token))
+        return cursor.rowcount > 0
+
+    def complete(self, item, result=None):
+        """作業の完了を記録"""
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute('''
+            UPDATE work_items SET status = 'done', finished_at = ?, result = ?, lease_expires = NULL
+            WHERE id = ? AND lease_token = ? AND status = 'leased'
+            ''', (time.time(), json.dumps(result, ensure_ascii=False), item.id, item.lease_token))
+        return cursor.rowcount > 0
+
+    def fail(self, item, error):
+        """作業の失敗を記録（試行回数が残っていればバックオフ後に再実行）"""
+        now = time.time()
+        retry = item.attempts < item.max_attempts
+        delay = min(WORK_RETRY_BASE * 2 ** (item.attempts - 1), WORK_MAX_RETRY_DELAY)
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute('''
+            UPDATE work_items SET status = ?, available_at = ?, finished_at = ?, last_error = ?,
+                lease_expires = NULL
+            WHERE id = ? AND lease_token = ? AND status = 'leased'
+            ''', ('pending' if retry else 'failed', now + delay, None if retry else now,
+                  str(error)[:500], item.id, item.lease_token))
+        return cursor.rowcount > 0
+
+    def stats(self):
+        """(kind, status) ごとの件数"""
+        cursor = self._conn().execute('''
+        SELECT kind, status, COUNT(*) FROM work_items GROUP BY kind, status ORDER BY kind, status
+        ''')
+        return cursor.fetchall()
+
+    def failures(self, limit=20):
+        """失敗が確定した作業（新しい順）"""
+        cursor = self._conn().execute('''
+        SELECT kind, item_key, attempts, last_error, finished_at FROM work_items
+        WHERE status = 'failed' ORDER BY finished_at DESC LIMIT ?
+        ''', (limit,))
+        return cursor.fetchall()
+
+    def purge(self, days=WORK_RETENTION_DAYS):
+        """完了・失敗から days 日以上経った作業を削除"""
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute('''
+            DELETE FROM work_items WHERE status IN ('done', 'failed') AND finished_at < ?
+            ''', (time.time() - days * 24 * 60 * 60,))
+        return cursor.rowcount
+
+
+def setup_work_queue(conn):
+    """作業キューのテーブルを作成"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS work_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT,
+        item_key TEXT,
+        payload TEXT,
+        status TEXT,
+        attempts INTEGER,
+        max_attempts INTEGER,
+        available_at REAL,
+        leased_by TEXT,
+        lease_token TEXT,
+        lease_expires REAL,
+        enqueued_at REAL,
+        finished_at REAL,
+        last_error TEXT,
+        result TEXT
+    )
+    ''')
+    # 未完了の同じ作業は1件だけ（完了・失敗した作業は履歴として残す）
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_work_items_active
+    ON work_items (kind, item_key) WHERE status IN ('pending', 'leased')
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_work_items_status_available
+    ON work_items (status, available_at)
+    ''')
+    conn.commit()
+
+
+_BACKENDS = {
+    "sqlite": SQLiteWorkQueue,
+}
+
+
+def get_queue(name=None, **options):
+    """設定されたバックエンドの作業キュー（BEAUTY_QUEUE_BACKEND で選択）"""
+    name = name or QUEUE_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"未知のキューバックエンド: {name}")
+    return _BACKENDS[name](**options)
+
+
+class _LeaseKeeper:
+    """処理中の作業の期限を別スレッドで定期的に延長する"""
+
+    def __init__(self, queue, item, lease_seconds):
+        self.queue = queue
+        self.item = item
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{item.id}", daemon=True)
+
+    def _run(self):
+        interval = min(WORK_HEARTBEAT_SECONDS, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                if not self.queue.extend(self.item, self.lease_seconds):
+                    self.lost = True
+                    logger.warning(f"作業の期限が切れ、他のワーカーに移りました: {self.item}")
+                    return
+            except Exception as e:
+                logger.warning(f"期限の延長に失敗しました ({self.item}): {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue, handlers, worker_id=None, kinds=None, lease_seconds=WORK_LEASE_SECONDS,
+               exit_when_empty=False, stop_event=None, poll_interval=WORK_POLL_INTERVAL):
+    """キューから作業を取得して handlers[kind](payload) を実行し続ける
+
+    戻り値は処理した作業の件数。exit_when_empty=True ならキューが空になった時点で終了する。
+    """
+    worker_id = worker_id or default_worker_id()
+    kinds = list(kinds or handlers)
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    logger.info(f"ワーカー開始: {worker_id} ({', '.join(kinds)})")
+
+    while not stop_event.is_set():
+        item = queue.claim(worker_id, kinds, lease_seconds)
+        if item is None:
+            if exit_when_empty:
+                break
+            stop_event.wait(poll_interval)
+            continue
+
+        with _LeaseKeeper(queue, item, lease_seconds) as keeper:
+            try:
+                result = handlers[item.kind](item.payload)
+                error = None
+            except Exception as e:
+                error = e
+        processed += 1
+        if keeper.lost:
+            # 期限切れ後の結果は記録しない（引き継いだワーカーが報告する）
+            continue
+        if error is None:
+            queue.complete(item, result)
+            logger.info(f"作業完了: {item.kind} {item.key}")
+        else:
+            queue.fail(item, error)
+            logger.error(f"作業失敗: {item.kind} {item.key}（{item.attempts}/{item.max_attempts}回目）: {error}")
+
+    logger.info(f"ワーカー終了: {worker_id}（{processed}件処理）")
+    return processed
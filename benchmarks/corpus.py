@@ -0,0 +1,134 @@
+"""ベンチマーク用の合成コーパス生成
+
+英語・日本語が混在した記事とツイートを、シードを固定して再現可能に生成する。
+記事はRSS 2.0 / Atom のフィードとして出力できる。
+"""
+import datetime
+import random
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+# 美容関連の語彙（キーワードとの一致やトレンド抽出が実際に起きるように既存のキーワードを含める）
+EN_TERMS = [
+    "skincare", "serum", "toner", "moisturizer", "cleansing", "makeup", "foundation",
+    "lipstick", "eyeshadow", "mascara", "haircare", "shampoo", "treatment", "cosmetics",
+    "beauty", "retinol", "niacinamide", "sunscreen", "hyaluronic", "peptide", "glow",
+    "K-beauty", "J-beauty", "concealer", "primer", "blush", "highlighter", "exfoliant",
+]
+EN_FILLER = [
+    "the", "new", "best", "routine", "for", "your", "skin", "this", "season", "we",
+    "tried", "launch", "review", "editors", "love", "why", "everyone", "is", "talking",
+    "about", "how", "to", "use", "guide", "it's", "don't", "dermatologists", "say",
+]
+JA_TERMS = [
+    "スキンケア", "美容液", "化粧水", "乳液", "クレンジング", "メイク", "ファンデーション",
+    "リップ", "アイシャドウ", "マスカラ", "ヘアケア", "シャンプー", "トリートメント",
+    "ヘアオイル", "コスメ", "新作コスメ", "韓国コスメ", "プチプラコスメ", "美容",
+    "美白", "保湿", "毛穴", "敏感肌", "日焼け止め", "ツヤ肌", "限定",
+]
+JA_FILLER = [
+    "の", "が", "で", "を", "に", "おすすめ", "人気", "発売", "話題", "今季", "最新",
+    "レビュー", "使い方", "ランキング", "まとめ", "徹底比較", "プロが選ぶ", "注目",
+]
+
+
+class CorpusGenerator:
+    """英日混在の記事・ツイートを生成する（同じシードなら同じ内容）"""
+
+    def __init__(self, seed=42, ja_ratio=0.4):
+        self.random = random.Random(seed)
+        self.ja_ratio = ja_ratio
+        self.base_time = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+    def _sentence(self, lang, length):
+        terms, filler = (JA_TERMS, JA_FILLER) if lang == 'ja' else (EN_TERMS, EN_FILLER)
+        # 語彙の偏り（一部の語が頻出する）を再現するため、先頭の語ほど選ばれやすくする
+        words = [self.random.choice(terms[:self.random.randint(3, len(terms))])
+                 if self.random.random() < 0.35 else self.random.choice(filler)
+                 for _ in range(length)]
+        if lang == 'ja':
+            return "".join(words) + "。"
+        return " ".join(words).capitalize() + "."
+
+    def _lang(self):
+        return 'ja' if self.random.random() < self.ja_ratio else 'en'
+
+    def article(self, feed_index, article_index):
+        """記事1件（HTMLを含む要約付き）"""
+        lang = self._lang()
+        title = self._sentence(lang, self.random.randint(5, 10)).rstrip(".。")
+        paragraphs = [self._sentence(lang, self.random.randint(12, 30))
+                      for _ in range(self.random.randint(2, 5))]
+        summary = "".join(f"<p>{p}</p>" for p in paragraphs)
+        # HTML除去の負荷を再現するため、一部の記事にはscript/style/画像を含める
+        if self.random.random() < 0.2:
+            summary = ("<style>.promo{color:red}</style>" + summary
+                       + "<script>trackView('article')</script><img src='x.jpg' alt='promo'>")
+        published = self.base_time - datetime.timedelta(minutes=self.random.randint(0, 24 * 60))
+        return {
+            "title": title,
+            "link": f"https://bench.example/{feed_index}/{article_index}",
+            "summary": summary,
+            "published": published,
+            "lang": lang,
+        }
+
+    def articles(self, feed_index, count):
+        return [self.article(feed_index, i) for i in range(count)]
+
+    def tweets(self, count, first_id=1_000_000_000_000_000_000):
+        """ツイート（Twitter API v2 形式の辞書）をID昇順で生成"""
+        tweets = []
+        for i in range(count):
+            lang = self._lang()
+            created_at = self.base_time - datetime.timedelta(seconds=(count - i) * 7)
+            tweets.append({
+                "id": str(first_id + i),
+                "text": self._sentence(lang, self.random.randint(6, 20)),
+                "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "public_metrics": {
+                    "retweet_count": self.random.randint(0, 50),
+                    "reply_count": self.random.randint(0, 20),
+                    "like_count": self.random.randint(0, 500),
+                    "quote_count": self.random.randint(0, 10),
+                },
+            })
+        return tweets
+
+
+def render_rss(title, link, articles):
+    """RSS 2.0 のフィードを生成"""
+    items = "".join(
+        "<item>"
+        f"<title>{escape(a['title'])}</title>"
+        f"<link>{escape(a['link'])}</link>"
+        f"<guid>{escape(a['link'])}</guid>"
+        f"<pubDate>{format_datetime(a['published'])}</pubDate>"
+        f"<description>{escape(a['summary'])}</description>"
+        "</item>"
+        for a in articles
+    )
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<rss version="2.0"><channel><title>{escape(title)}</title>'
+            f'<link>{escape(link)}</link><description>benchmark</description>'
+            f'{items}</channel></rss>').encode("utf-8")
+
+
+def render_atom(title, link, articles):
+    """Atom のフィードを生成（本文は summary ではなく content に入れる）"""
+    entries = "".join(
+        "<entry>"
+        f"<title>{escape(a['title'])}</title>"
+        f'<link href="{escape(a["link"])}"/>'
+        f"<id>{escape(a['link'])}</id>"
+        f"<updated>{a['published'].isoformat()}</updated>"
+        f'<content type="html">{escape(a["summary"])}</content>'
+        "</entry>"
+        for a in articles
+    )
+    updated = max((a["published"] for a in articles), default=datetime.datetime.now(datetime.timezone.utc))
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>{escape(title)}</title><link href="{escape(link)}"/>'
+            f'<id>{escape(link)}</id><updated>{updated.isoformat()}</updated>'
+            f'{entries}</feed>').encode("utf-8")
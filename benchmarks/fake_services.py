@@ -0,0 +1,175 @@
+"""ベンチマーク用のローカルHTTPサーバー
+
+- /feeds/<n>.xml : 生成したRSS / Atomフィード（ETagによる条件付きGETに対応）
+- /2/tweets/search/recent : Twitter API v2 recent search の簡易版
+  （OR結合クエリ・since_id / until_id・next_tokenによるページングを再現。リクエストごとに
+  x-rate-limit-remaining を減らし、使い切るとリセット時刻まで429を返す）
+
+TWITTER_API_BASE_URL をこのサーバーのURLにすると collect_twitter_data の接続先になる。
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RATE_LIMIT_PER_WINDOW = 450
+RATE_LIMIT_WINDOW = 15 * 60  # 秒
+
+
+def parse_query_terms(query):
+    """'(a OR "b c") -is:retweet' 形式のクエリから検索語を取り出す"""
+    terms = []
+    for part in query.split(" -is:")[0].strip().strip("()").split(" OR "):
+        term = part.strip().strip('"').lower()
+        if term:
+            terms.append(term)
+    return terms
+
+
+class FakeServices:
+    """フィードと検索APIを提供するローカルサーバー（with文で起動・停止）"""
+
+    def __init__(self, feeds=None, tweets=None, host="127.0.0.1", port=0, latency=0.0,
+                 rate_limit=RATE_LIMIT_PER_WINDOW, rate_limit_window=RATE_LIMIT_WINDOW,
+                 clock=time.time):
+        self.feeds = {}            # パス -> (本文, ETag, Content-Type)
+        self.tweets = []
+        self.latency = latency     # 応答前の待ち時間（ネットワーク遅延の再現、秒）
+        self.requests = {"feeds": 0, "not_modified": 0, "search": 0, "rate_limited": 0}
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.clock = clock         # レート制限の時刻（テストでは偽の時計を渡す）
+        self._remaining = rate_limit
+        self._reset_at = None
+        self._lock = threading.Lock()
+        self.add_tweets(tweets or [])
+        for path, (body, content_type) in (feeds or {}).items():
+            self.add_feed(path, body, content_type)
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_feed(self, path, body, content_type="application/rss+xml"):
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.feeds[path] = (body, etag, content_type)
+
+    def add_tweets(self, tweets):
+        """検索対象のツイートを追加（新しい順に並べ替える）"""
+        with self._lock:
+            self.tweets = sorted(self.tweets + list(tweets), key=lambda t: int(t["id"]), reverse=True)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def _count(self, name):
+        with self._lock:
+            self.requests[name] += 1
+
+    def take_request(self):
+        """レート制限のウィンドウから1リクエスト分を消費し、(許可されたか, 応答ヘッダー) を返す"""
+        with self._lock:
+            now = self.clock()
+            if self._reset_at is None or now >= self._reset_at:
+                self._remaining = self.rate_limit
+                self._reset_at = int(now) + self.rate_limit_window
+            allowed = self._remaining > 0
+            if allowed:
+                self._remaining -= 1
+            return allowed, {
+                "x-rate-limit-limit": str(self.rate_limit),
+                "x-rate-limit-remaining": str(self._remaining),
+                "x-rate-limit-reset": str(self._reset_at),
+            }
+
+    def search(self, params):
+        """recent search のレスポンス（JSON辞書）を作る"""
+        terms = parse_query_terms(params.get("query", ""))
+        since_id = int(params.get("since_id") or 0)
+        until_id = int(params["until_id"]) if params.get("until_id") else None
+        max_results = min(int(params.get("max_results") or 10), 100)
+        offset = int(params.get("next_token") or 0)
+
+        matched = [tweet for tweet in self.tweets
+                   if int(tweet["id"]) > since_id
+                   and (until_id is None or int(tweet["id"]) < until_id)
+                   and any(term in tweet["text"].lower() for term in terms)]
+        page = matched[offset:offset + max_results]
+        meta = {"result_count": len(page)}
+        if page:
+            meta["newest_id"] = page[0]["id"]
+            meta["oldest_id"] = page[-1]["id"]
+        if offset + max_results < len(matched):
+            meta["next_token"] = str(offset + max_results)
+        payload = {"meta": meta}
+        if page:
+            payload["data"] = page
+        return payload
+
+    def _handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                if services.latency:
+                    time.sleep(services.latency)
+                url = urlparse(self.path)
+                if url.path in services.feeds:
+                    body, etag, content_type = services.feeds[url.path]
+                    if self.headers.get("If-None-Match") == etag:
+                        services._count("not_modified")
+                        self._send(304, headers={"ETag": etag})
+                        return
+                    services._count("feeds")
+                    self._send(200, body, {"Content-Type": content_type, "ETag": etag})
+                elif url.path == "/2/tweets/search/recent":
+                    allowed, headers = services.take_request()
+                    if not allowed:
+                        services._count("rate_limited")
+                        body = b'{"title": "Too Many Requests"}'
+                        self._send(429, body, {"Content-Type": "application/json", **headers})
+                        return
+                    services._count("search")
+                    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    body = json.dumps(services.search(params), ensure_ascii=False).encode("utf-8")
+                    self._send(200, body, {"Content-Type": "application/json", **headers})
+                else:
+                    self._send(404)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-services",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,87 @@
+"""起動時間（インポート時間）のベンチマーク
+
+各モジュールを新しいPythonプロセスでインポートし、所要時間をJSONで出力する。
+--budget を指定すると、CLI起動（--help）がその秒数を超えた場合に終了コード1を返す。
+
+    python benchmarks/import_time.py --repeat 5 --budget 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 計測対象（名前, 実行するPythonコード）
+TARGETS = [
+    ("python", "pass"),
+    ("beauty_data_system", "import beauty_data_system"),
+    ("cli --help", "import sys, beauty_data_system; sys.argv = ['x', '--help']\n"
+                   "try:\n    beauty_data_system.main()\nexcept SystemExit:\n    pass"),
+    ("beauty_trend_monitor", "import beauty_trend_monitor"),
+    ("beauty_rss_collector", "import beauty_rss_collector"),
+    ("beauty_api_collector", "import beauty_api_collector"),
+]
+
+
+def measure(code, repeat):
+    """新しいプロセスでコードを実行した時間（秒）のリスト"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            return None, result.stderr.decode(errors="replace").strip().splitlines()[-1:]
+        timings.append(elapsed)
+    return timings, None
+
+
+def slowest_imports(module, limit=10):
+    """-X importtime の結果から累積時間の大きいモジュールを返す"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    rows = []
+    for line in result.stderr.decode(errors="replace").splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace(":", "|", 1).split("|")]
+        rows.append({"module": name, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, help="CLI起動時間の上限（秒、中央値）")
+    parser.add_argument("--details", action="store_true", help="遅いインポートの内訳も出力")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, code in TARGETS:
+        timings, error = measure(code, args.repeat)
+        if timings is None:
+            results[name] = {"error": error}
+            continue
+        results[name] = {
+            "median_s": round(statistics.median(timings), 4),
+            "min_s": round(min(timings), 4),
+        }
+    if args.details:
+        results["slowest_imports"] = slowest_imports("beauty_data_system")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    cli = results.get("cli --help", {})
+    if args.budget is not None and cli.get("median_s", float("inf")) > args.budget:
+        print(f"CLI起動時間が上限を超えました: {cli} > {args.budget}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""収集・分析パイプラインのエンドツーエンド・ベンチマーク
+
+合成コーパスをローカルのフィードサーバーと偽のTwitter検索APIから配信し、
+一時ディレクトリの新しいDBに対して次の処理を順に計測する。
+
+    fetch_rss_feeds → fetch_rss_feeds (変更なし) → collect_twitter_data
+    → extract_keywords → extract_trending_terms → update_trends
+
+処理ごとの所要時間・スループット（docs/sec）・tracemallocのピークメモリをJSONで出力する。
+tracemallocのオーバーヘッドは計測値に含まれるため、比較は同じオプション同士で行うこと。
+
+    python benchmarks/pipeline.py --feeds 20 --articles 200 --tweets 5000 --output result.json
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import CorpusGenerator, render_atom, render_rss  # noqa: E402
+from fake_services import FakeServices  # noqa: E402
+
+
+def measure(func, count_docs, trace_memory=True):
+    """1つの処理を計測し、結果の辞書と処理の戻り値を返す"""
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    docs = count_docs(result)
+    stage = {
+        "seconds": round(elapsed, 4),
+        "docs": docs,
+        "docs_per_sec": round(docs / elapsed, 1) if elapsed > 0 else None,
+    }
+    if peak is not None:
+        stage["peak_memory_mb"] = round(peak / (1024 * 1024), 2)
+    return stage, result
+
+
+def build_services(args):
+    """コーパスを生成してローカルサーバーに載せる"""
+    generator = CorpusGenerator(seed=args.seed, ja_ratio=args.ja_ratio)
+    services = FakeServices(tweets=generator.tweets(args.tweets), latency=args.latency)
+    for i in range(args.feeds):
+        articles = generator.articles(i, args.articles)
+        # RSSとAtomを交互に配信
+        if i % 2:
+            services.add_feed(f"/feeds/{i}.xml", render_atom(f"Bench {i}", f"https://bench.example/{i}", articles),
+                              "application/atom+xml")
+        else:
+            services.add_feed(f"/feeds/{i}.xml", render_rss(f"Bench {i}", f"https://bench.example/{i}", articles))
+    return services
+
+
+def _count_rows(db_path, table):
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def run_once(args):
+    """一時ディレクトリ上でパイプライン全体を1回実行し、処理ごとの計測結果を返す"""
+    import sqlite3
+    from beauty_rss_collector import fetch_rss_feeds, extract_keywords, beauty_keywords
+    from beauty_api_collector import collect_twitter_data
+    from beauty_twitter_planner import RecentSearchClient
+    from beauty_language import detect_language
+    from beauty_trend_monitor import BeautyTrendMonitor
+
+    trace = not args.no_trace_memory
+    stages = {}
+    with build_services(args) as services:
+        feeds = [{"url": services.url(path), "source": f"Bench {i}"}
+                 for i, path in enumerate(services.feeds)]
+
+        def fetch():
+            return fetch_rss_feeds(feeds, max_workers=args.fetch_workers,
+                                   per_host_limit=args.fetch_workers)
+
+        stages["fetch_rss_feeds"], _ = measure(fetch, lambda added: added, trace)
+        # 2回目は条件付きGET（304）で変更なしと判定される経路
+        stages["fetch_rss_feeds_unchanged"], _ = measure(
+            fetch, lambda _: len(feeds), trace)
+
+        client = RecentSearchClient("benchmark", base_url=services.base_url)
+        stages["collect_twitter_data"], _ = measure(
+            lambda: collect_twitter_data(client=client),
+            lambda _: _count_rows("beauty_trends.db", "tweets"), trace)
+        server_requests = dict(services.requests)
+
+    # 分析対象のテキストはDBから読み込む（読み込み時間は計測に含めない）
+    conn = sqlite3.connect("beauty_feeds.db")
+    article_texts = [f"{title} {summary}" for title, summary in
+                     conn.execute("SELECT title, summary FROM beauty_articles")]
+    conn.close()
+    conn = sqlite3.connect("beauty_trends.db")
+    tweet_texts = [text for (text,) in conn.execute("SELECT text FROM tweets")]
+    conn.close()
+
+    stages["extract_keywords"], _ = measure(
+        lambda: [extract_keywords(text, beauty_keywords) for text in article_texts], len, trace)
+
+    monitor = BeautyTrendMonitor()
+    routed = {'en': [], 'ja': []}
+    for text in article_texts + tweet_texts:
+        if text:
+            routed[detect_language(text)].append(text)
+    stages["extract_trending_terms"], _ = measure(
+        lambda: {lang: monitor.extract_trending_terms(texts, lang, args.workers)
+                 for lang, texts in routed.items()},
+        lambda _: sum(len(texts) for texts in routed.values()), trace)
+
+    def update():
+        trends = monitor.update_trends()
+        monitor.renderer.wait()
+        return trends
+
+    stages["update_trends"], _ = measure(
+        update, lambda _: len(article_texts) + len(tweet_texts), trace)
+
+    return stages, server_requests
+
+
+def summarize(runs):
+    """複数回の結果を処理ごとに集約（時間は中央値、メモリは最大値）"""
+    summary = {}
+    for name in runs[0]:
+        stages = [run[name] for run in runs]
+        seconds = statistics.median(stage["seconds"] for stage in stages)
+        docs = stages[0]["docs"]
+        summary[name] = {
+            "seconds": round(seconds, 4),
+            "min_seconds": round(min(stage["seconds"] for stage in stages), 4),
+            "docs": docs,
+            "docs_per_sec": round(docs / seconds, 1) if seconds > 0 else None,
+        }
+        peaks = [stage["peak_memory_mb"] for stage in stages if "peak_memory_mb" in stage]
+        if peaks:
+            summary[name]["peak_memory_mb"] = max(peaks)
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--feeds", type=int, default=10, help="フィード数")
+    parser.add_argument("--articles", type=int, default=100, help="フィードあたりの記事数")
+    parser.add_argument("--tweets", type=int, default=2000, help="検索APIが返すツイートの総数")
+    parser.add_argument("--ja-ratio", type=float, default=0.4, help="日本語の記事・ツイートの割合")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.0, help="サーバーの応答遅延（秒）")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="フィード取得の並列数")
+    parser.add_argument("--workers", type=int, help="単語カウントの並列数（TERM_EXTRACTION_WORKERS）")
+    parser.add_argument("--tokenizer", help="トークナイザー（BEAUTY_TOKENIZER）")
+    parser.add_argument("--repeat", type=int, default=1, help="実行回数（毎回新しいDBで実行）")
+    parser.add_argument("--no-trace-memory", action="store_true", help="tracemallocを使わない")
+    parser.add_argument("--output", help="結果JSONの保存先（省略時は標準出力のみ）")
+    parser.add_argument("--keep", action="store_true", help="作業ディレクトリを削除しない")
+    parser.add_argument("--verbose", action="store_true", help="各処理の出力を標準エラーに表示")
+    args = parser.parse_args(argv)
+
+    # モジュールの読み込み時に参照される設定は、インポート前に環境変数で渡す
+    if args.workers is not None:
+        os.environ["TERM_EXTRACTION_WORKERS"] = str(args.workers)
+    if args.tokenizer:
+        os.environ["BEAUTY_TOKENIZER"] = args.tokenizer
+
+    from beauty_storage import close_connections
+
+    # 日本語フォントのない環境で可視化の際に出る警告は計測結果に関係しないため抑制
+    warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+
+    # DB・ログ・レポートはカレントディレクトリに作られるため、一時ディレクトリで実行する
+    original_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="beauty-bench-")
+    runs = []
+    try:
+        for i in range(args.repeat):
+            run_dir = os.path.join(workdir, f"run-{i + 1}")
+            os.makedirs(run_dir)
+            os.chdir(run_dir)
+            output = sys.stderr if args.verbose else open(os.devnull, "w")
+            try:
+                with contextlib.redirect_stdout(output):
+                    stages, server_requests = run_once(args)
+            finally:
+                # 使い回しの接続は作業ディレクトリごとに閉じる
+                close_connections()
+            if output is not sys.stderr:
+                output.close()
+            runs.append(stages)
+    finally:
+        os.chdir(original_dir)
+        if args.keep:
+            print(f"作業ディレクトリ: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "benchmark": "pipeline",
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "feeds": args.feeds,
+            "articles_per_feed": args.articles,
+            "tweets": args.tweets,
+            "ja_ratio": args.ja_ratio,
+            "seed": args.seed,
+            "latency": args.latency,
+            "fetch_workers": args.fetch_workers,
+            "workers": args.workers,
+            "tokenizer": args.tokenizer,
+            "repeat": args.repeat,
+            "trace_memory": not args.no_trace_memory,
+        },
+        "stages": summarize(runs),
+        "server_requests": server_requests,
+    }
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
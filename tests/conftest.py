@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """DB・ログ・メトリクスはカレントディレクトリに作られるため、一時ディレクトリで実行する"""
+    from beauty_storage import close_connections
+
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    close_connections()
+
+
+class FakeClock:
+    """time.time / time.sleep の代わり（sleep で時刻を進める）"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,107 @@
+import datetime
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import beauty_burst
+from beauty_burst import burst_scores, get_count_cache, score_bursts, stream_bursts, top_k
+from beauty_storage import TRENDS_DB, get_connection
+from beauty_term_counts import add_term_counts, hour_bucket, setup_term_count_tables
+
+NOW = datetime.datetime(2026, 10, 16, 12, 30)
+
+
+@pytest.fixture
+def conn(workdir):
+    conn = get_connection(TRENDS_DB)
+    setup_term_count_tables(conn)
+    return conn
+
+
+def add_counts(conn, hours_ago, counts, stream="twitter"):
+    bucket = hour_bucket(NOW - datetime.timedelta(hours=hours_ago))
+    add_term_counts(conn, stream, {(bucket, stream, "en"): Counter(counts)})
+    conn.commit()
+
+
+def test_burst_scores_against_poisson_baseline():
+    # 1時間あたり平均2回の単語が直近2時間で10回 / 一度も出ていなかった単語が6回
+    matrix = np.array([[2, 2, 2, 2, 5, 5],
+                       [0, 0, 0, 0, 3, 3]], dtype=float)
+    recent, scores = burst_scores(matrix, recent_columns=2)
+    assert recent.tolist() == [10, 6]
+    assert scores[0] == pytest.approx((10 - 4) / np.sqrt(2 * 2 + 1))
+    assert scores[1] == pytest.approx(6.0)
+    # ベースラインの開始列より前は含めない（集計を始める前の時間）
+    _, scores = burst_scores(matrix, recent_columns=2, baseline_start=4)
+    assert scores[0] == pytest.approx(10.0)
+
+
+def test_top_k_skips_non_positive_scores():
+    scores = np.array([0.5, -1.0, 3.0, 0.0, 2.0])
+    assert top_k(scores, 2).tolist() == [2, 4]
+    assert top_k(scores, 10).tolist() == [2, 4, 0]
+    assert top_k(np.array([-1.0, 0.0]), 3).tolist() == []
+
+
+def test_score_bursts_ranks_spikes_above_steady_terms(conn):
+    for hours_ago in range(2, 48):
+        add_counts(conn, hours_ago, {"skincare": 20, "retinol": 1})
+    add_counts(conn, 0, {"skincare": 20, "retinol": 12, "bakuchiol": 8, "rare": 2})
+    add_counts(conn, 1, {"skincare": 20, "retinol": 10})
+
+    results = score_bursts(conn, hours=2, k=10, now=NOW)
+    assert [term for term, _, _ in results] == ["retinol", "bakuchiol"]
+    # 直近2時間は2時間前の時刻を含むバケットから数える（10:00 / 11:00 / 12:00）
+    assert results[0][1] == 1 + 10 + 12
+    assert results[0][2] > results[1][2] > 0
+
+
+def test_score_bursts_reloads_only_updated_hours(conn):
+    add_counts(conn, 5, {"serum": 3})
+    add_counts(conn, 0, {"serum": 6})
+    assert score_bursts(conn, hours=2, now=NOW)[0][:2] == ("serum", 6)
+
+    cache = get_count_cache(conn)
+    stale = cache.hours[hour_bucket(NOW - datetime.timedelta(hours=5))]
+    add_counts(conn, 0, {"serum": 4, "toner": 7})
+    # ベースラインのない toner の方が上位になる
+    assert [result[:2] for result in score_bursts(conn, hours=2, now=NOW)] == [
+        ("toner", 7), ("serum", 10)]
+    # 更新のない時間は読み直さない
+    assert cache.hours[hour_bucket(NOW - datetime.timedelta(hours=5))] is stale
+
+
+def test_score_bursts_filters_streams(conn):
+    add_counts(conn, 0, {"serum": 9}, stream="rss")
+    assert score_bursts(conn, hours=2, now=NOW, streams=("twitter",)) == []
+    assert score_bursts(conn, hours=2, now=NOW, streams=("rss",))[0][0] == "serum"
+
+
+def fill_history(conn):
+    for hours_ago in range(2, 60):
+        add_counts(conn, hours_ago, {f"term{i}": 1 + (i + hours_ago) % 4 for i in range(30)})
+    add_counts(conn, 1, {f"term{i}": 2 + i for i in range(30)})
+    add_counts(conn, 0, {f"term{i}": 3 + 2 * i for i in range(30)})
+
+
+def test_streaming_matches_cached_matrix(conn):
+    fill_history(conn)
+    start = hour_bucket(NOW - datetime.timedelta(hours=2 + 72))
+    recent_start = hour_bucket(NOW - datetime.timedelta(hours=2))
+
+    cached = score_bursts(conn, hours=2, k=10, baseline_hours=72, now=NOW)
+    assert len(cached) == 10
+    # チャンクの境目で上位 k 件を選び直しても結果は同じ
+    assert stream_bursts(conn, start, NOW, recent_start, 10, chunk_size=7) == cached
+
+
+def test_long_windows_are_streamed(conn, monkeypatch):
+    fill_history(conn)
+    cached = score_bursts(conn, hours=2, k=5, baseline_hours=72, now=NOW)
+
+    monkeypatch.setattr(beauty_burst, "BURST_CACHE_MAX_HOURS", 24)
+    monkeypatch.setattr(beauty_burst, "get_count_cache", None)  # キャッシュを使わない
+    assert score_bursts(conn, hours=2, k=5, baseline_hours=72, now=NOW) == cached
+    assert score_bursts(conn, hours=2, k=5, now=NOW, streams=("rss",)) == []
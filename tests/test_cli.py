@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# dotenv を読み込めない環境を再現する（sys.modules に None を入れると ImportError になる）
+WITHOUT_DOTENV = """
+import sys
+sys.modules["dotenv"] = None
+import beauty_data_system
+sys.exit(beauty_data_system.main(["install-deps", "--help"]))
+"""
+
+
+def test_cli_starts_without_python_dotenv(tmp_path):
+    result = subprocess.run([sys.executable, "-c", WITHOUT_DOTENV], cwd=tmp_path,
+                            env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "install-deps" in result.stdout
+
+
+def test_subcommands_do_not_import_heavy_modules(tmp_path):
+    code = ("import sys, beauty_data_system; beauty_data_system.build_parser(); "
+            "print(sorted(m for m in ('pandas', 'matplotlib', 'nltk', 'requests') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path,
+                            env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_environment_needs_only_the_bearer_token(monkeypatch):
+    import beauty_data_system
+
+    for name in ("TWITTER_API_KEY", "TWITTER_API_SECRET", "TWITTER_ACCESS_TOKEN", "TWITTER_ACCESS_SECRET"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("TWITTER_BEARER_TOKEN", "token")
+    assert beauty_data_system.check_environment()
+    monkeypatch.delenv("TWITTER_BEARER_TOKEN")
+    assert not beauty_data_system.check_environment()
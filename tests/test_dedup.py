@@ -0,0 +1,52 @@
+import pytest
+
+from beauty_data_system import main
+from beauty_dedup import cluster_members, index_new_articles, largest_clusters
+from beauty_storage import FEEDS_DB, get_connection
+
+STORY = ("New retinol serum from a leading skincare brand promises visible results in four weeks, "
+         "with a gentle formula designed for sensitive skin and daily use.")
+
+
+@pytest.fixture
+def conn(workdir):
+    return get_connection(FEEDS_DB)
+
+
+def add_articles(conn, articles):
+    conn.executemany("INSERT INTO beauty_articles (title, link, source, summary) VALUES (?, ?, ?, ?)",
+                     articles)
+    conn.commit()
+
+
+def test_near_duplicates_share_a_cluster(conn):
+    add_articles(conn, [
+        ("Retinol serum launch", "https://a.example/1", "A", STORY),
+        ("Retinol serum launch", "https://b.example/1", "B", STORY.replace("four weeks", "4 weeks")),
+        ("Sunscreen guide", "https://a.example/2", "A",
+         "How to choose a broad spectrum sunscreen for summer holidays and everyday city life."),
+        ("Short", "https://c.example/1", "C", ""),
+    ])
+
+    assert index_new_articles(conn) == (4, 1)
+    # 2回目は差分だけ（登録済みの記事は読み直さない）
+    assert index_new_articles(conn) == (0, 0)
+
+    assert largest_clusters(conn) == [(1, 2)]
+    members = cluster_members(conn, 1)
+    assert [(row[0], row[3]) for row in members] == [(1, "A"), (2, "B")]
+    assert members[0][4] is None and members[1][4] >= 0.7
+    assert [row[0] for row in cluster_members(conn, 3)] == [3]
+
+
+def test_duplicates_command(conn, capsys):
+    add_articles(conn, [
+        ("Retinol serum launch", "https://a.example/1", "A", STORY),
+        ("Retinol serum launch", "https://b.example/1", "B", STORY),
+    ])
+    index_new_articles(conn)
+
+    assert main(["duplicates"]) == 0
+    out = capsys.readouterr().out
+    assert "クラスタ 1（2件）" in out
+    assert "https://b.example/1" in out
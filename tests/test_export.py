@@ -0,0 +1,37 @@
+import csv
+
+from beauty_export import export_all_articles, export_new_articles
+from beauty_storage import get_connection, FEEDS_DB
+
+
+def add_articles(count, start=0, added_date="2026-10-16 09:00:00"):
+    conn = get_connection(FEEDS_DB)
+    conn.executemany("INSERT INTO beauty_articles (title, link, source, added_date) VALUES (?, ?, ?, ?)",
+                     [(f"title {i}", f"https://example.com/{i}", "Example", added_date)
+                      for i in range(start, start + count)])
+    conn.commit()
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_incremental_export_appends_only_new_articles(workdir):
+    add_articles(7)
+    assert export_new_articles(chunk_size=3) == 7
+    assert export_new_articles() == 0
+
+    add_articles(2, start=7, added_date="2026-10-17 09:00:00")
+    assert export_new_articles() == 2
+    out_dir = workdir / "exports" / "beauty_articles" / "csv"
+    assert len(read_rows(out_dir / "beauty_articles_2026-10-16.csv")) == 7
+    assert [row["title"] for row in read_rows(out_dir / "beauty_articles_2026-10-17.csv")] == [
+        "title 7", "title 8"]
+
+
+def test_full_export_writes_every_article(workdir):
+    add_articles(5)
+    path = workdir / "full.csv"
+    assert export_all_articles(path=str(path), chunk_size=2) == 5
+    assert len(read_rows(path)) == 5
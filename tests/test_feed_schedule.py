@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from beauty_feed_schedule import (FEED_DORMANT_DAYS, FEED_FAILING_AFTER, FEED_MAX_INTERVAL,
+                                  FEED_MIN_INTERVAL, due_feeds, feed_status, get_feed_state,
+                                  next_interval, record_failure, record_success,
+                                  setup_feed_schedule)
+
+FEED = {"url": "https://example.com/feed.xml", "source": "Example"}
+DAY = 24 * 60 * 60
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    setup_feed_schedule(conn)
+    yield conn
+    conn.close()
+
+
+def test_first_poll_without_new_entries_is_not_dormant(conn):
+    record_success(conn, FEED, 0, now=T0)
+    state = get_feed_state(conn, FEED["url"])
+    assert feed_status(state, now=T0) == "ok"
+    assert feed_status(state, now=T0 + (FEED_DORMANT_DAYS - 1) * DAY) == "ok"
+
+    # 追跡を始めてから FEED_DORMANT_DAYS 新着がなければ dormant
+    later = T0 + (FEED_DORMANT_DAYS + 1) * DAY
+    record_success(conn, FEED, 0, state=state, now=later)
+    state = get_feed_state(conn, FEED["url"])
+    assert state["first_success"] == T0
+    assert feed_status(state, now=later) == "dormant"
+
+    record_success(conn, FEED, 2, state=state, now=later + 60)
+    assert feed_status(get_feed_state(conn, FEED["url"]), now=later + 60) == "ok"
+
+
+def test_existing_table_gets_first_success_column():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE feed_schedule (url TEXT PRIMARY KEY, source TEXT, "
+                 "interval_seconds REAL, hint_seconds REAL, entry_rate REAL, next_poll REAL, "
+                 "last_poll REAL, last_success REAL, last_new_entry REAL, "
+                 "consecutive_failures INTEGER DEFAULT 0, last_error TEXT, "
+                 "total_polls INTEGER DEFAULT 0, total_failures INTEGER DEFAULT 0)")
+    conn.execute("INSERT INTO feed_schedule (url, source, last_success) VALUES (?, ?, ?)",
+                 (FEED["url"], FEED["source"], T0))
+    setup_feed_schedule(conn)
+    state = get_feed_state(conn, FEED["url"])
+    assert state["first_success"] == T0
+    assert feed_status(state, now=T0 + DAY) == "ok"
+
+
+def test_failures_back_off_and_success_resets(conn):
+    delays = []
+    for _ in range(FEED_FAILING_AFTER):
+        delays.append(record_failure(conn, FEED, "timeout", state=get_feed_state(conn, FEED["url"]),
+                                     now=T0))
+    assert delays[0] < delays[1] < delays[2]
+    state = get_feed_state(conn, FEED["url"])
+    assert feed_status(state, now=T0) == "failing"
+    assert due_feeds([FEED], {FEED["url"]: state}, now=T0) == []
+    assert due_feeds([FEED], {FEED["url"]: state}, now=T0 + delays[-1] + 1) == [FEED]
+
+    record_success(conn, FEED, 1, state=state, now=T0 + delays[-1])
+    assert feed_status(get_feed_state(conn, FEED["url"]), now=T0 + delays[-1]) == "ok"
+
+
+def test_retry_after_is_respected(conn):
+    delay = record_failure(conn, FEED, "429", retry_after=6 * 60 * 60, now=T0)
+    assert delay >= 6 * 60 * 60
+
+
+def test_next_interval_follows_entry_rate_within_bounds():
+    assert next_interval(3.0) == 60 * 60
+    assert next_interval(1000.0) == FEED_MIN_INTERVAL
+    assert next_interval(0) == FEED_MAX_INTERVAL
+    # 配信元の ttl より短くしない
+    assert next_interval(3.0, hint_seconds=2 * 60 * 60) == 2 * 60 * 60
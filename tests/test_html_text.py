@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from beauty_html_text import HtmlTextCache, html_to_text
+
+# フィードの要約・本文に見られる形のHTML
+SAMPLE_SUMMARIES = [
+    "Plain text summary without markup",
+    "Retinol &amp; niacinamide: what to know",
+    '<p>The new <a href="https://example.com/serum">vitamin C serum</a> is <strong>finally</strong> here.</p>'
+    '<p>Read our review.</p>',
+    '<div class="feed"><img src="x.jpg" alt="product"/><h2>Best SPF 2026</h2>'
+    "<ul><li>Mineral</li><li>Chemical</li><li>Hybrid</li></ul></div>",
+    "<p>新作の美容液&#x3042;が発売。<br/>価格は&yen;5,000&nbsp;(税込)</p>",
+    "<article><header><h1>Skin cycling</h1></header>"
+    "<script>window.dataLayer = [];</script><style>.ad { display: none }</style>"
+    "<section><p>Night 1: exfoliation</p><p>Night 2: retinoid</p></section>"
+    "<table><tr><th>Step</th><td>Serum</td></tr></table></article>",
+    "<blockquote>&ldquo;Less is more&rdquo; &mdash; a dermatologist</blockquote>trailing text",
+]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def without_whitespace(text):
+    return _WHITESPACE_RE.sub("", text)
+
+
+@pytest.mark.parametrize("html", SAMPLE_SUMMARIES)
+def test_same_text_as_beautifulsoup_apart_from_whitespace(html):
+    bs4 = pytest.importorskip("bs4")
+    expected = bs4.BeautifulSoup(html, "html.parser").get_text()
+    assert without_whitespace(html_to_text(html)) == without_whitespace(expected)
+
+
+def test_script_and_style_contents_are_removed():
+    html = ("<p>before</p><script>var trend = 'hidden';</script><style>p { color: red }</style>"
+            "<noscript>enable js</noscript><svg><text>logo</text></svg><p>after</p>")
+    assert html_to_text(html) == "before after"
+
+
+def test_entities_are_decoded():
+    assert html_to_text("Tom &amp; Jerry &lt;3 &#x3042;&#12354; &eacute;t&eacute;") == "Tom & Jerry <3 ああ été"
+    # 実体参照を含まない '&' はそのまま
+    assert html_to_text("AT&T serum") == "AT&T serum"
+
+
+def test_block_boundaries_separate_words():
+    assert html_to_text("<p>retinol</p><p>serum</p>") == "retinol serum"
+    assert html_to_text("<li>one</li><li>two</li>") == "one two"
+    assert html_to_text("line<br>break<br/>again") == "line break again"
+    # インライン要素では単語を区切らない
+    assert html_to_text("<b>glow</b><i>ing</i> skin") == "glowing skin"
+    assert html_to_text("  <p>\n  spaced \t out </p>  ") == "spaced out"
+
+
+def test_cache_hits_and_eviction():
+    cache = HtmlTextCache(maxsize=2)
+    assert cache.strip("<p>a</p>") == "a"
+    assert cache.strip("<p>a</p>") == "a"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.strip("<p>b</p>")
+    cache.strip("<p>a</p>")        # a を最近使ったものにする
+    cache.strip("<p>c</p>")        # 最も古い b が追い出される
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.strip("<p>a</p>")
+    cache.strip("<p>b</p>")
+    assert (cache.hits, cache.misses) == (3, 4)
+    assert cache.strip("") == "" and cache.strip(None) == ""
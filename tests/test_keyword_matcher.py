@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from beauty_keyword_matcher import KeywordMatcher, get_matcher
+
+KEYWORDS = ["skincare", "skin", "care", "makeup", "hair oil", "スキンケア", "ケア", "コスメ",
+            "韓国コスメ", "K-beauty", ""]
+
+
+@pytest.mark.parametrize("scan_threshold", [0, 1000])
+def test_extract_finds_every_keyword_in_list_order(scan_threshold):
+    matcher = KeywordMatcher(KEYWORDS, scan_threshold=scan_threshold)
+    assert matcher.extract("New SKINCARE and Hair Oil picks") == [
+        "skincare", "skin", "care", "hair oil"]
+    # 全角英字・半角カナはNFKCで統一して照合する
+    assert matcher.extract("ｽｷﾝｹｱと韓国コスメ、Ｋ-beauty") == [
+        "スキンケア", "ケア", "コスメ", "韓国コスメ", "K-beauty"]
+    assert matcher.extract("") == []
+
+
+def test_scan_and_automaton_agree():
+    rng = random.Random(0)
+    alphabet = "abcdeスキンケア "
+    keywords = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(60)]
+    scan = KeywordMatcher(keywords, scan_threshold=1000)
+    automaton = KeywordMatcher(keywords, scan_threshold=0)
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        assert scan.matched_indices(text) == automaton.matched_indices(text)
+
+
+def test_get_matcher_reuses_matcher_for_same_keywords():
+    assert get_matcher(["a", "b"]) is get_matcher(("a", "b"))
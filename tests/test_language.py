@@ -0,0 +1,52 @@
+import pytest
+
+from beauty_language import JA_RATIO_THRESHOLD, JapaneseSegmenter, detect_language, japanese_ratio
+
+
+def test_ratio_counts_letters_only():
+    # 数字・記号・空白は分母に含めない
+    assert japanese_ratio("美 1234 abcd!!") == pytest.approx(0.2)
+    assert japanese_ratio("") == 0.0
+    assert japanese_ratio("2026 / 10 / 16") == 0.0
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("美abcd", "ja"),                  # ちょうどしきい値（1/5）
+    ("美abcde", "en"),                 # しきい値未満（1/6）
+    ("New SK-II serum 新作", "en"),
+    ("SK-IIの新作セラムをレビュー", "ja"),   # 英語のブランド名が混在しても日本語
+    ("ｽｷﾝｹｱ", "ja"),                 # 半角カナ
+    ("", "en"),
+    ("!!! 123", "en"),
+])
+def test_detect_language_at_mixed_script_threshold(text, expected):
+    assert JA_RATIO_THRESHOLD == 0.2
+    assert detect_language(text) == expected
+
+
+@pytest.fixture(scope="module")
+def segmenter():
+    return JapaneseSegmenter()
+
+
+def test_dictionary_words_take_longest_match(segmenter):
+    # 「コスメ」ではなく辞書の「韓国コスメ」「新作コスメ」を切り出し、助詞のひらがなは捨てる
+    assert segmenter.segment("韓国コスメの新作コスメが人気") == ["韓国コスメ", "新作コスメ", "人気"]
+
+
+def test_script_runs_and_normalization(segmenter):
+    assert segmenter.segment("ＳＫ－Ⅱの化粧水とビタミンCセラムで美肌に") == ["化粧水", "ビタミン", "セラム", "美肌"]
+    # 半角カナはNFKCで全角にしてから辞書と照合する
+    assert segmenter.segment("ｽｷﾝｹｱ用品") == ["スキンケア", "用品"]
+    assert segmenter.segment("保湿クリームを毎日使う") == ["保湿", "クリーム", "毎日使"]
+    assert segmenter.segment("") == []
+
+
+def test_long_kanji_runs_fall_back_to_bigrams(segmenter):
+    assert segmenter.segment("日本皮膚科学会総会で発表") == [
+        "日本", "本皮", "皮膚", "膚科", "科学", "学会", "会総", "総会", "発表"]
+
+
+def test_stop_words_are_removed():
+    segmenter = JapaneseSegmenter(stop_words={"人気"})
+    assert segmenter.segment("人気の美容液") == ["美容液"]
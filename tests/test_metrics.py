@@ -0,0 +1,103 @@
+import json
+import logging
+
+import pytest
+
+from beauty_metrics import MetricsRegistry, _delta
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_render_prometheus_text(registry):
+    registry.inc("beauty_rss_entries_total", 3, source="Allure")
+    registry.inc("beauty_rss_entries_total", 2, source="Allure")
+    registry.inc("beauty_rss_entries_total", source='Vogue "JP"\n')
+    registry.set("beauty_rss_feed_consecutive_failures", 2, source="Allure")
+    registry.observe("beauty_rss_fetch_seconds", 0.25, host="a.example")
+    registry.observe("beauty_rss_fetch_seconds", 1.5, host="a.example")
+    registry.inc("beauty_trends_runs_total", status="ok")
+
+    assert registry.render() == (
+        '# TYPE beauty_rss_entries_total counter\n'
+        'beauty_rss_entries_total{source="Allure"} 5\n'
+        'beauty_rss_entries_total{source="Vogue \\"JP\\"\\n"} 1\n'
+        '# TYPE beauty_trends_runs_total counter\n'
+        'beauty_trends_runs_total{status="ok"} 1\n'
+        '# TYPE beauty_rss_feed_consecutive_failures gauge\n'
+        'beauty_rss_feed_consecutive_failures{source="Allure"} 2\n'
+        '# TYPE beauty_rss_fetch_seconds summary\n'
+        'beauty_rss_fetch_seconds_count{host="a.example"} 2\n'
+        'beauty_rss_fetch_seconds_sum{host="a.example"} 1.750000\n'
+    )
+    assert registry.render("beauty_trends_") == (
+        '# TYPE beauty_trends_runs_total counter\n'
+        'beauty_trends_runs_total{status="ok"} 1\n'
+    )
+
+
+def test_labels_are_order_independent(registry):
+    registry.inc("beauty_x_total", a=1, b=2)
+    registry.inc("beauty_x_total", b=2, a=1)
+    registry.set("beauty_x_gauge", 1)
+    registry.set("beauty_x_gauge", 7)
+    assert registry.render() == (
+        '# TYPE beauty_x_total counter\n'
+        'beauty_x_total{a="1",b="2"} 2\n'
+        '# TYPE beauty_x_gauge gauge\n'
+        'beauty_x_gauge 7\n'
+    )
+
+
+def test_delta_reports_only_changes(registry):
+    registry.inc("beauty_rss_entries_total", 4)
+    registry.observe("beauty_rss_fetch_seconds", 1.0)
+    before = registry.snapshot("beauty_rss_")
+    registry.inc("beauty_rss_entries_total", 3)
+    registry.inc("beauty_rss_errors_total", 0)
+    registry.observe("beauty_rss_fetch_seconds", 0.5)
+    registry.observe("beauty_rss_fetch_seconds", 2.0)
+    registry.inc("beauty_api_requests_total")
+
+    assert _delta(before, registry.snapshot("beauty_rss_")) == {
+        "beauty_rss_entries_total": 3,
+        "beauty_rss_fetch_seconds": {"count": 2, "sum": 2.5, "max": 2.0},
+    }
+
+
+def test_run_logs_delta_and_writes_textfile(registry, tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr("beauty_metrics.METRICS_DIR", str(tmp_path / "metrics"))
+    registry.inc("beauty_rss_entries_total", 10)
+    with caplog.at_level(logging.INFO, logger="BeautyMetrics"):
+        with registry.run("rss"):
+            registry.inc("beauty_rss_entries_total", 2)
+            registry.inc("beauty_api_requests_total")
+        with pytest.raises(RuntimeError):
+            with registry.run("rss"):
+                raise RuntimeError("boom")
+
+    events = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [event["status"] for event in events] == ["ok", "error"]
+    assert events[0]["metrics"]["beauty_rss_entries_total"] == 2
+    assert events[0]["metrics"]["beauty_rss_runs_total{status=\"ok\"}"] == 1
+    assert "beauty_api_requests_total" not in events[0]["metrics"]
+
+    text = (tmp_path / "metrics" / "beauty_rss.prom").read_text(encoding="utf-8")
+    lines = text.splitlines()
+    assert "beauty_rss_entries_total 12" in lines
+    assert 'beauty_rss_runs_total{status="error"} 1' in lines
+    assert 'beauty_rss_runs_total{status="ok"} 1' in lines
+    assert "beauty_rss_run_seconds_count 2" in lines
+    assert not any(line.startswith("beauty_api_") for line in lines)
+    assert not (tmp_path / "metrics" / "beauty_rss.prom.tmp").exists()
+
+
+def test_write_textfile_failure_is_logged(registry, tmp_path, caplog):
+    blocker = tmp_path / "file"
+    blocker.write_text("", encoding="utf-8")
+    registry.inc("beauty_rss_entries_total")
+    with caplog.at_level(logging.WARNING, logger="BeautyMetrics"):
+        registry.write_textfile("rss", directory=str(blocker / "metrics"))
+    assert "メトリクスの書き出しに失敗しました" in caplog.text
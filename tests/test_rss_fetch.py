@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+import beauty_rss_collector
+from beauty_rss_collector import _read_body, fetch_rss_feeds, iter_downloads
+from beauty_storage import get_connection, FEEDS_DB
+from corpus import CorpusGenerator, render_rss
+from fake_services import FakeServices
+
+
+def test_busy_host_does_not_hold_up_other_hosts(monkeypatch):
+    lock = threading.Lock()
+    active = {}
+    peak = {}
+
+    def download(feed_info, timeout, cache):
+        host = beauty_rss_collector._host_of(feed_info["url"])
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        time.sleep(0.05)
+        with lock:
+            active[host] -= 1
+        return b"", {}
+
+    monkeypatch.setattr(beauty_rss_collector, "download_feed", download)
+    feeds = ([{"url": f"https://a.example/{i}", "source": "A"} for i in range(6)]
+             + [{"url": f"https://b.example/{i}", "source": "B"} for i in range(2)])
+    order = [feed_info["source"] for feed_info, _ in
+             iter_downloads(feeds, max_workers=3, per_host_limit=1)]
+
+    assert peak == {"a.example": 1, "b.example": 1}
+    # 同じホストのフィードが先に並んでいても、b.example は a.example の空きを待たずに取得される
+    assert order[:4].count("B") == 2
+    assert len(order) == 8
+
+
+class SlowResponse:
+    def iter_content(self, chunk_size):
+        for _ in range(3):
+            yield b"x" * chunk_size
+
+
+def test_read_body_stops_after_total_timeout():
+    assert len(_read_body(SlowResponse(), time.monotonic() + 60)) == 3 * 64 * 1024
+    with pytest.raises(TimeoutError):
+        _read_body(SlowResponse(), time.monotonic() - 1)
+
+
+def test_fetch_stores_new_articles_and_skips_unchanged_feeds(workdir):
+    generator = CorpusGenerator(seed=1)
+    with FakeServices() as services:
+        for i in range(3):
+            services.add_feed(f"/feeds/{i}.xml", render_rss(f"Feed {i}", f"https://bench.example/{i}",
+                                                            generator.articles(i, 5)))
+        feeds = [{"url": services.url(path), "source": f"Feed {i}"}
+                 for i, path in enumerate(services.feeds)]
+        assert fetch_rss_feeds(feeds, max_workers=2, per_host_limit=1) == 15
+        assert fetch_rss_feeds(feeds, max_workers=2, per_host_limit=1) == 0
+        assert services.requests["not_modified"] == 3
+    count = get_connection(FEEDS_DB).execute("SELECT COUNT(*) FROM beauty_articles").fetchone()[0]
+    assert count == 15
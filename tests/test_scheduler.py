@@ -0,0 +1,151 @@
+import datetime
+import json
+
+import pytest
+
+from beauty_scheduler import SCHEDULER_MAX_POLL, JobScheduler
+
+
+class ManualExecutor:
+    """投入されたジョブを保持し、テストから1件ずつ完了させる"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, job):
+        self.submitted.append((func, job))
+
+    def names(self):
+        return [job.name for _, job in self.submitted]
+
+    def finish(self, name):
+        for i, (func, job) in enumerate(self.submitted):
+            if job.name == name:
+                del self.submitted[i]
+                func(job)
+                return
+        raise AssertionError(f"{name} は実行中ではありません")
+
+
+@pytest.fixture
+def executor():
+    return ManualExecutor()
+
+
+def make_scheduler(clock, **options):
+    return JobScheduler(state_path="scheduler_state.json", clock=clock, **options)
+
+
+def test_job_does_not_overlap_itself(workdir, clock, executor):
+    scheduler = make_scheduler(clock)
+    scheduler.add_job("rss", lambda: True, 60)
+
+    scheduler.run_pending(executor)
+    clock.sleep(120)
+    scheduler.run_pending(executor)
+    assert executor.names() == ["rss"]
+
+    executor.finish("rss")
+    assert scheduler.jobs["rss"].next_run == clock.now + 60
+    assert scheduler.run_pending(executor) == 60
+    assert executor.names() == []
+
+
+def test_dependent_job_waits_for_due_and_running_collectors(workdir, clock, executor):
+    scheduler = make_scheduler(clock)
+    scheduler.add_job("trends", lambda: True, 6 * 3600, depends_on=["rss", "api"])
+    scheduler.add_job("rss", lambda: True, 900)
+    scheduler.add_job("api", lambda: True, 7200)
+
+    # trends は先に登録されていても、実行待ちの rss / api より後になる
+    delay = scheduler.run_pending(executor)
+    assert executor.names() == ["rss", "api"]
+    # 依存待ちのジョブで1秒ごとの確認にならない（収集の終了時に起こされる）
+    assert delay == SCHEDULER_MAX_POLL
+
+    clock.sleep(30)
+    executor.finish("rss")
+    assert scheduler._wake.is_set()
+    scheduler.run_pending(executor)
+    assert executor.names() == ["api"]
+
+    executor.finish("api")
+    scheduler.run_pending(executor)
+    assert executor.names() == ["trends"]
+
+
+def test_catch_up_from_persisted_last_run(workdir, clock, executor):
+    with open("scheduler_state.json", "w", encoding="utf-8") as f:
+        json.dump({"jobs": {"api": {"last_run": clock.now - 3 * 7200},
+                            "trends": {"last_run": clock.now - 600}}}, f)
+    scheduler = make_scheduler(clock)
+    api = scheduler.add_job("api", lambda: True, 7200)
+    trends = scheduler.add_job("trends", lambda: True, 3600)
+    rss = scheduler.add_job("rss", lambda: True, 900)
+
+    # 何回分遅れていても追いかけ実行は1回だけ、間隔内のジョブは残りの時間だけ待つ
+    assert api.next_run == clock.now
+    assert trends.next_run == clock.now + 3000
+    assert rss.next_run == clock.now
+    scheduler.run_pending(executor)
+    assert sorted(executor.names()) == ["api", "rss"]
+
+    executor.finish("api")
+    with open("scheduler_state.json", encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["jobs"]["api"]["last_run"] == clock.now
+    assert state["jobs"]["api"]["last_status"] == "ok"
+    assert make_scheduler(clock).add_job("api", lambda: True, 7200).next_run == clock.now + 7200
+
+
+def test_failed_job_is_recorded_and_rescheduled(workdir, clock, executor):
+    scheduler = make_scheduler(clock)
+    scheduler.add_job("api", lambda: 1 / 0, 7200)
+    scheduler.run_pending(executor)
+    executor.finish("api")
+    assert scheduler._state["jobs"]["api"]["last_status"] == "error"
+    assert scheduler.jobs["api"].next_run == clock.now + 7200
+
+
+def test_jitter_stays_within_bounds(workdir, clock, executor):
+    scheduler = make_scheduler(clock)
+    job = scheduler.add_job("api", lambda: True, 7200, jitter=300)
+    offsets = []
+    for _ in range(50):
+        clock.now = job.next_run
+        scheduler.run_pending(executor)
+        executor.finish("api")
+        offsets.append(job.next_run - clock.now - 7200)
+    assert all(0 <= offset <= 300 for offset in offsets)
+    assert len(set(offsets)) > 1
+
+
+def test_midnight_full_run_waits_for_running_jobs(workdir, clock, executor):
+    clock.now = datetime.datetime(2026, 10, 16, 23, 50).timestamp()
+    scheduler = make_scheduler(clock, full_run_at="00:00")
+    scheduler.add_job("rss", lambda: True, 900)
+    scheduler.add_job("trends", lambda: True, 6 * 3600, depends_on=["rss"])
+    scheduler._state["jobs"]["trends"] = {"last_run": clock.now}
+    scheduler.jobs["trends"].next_run = clock.now + 6 * 3600
+    scheduler.run_pending(executor)
+    assert executor.names() == ["rss"]
+
+    # rss の実行中に0時を過ぎる
+    clock.now = datetime.datetime(2026, 10, 17, 0, 0, 30).timestamp()
+    scheduler.run_pending(executor)
+    assert executor.names() == ["rss"]
+    assert scheduler._state["last_full_run"] == "2026-10-17"
+
+    # 実行中だった rss も終了後にもう一度実行され、その後に trends が実行される
+    executor.finish("rss")
+    scheduler.run_pending(executor)
+    assert executor.names() == ["rss"]
+    executor.finish("rss")
+    scheduler.run_pending(executor)
+    assert executor.names() == ["trends"]
+    executor.finish("trends")
+
+    # 同じ日に2回は実行しない
+    clock.sleep(60)
+    scheduler.run_pending(executor)
+    assert executor.names() == []
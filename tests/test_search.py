@@ -0,0 +1,15 @@
+from beauty_api_collector import link_tweets, save_tweets, setup_database
+from beauty_search import search_tweets
+from test_twitter_collection import make_tweets
+
+
+def test_insert_counts_exclude_fts_trigger_writes(workdir):
+    conn = setup_database()
+    tweets = make_tweets(1000, 5)
+    assert save_tweets(conn, tweets, "2026-10-16 09:00:00") == 5
+    assert save_tweets(conn, tweets + make_tweets(2000, 1), "2026-10-16 10:00:00") == 1
+    assert link_tweets(conn, "skincare", tweets) == 5
+    assert link_tweets(conn, "skincare", tweets) == 0
+    conn.commit()
+    # 件数は正しいまま、トリガーで全文検索インデックスにも登録されている
+    assert len(search_tweets(conn, "skincare tip", limit=50)) == 6
@@ -0,0 +1,54 @@
+import sqlite3
+
+import beauty_storage
+from beauty_storage import MIGRATIONS, TRENDS_DB, get_connection, parse_published
+
+
+def build_db(path, steps):
+    """移行手順の途中までを適用した既存DBを作る"""
+    conn = sqlite3.connect(path)
+    for number, migration in enumerate(steps, 1):
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {number}")
+    conn.commit()
+    return conn
+
+
+def test_new_database_is_migrated_to_latest_version(workdir):
+    conn = get_connection(TRENDS_DB)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS[TRENDS_DB])
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_tweets_rebuild_keeps_rowids_as_ids(workdir):
+    # 単語集計の処理済み位置（旧rowid）がそのまま使えるよう、rowid を id に引き継ぐ
+    old = build_db(TRENDS_DB, MIGRATIONS[TRENDS_DB][:3])
+    old.executemany("INSERT INTO tweets (tweet_id, text, collection_date) VALUES (?, ?, ?)",
+                    [(str(i), f"serum {i}", "2026-10-16 09:00:00") for i in range(5)])
+    old.execute("DELETE FROM tweets WHERE tweet_id = '1'")
+    rows = old.execute("SELECT rowid, tweet_id FROM tweets ORDER BY rowid").fetchall()
+    old.commit()
+    old.close()
+
+    conn = get_connection(TRENDS_DB)
+    assert conn.execute("SELECT id, tweet_id FROM tweets ORDER BY id").fetchall() == rows
+    assert conn.execute("INSERT OR IGNORE INTO tweets (tweet_id) VALUES ('0')").rowcount == 0
+    conn.execute("INSERT INTO tweets (tweet_id) VALUES ('9')")
+    # 既存のツイートより後ろの番号が振られる
+    assert conn.execute("SELECT id FROM tweets WHERE tweet_id = '9'").fetchone()[0] > rows[-1][0]
+
+
+def test_published_at_backfill(workdir):
+    old = build_db(beauty_storage.FEEDS_DB, MIGRATIONS[beauty_storage.FEEDS_DB][:2])
+    old.execute("INSERT INTO beauty_articles (link, published) VALUES (?, ?)",
+                ("https://example.com/a", "Fri, 16 Oct 2026 09:00:00 +0900"))
+    old.commit()
+    old.close()
+    conn = get_connection(beauty_storage.FEEDS_DB)
+    assert conn.execute("SELECT published_at FROM beauty_articles").fetchone()[0] == "2026-10-16T00:00:00Z"
+
+
+def test_parse_published_formats():
+    assert parse_published("2026-10-16T09:00:00+09:00") == "2026-10-16T00:00:00Z"
+    assert parse_published("not a date") is None
+    assert parse_published(None) is None
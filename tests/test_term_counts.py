@@ -0,0 +1,52 @@
+import datetime
+from collections import Counter
+
+import pytest
+
+from beauty_storage import TRENDS_DB, get_connection
+from beauty_term_counts import (add_term_counts, hour_bucket, iter_term_totals, setup_term_count_tables,
+                                sum_term_counts)
+
+
+@pytest.fixture
+def conn(workdir):
+    conn = get_connection(TRENDS_DB)
+    setup_term_count_tables(conn)
+    return conn
+
+
+def add_counts(conn, hours_ago, counts, stream="twitter", source="twitter", lang="en"):
+    bucket = hour_bucket(datetime.datetime.now() - datetime.timedelta(hours=hours_ago))
+    add_term_counts(conn, stream, {(bucket, source, lang): Counter(counts)})
+    conn.commit()
+
+
+def test_totals_sum_buckets_within_window(conn):
+    add_counts(conn, 0, {"serum": 3, "toner": 1})
+    add_counts(conn, 0, {"serum": 2})                     # 同じバケットへの加算
+    add_counts(conn, 5, {"serum": 4, "toner": 1}, source="other", lang="ja")
+    add_counts(conn, 48, {"serum": 100})                  # 期間外
+    add_counts(conn, 0, {"serum": 50}, stream="rss")      # 別のストリーム
+
+    assert sum_term_counts(conn, "twitter", hours=24) == {"serum": 9, "toner": 2}
+    assert sum_term_counts(conn, "twitter", hours=24, lang="ja") == {"serum": 4, "toner": 1}
+    assert sum_term_counts(conn, "twitter", hours=72)["serum"] == 109
+
+
+def test_min_count_is_applied_to_window_totals(conn):
+    # 各バケットではしきい値未満でも、期間の合計がしきい値以上なら残る
+    for hours_ago in range(4):
+        add_counts(conn, hours_ago, {"retinol": 2, "toner": 1})
+    add_counts(conn, 0, {"serum": 7})
+
+    assert sum_term_counts(conn, "twitter", hours=24, min_count=5) == {"retinol": 8, "serum": 7}
+    assert sum_term_counts(conn, "twitter", hours=24, min_count=8) == {"retinol": 8}
+    assert sum_term_counts(conn, "twitter", hours=24, min_count=100) == {}
+
+
+def test_iter_term_totals_streams_in_chunks(conn):
+    add_counts(conn, 0, {f"term{i:03d}": i for i in range(1, 251)})
+
+    totals = iter_term_totals(conn, "twitter", hours=24, min_count=51, chunk_size=7)
+    assert iter(totals) is totals  # ジェネレーター（全件をリストにしない）
+    assert dict(totals) == {f"term{i:03d}": i for i in range(51, 251)}
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from beauty_tokenizer import STOP_WORDS_EN, RegexTokenizer, compare_tokenizers, get_tokenizer
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "tokenizer_corpus_en.txt")
+
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def nltk_data_available():
+    try:
+        import nltk
+    except ImportError:
+        return False
+    for path in ("tokenizers/punkt_tab", "corpora/stopwords"):
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            return False
+    return True
+
+
+def nltk_filter(words):
+    """NltkTokenizer と同じフィルタ"""
+    return [word for word in words if word not in STOP_WORDS_EN and len(word) > 2
+            and not word.isdigit() and word.isalpha()]
+
+
+def test_regex_matches_nltk_word_tokenizer_on_reference_corpus():
+    # コーパスは1行1文なので、word_tokenize は各行をそのまま NLTKWordTokenizer に渡すのと同じ
+    # （Punktのモデルが不要なため、NLTKのデータがない環境でも比較できる）
+    tokenize = pytest.importorskip("nltk.tokenize")
+    reference = tokenize.NLTKWordTokenizer()
+    tokenizer = RegexTokenizer()
+    mismatches = [(text, expected, actual) for text in load_corpus()
+                  for expected, actual in [(nltk_filter(reference.tokenize(text.lower())),
+                                            tokenizer.tokenize(text))]
+                  if expected != actual]
+    assert mismatches == []
+
+
+@pytest.mark.skipif(not nltk_data_available(), reason="NLTKの punkt_tab / stopwords が未インストール")
+def test_regex_matches_nltk_backend_on_reference_corpus():
+    texts = load_corpus()
+    # 複数の文をまとめた段落では Punkt の文分割（略語の扱い）も比較される
+    paragraphs = [" ".join(texts[i:i + 5]) for i in range(0, len(texts), 5)]
+    assert compare_tokenizers(texts + paragraphs) == []
+
+
+def test_japanese_text_is_segmented():
+    assert get_tokenizer("regex").tokenize("", "ja") == []
+    assert "スキンケア" in get_tokenizer("regex").tokenize("新しいスキンケアの美容液", "ja")
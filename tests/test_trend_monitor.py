@@ -0,0 +1,129 @@
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import beauty_trend_monitor
+from beauty_storage import TRENDS_DB, get_connection
+from beauty_term_counts import get_progress, setup_term_count_tables, sum_term_counts
+from beauty_trend_monitor import BeautyTrendMonitor, count_terms_by_key
+
+
+def add_tweets(conn, start, count, collection_date):
+    conn.executemany("INSERT INTO tweets (tweet_id, text, collection_date) VALUES (?, ?, ?)",
+                     [(str(i), "glowing niacinamide serum", collection_date)
+                      for i in range(start, start + count)])
+    conn.commit()
+
+
+def test_twitter_term_counts_survive_vacuum(workdir):
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_connection(TRENDS_DB)
+    setup_term_count_tables(conn)
+    monitor = BeautyTrendMonitor()
+
+    add_tweets(conn, 0, 10, now)
+    conn.execute("DELETE FROM tweets WHERE tweet_id IN ('2', '5')")
+    conn.commit()
+    assert monitor.update_twitter_term_counts(conn) == 8
+    assert get_progress(conn, "tweets") == 10
+
+    # VACUUM後もidは変わらないため、集計済みのツイートを数え直さない
+    conn.execute("VACUUM")
+    add_tweets(conn, 100, 3, now)
+    assert monitor.update_twitter_term_counts(conn) == 3
+    assert monitor.update_twitter_term_counts(conn) == 0
+    assert sum_term_counts(conn, "twitter")["niacinamide"] == 11
+
+
+class RecordingRenderer:
+    def __init__(self):
+        self.waits = 0
+
+    def wait(self):
+        self.waits += 1
+
+
+def test_only_one_shot_runs_wait_for_charts(workdir, monkeypatch):
+    from beauty_data_system import run_trend_monitor
+
+    monitor = BeautyTrendMonitor()
+    monitor.renderer = RecordingRenderer()
+    monkeypatch.setattr(monitor, "update_trends", lambda hours: {"serum": 3})
+
+    assert run_trend_monitor(monitor=monitor, wait_for_charts=False)
+    assert run_trend_monitor(monitor=monitor, wait_for_charts=False)
+    assert monitor.renderer.waits == 0
+    assert run_trend_monitor(monitor=monitor)
+    assert monitor.renderer.waits == 1
+
+
+TEXTS = [
+    ("en", "Glowing skin with niacinamide serum and retinol night cream"),
+    ("en", "Retinol retinol everywhere: the serum trend continues"),
+    ("ja", "韓国コスメの新作美容液が人気"),
+    ("en", "Sunscreen with SPF 50 for sensitive skin"),
+    ("ja", "毎日の保湿ケアに化粧水と美容液"),
+]
+
+
+def make_items(count):
+    return [(f"source{i % 3}", *TEXTS[i % len(TEXTS)]) for i in range(count)]
+
+
+class CountingPool(ProcessPoolExecutor):
+    """投入したチャンク数と、同時に未完了だったチャンク数の最大を記録する"""
+
+    submitted = 0
+    in_flight = 0
+    max_in_flight = 0
+
+    def submit(self, *args, **kwargs):
+        future = super().submit(*args, **kwargs)
+        cls = type(self)
+        cls.submitted += 1
+        cls.in_flight += 1
+        cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        future.add_done_callback(lambda _: setattr(cls, "in_flight", cls.in_flight - 1))
+        return future
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(CountingPool, "submitted", 0)
+    monkeypatch.setattr(CountingPool, "in_flight", 0)
+    monkeypatch.setattr(CountingPool, "max_in_flight", 0)
+    monkeypatch.setattr(beauty_trend_monitor, "ProcessPoolExecutor", CountingPool)
+    monkeypatch.setattr(beauty_trend_monitor, "PARALLEL_MIN_TEXTS", 20)
+    return CountingPool
+
+
+def test_process_pool_counts_match_serial(pool):
+    items = make_items(300)
+    serial = count_terms_by_key(items, workers=1)
+    parallel = count_terms_by_key(items, workers=2)
+    assert pool.submitted == 8  # ワーカー数の4倍に分割
+    assert parallel == serial
+    assert serial["source0"]["retinol"] > 0 and serial["source1"]["美容液"] > 0
+
+
+def test_small_inputs_stay_serial(pool):
+    assert count_terms_by_key(make_items(19), workers=2) == count_terms_by_key(make_items(19), workers=1)
+    assert pool.submitted == 0
+
+
+def test_generator_input_keeps_chunks_in_flight_bounded(pool, monkeypatch):
+    monkeypatch.setattr(beauty_trend_monitor, "PARALLEL_CHUNK_SIZE", 10)
+    consumed = []
+
+    def generate():
+        for item in make_items(500):
+            consumed.append(item)
+            yield item
+
+    result = count_terms_by_key(generate(), workers=2)
+    assert len(consumed) == 500
+    assert pool.submitted == 50
+    # 送り出したチャンクはワーカー数の2倍まで
+    assert pool.max_in_flight <= 4
+    assert result == count_terms_by_key(make_items(500), workers=1)
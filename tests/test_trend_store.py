@@ -0,0 +1,65 @@
+import datetime
+import json
+
+import pytest
+
+from beauty_data_system import main
+from beauty_storage import TRENDS_DB, get_connection
+from beauty_trend_store import (apply_retention, compact_reports, load_recent_snapshots,
+                                save_snapshot, setup_trend_store, term_history)
+
+
+def days_ago(days, hour=9):
+    moment = datetime.datetime.now() - datetime.timedelta(days=days)
+    return moment.replace(hour=hour, minute=0, second=0).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@pytest.fixture
+def conn(workdir):
+    conn = get_connection(TRENDS_DB)
+    setup_trend_store(conn)
+    return conn
+
+
+def test_term_history_resolutions(conn):
+    save_snapshot(conn, {"timestamp": days_ago(1, 9), "trends": {"retinol": 4, "serum": 9}})
+    save_snapshot(conn, {"timestamp": days_ago(1, 15), "trends": {"retinol": 7}})
+    save_snapshot(conn, {"timestamp": days_ago(40), "trends": {"retinol": 99}})
+
+    assert [count for _, count in term_history(conn, "retinol", 30, "raw")] == [4, 7]
+    assert term_history(conn, "retinol", 30, "day") == [(days_ago(1)[:10], 7)]
+    assert len(term_history(conn, "retinol", 60, "hour")) == 3
+    with pytest.raises(ValueError):
+        term_history(conn, "retinol", 30, "week")
+
+
+def test_retention_folds_old_snapshots_into_daily_rows(conn):
+    save_snapshot(conn, {"timestamp": days_ago(45, 9), "trends": {"retinol": 3}})
+    save_snapshot(conn, {"timestamp": days_ago(45, 15), "trends": {"retinol": 8}})
+    save_snapshot(conn, {"timestamp": days_ago(1), "trends": {"retinol": 5}})
+
+    assert apply_retention(conn) == 2
+    assert len(load_recent_snapshots(conn)) == 1
+    # 日次に集約した分も 'day' の推移に含まれる（日ごとの最大値）
+    assert term_history(conn, "retinol", 60, "day") == [(days_ago(45)[:10], 8), (days_ago(1)[:10], 5)]
+
+
+def test_compact_reports_imports_and_removes_files(conn, workdir):
+    reports = workdir / "reports"
+    reports.mkdir()
+    for i in range(3):
+        snapshot = {"timestamp": days_ago(i + 1), "trends": {"serum": i + 1}}
+        (reports / f"beauty_trends_{i}.json").write_text(json.dumps(snapshot), encoding="utf-8")
+    (reports / "beauty_trends_latest.json").write_text("{}", encoding="utf-8")
+    (reports / "beauty_trends_broken.json").write_text("{", encoding="utf-8")
+
+    assert compact_reports(conn, str(reports)) == 3
+    assert sorted(path.name for path in reports.iterdir()) == [
+        "beauty_trends_broken.json", "beauty_trends_latest.json"]
+    assert [count for _, count in term_history(conn, "serum", 30)] == [3, 2, 1]
+
+
+def test_trend_history_command(conn, capsys):
+    save_snapshot(conn, {"timestamp": days_ago(2), "trends": {"retinol": 6}})
+    assert main(["trend-history", "retinol", "--days", "7"]) == 0
+    assert f"{days_ago(2)[:10]}       6" in capsys.readouterr().out
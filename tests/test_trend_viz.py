@@ -0,0 +1,35 @@
+import pytest
+
+from beauty_trend_viz import TrendRenderer, trend_fingerprint
+
+
+def snapshot(timestamp, trends):
+    return {"timestamp": timestamp, "trends": trends}
+
+
+def test_fingerprint_only_depends_on_top_n():
+    base = {"serum": 10, "toner": 8, "retinol": 3}
+    assert trend_fingerprint(base, top_n=2) == trend_fingerprint({**base, "retinol": 1}, top_n=2)
+    assert trend_fingerprint(base, top_n=2) != trend_fingerprint({**base, "toner": 9}, top_n=2)
+
+
+def test_unchanged_or_empty_snapshots_are_not_submitted(tmp_path):
+    renderer = TrendRenderer(out_dir=str(tmp_path))
+    renderer._executor.submit = lambda *args: "scheduled"
+    assert renderer.submit(snapshot("2026-10-16 09:00:00", {})) is None
+    assert renderer.submit(snapshot("2026-10-16 09:00:00", {"serum": 10})) == "scheduled"
+    assert renderer.submit(snapshot("2026-10-16 15:00:00", {"serum": 10})) is None
+    assert renderer.submit(snapshot("2026-10-16 21:00:00", {"serum": 11})) == "scheduled"
+
+
+def test_render_series_skips_repeated_snapshots(tmp_path):
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("seaborn")
+    renderer = TrendRenderer(out_dir=str(tmp_path))
+    filenames = renderer.render_series([
+        snapshot("2026-10-16 09:00:00", {"serum": 10}),
+        snapshot("2026-10-16 15:00:00", {"serum": 10}),
+        snapshot("2026-10-16 21:00:00", {"serum": 12, "toner": 6}),
+    ])
+    assert [name.rsplit("/", 1)[-1] for name in filenames] == [
+        "trend_viz_2026-10-16_09-00-00.png", "trend_viz_2026-10-16_21-00-00.png"]
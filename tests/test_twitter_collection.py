@@ -0,0 +1,79 @@
+from beauty_api_collector import collect_twitter_data, get_cursor
+from beauty_storage import get_connection, TRENDS_DB
+from beauty_twitter_planner import RateLimiter, RecentSearchClient, plan_queries
+from fake_services import FakeServices
+
+KEYWORDS = ["skincare", "serum"]
+
+
+def make_tweets(start, count, keyword="skincare"):
+    return [{"id": str(tweet_id), "text": f"{keyword} tip {tweet_id}",
+             "created_at": "2026-10-16T00:00:00.000Z",
+             "public_metrics": {"retweet_count": 0, "reply_count": 0, "like_count": 1,
+                                "quote_count": 0}}
+            for tweet_id in range(start, start + count)]
+
+
+def stored_ids():
+    conn = get_connection(TRENDS_DB)
+    return {int(tweet_id) for (tweet_id,) in conn.execute("SELECT tweet_id FROM tweets")}
+
+
+def make_client(services, clock):
+    return RecentSearchClient("test", base_url=services.base_url,
+                              rate_limiter=RateLimiter(sleep=clock.sleep, clock=clock))
+
+
+def test_plan_queries_resumes_only_when_every_keyword_is_suspended():
+    since_ids = {"skincare": "100", "serum": "200"}
+    batch, = plan_queries(KEYWORDS, since_ids, {"skincare": "150", "serum": "300"})
+    assert (batch.since_id, batch.until_id) == ("100", "300")
+    batch, = plan_queries(KEYWORDS, since_ids, {"skincare": "150"})
+    assert (batch.since_id, batch.until_id) == ("100", None)
+
+
+def test_pages_through_every_result(workdir, clock):
+    with FakeServices(tweets=make_tweets(1000, 2000), clock=clock) as services:
+        client = make_client(services, clock)
+        collect_twitter_data(KEYWORDS, client, raise_errors=True)
+        assert len(stored_ids()) == 2000
+
+        # 2回目は前回以降の新しいツイートだけを取得する
+        services.add_tweets(make_tweets(5000, 3, "serum"))
+        searches = services.requests["search"]
+        collect_twitter_data(KEYWORDS, client, raise_errors=True)
+        assert services.requests["search"] == searches + 1
+    assert len(stored_ids()) == 2003
+    assert get_cursor(get_connection(TRENDS_DB), "serum") == ("5002", None, None)
+
+
+def test_run_cut_short_by_rate_limit_resumes_without_losing_tweets(workdir, clock):
+    tweets = make_tweets(1000, 2000)
+    with FakeServices(tweets=tweets, rate_limit=5, clock=clock) as services:
+        client = make_client(services, clock)
+        collect_twitter_data(KEYWORDS, client, raise_errors=True)
+        # 5ページでクォータを使い切り、since_id は進めずに再開位置を記録する
+        assert len(stored_ids()) == 500
+        since_id, until_id, pending_newest_id = get_cursor(get_connection(TRENDS_DB), "skincare")
+        assert (since_id, pending_newest_id) == (None, "2999")
+        assert int(until_id) == min(stored_ids())
+
+        # 途中で投稿されたツイートも、再開分を取り終えた後の実行で取得される
+        services.add_tweets(make_tweets(9000, 2))
+        for _ in range(5):
+            collect_twitter_data(KEYWORDS, client, raise_errors=True)
+        # クォータが空のまま次の実行に入ると、リセット時刻まで待ってから取得する
+        assert clock.now > 1_700_000_000.0 + 900
+    assert stored_ids() == {int(tweet["id"]) for tweet in tweets} | {9000, 9001}
+    assert get_cursor(get_connection(TRENDS_DB), "skincare") == ("9001", None, None)
+
+
+def test_429_waits_for_reset_and_retries(workdir, clock):
+    with FakeServices(tweets=make_tweets(1000, 50), rate_limit=3, clock=clock) as services:
+        # 別のクライアントがクォータを使い切った状態
+        for _ in range(3):
+            services.take_request()
+        collect_twitter_data(KEYWORDS, make_client(services, clock), raise_errors=True)
+        assert services.requests["rate_limited"] == 1
+        assert services.requests["search"] == 1
+    assert len(stored_ids()) == 50
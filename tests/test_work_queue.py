@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+import beauty_work_queue
+from beauty_work_queue import SQLiteWorkQueue, run_worker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / "queue.db"))
+
+
+@pytest.fixture
+def clock(monkeypatch, clock):
+    monkeypatch.setattr(beauty_work_queue.time, "time", clock)
+    return clock
+
+
+def test_enqueue_skips_unfinished_duplicates(queue):
+    assert queue.enqueue("rss", "a", {"url": "a"})
+    assert not queue.enqueue("rss", "a", {"url": "a"})
+    item = queue.claim("w1")
+    assert not queue.enqueue("rss", "a", {"url": "a"})
+    queue.complete(item)
+    assert queue.enqueue("rss", "a", {"url": "a"})
+
+
+def test_leased_item_is_not_claimed_twice_until_it_expires(queue, clock):
+    queue.enqueue("rss", "a", {"url": "a"})
+    item = queue.claim("w1", lease_seconds=60)
+    assert item.payload == {"url": "a"}
+    assert queue.claim("w2") is None
+
+    clock.sleep(61)
+    taken = queue.claim("w2", lease_seconds=60)
+    assert (taken.id, taken.attempts) == (item.id, 2)
+    # 期限切れ後の元のワーカーの報告は無視される
+    assert not queue.extend(item)
+    assert not queue.complete(item)
+    assert queue.complete(taken)
+    assert queue.stats() == [("rss", "done", 1)]
+
+
+def test_failed_item_is_retried_with_backoff_then_fails(queue, clock):
+    queue.enqueue("twitter", "q", {"keywords": ["serum"]}, max_attempts=2)
+    item = queue.claim("w1")
+    assert queue.fail(item, "timeout")
+    assert queue.claim("w1") is None
+
+    clock.sleep(beauty_work_queue.WORK_RETRY_BASE)
+    item = queue.claim("w1")
+    assert item.attempts == 2
+    queue.fail(item, "timeout again")
+    assert queue.stats() == [("twitter", "failed", 1)]
+    assert queue.failures()[0][:4] == ("twitter", "q", 2, "timeout again")
+
+
+def test_expired_lease_after_last_attempt_is_marked_failed(queue, clock):
+    queue.enqueue("rss", "a", {}, max_attempts=1)
+    queue.claim("w1", lease_seconds=10)
+    clock.sleep(11)
+    assert queue.claim("w2") is None
+    assert queue.failures()[0][3] == "リースの期限切れ"
+
+
+def test_run_worker_processes_until_empty(queue):
+    for key in "abc":
+        queue.enqueue("rss", key, {"key": key})
+    seen = []
+
+    def handle(payload):
+        if payload["key"] == "b":
+            raise RuntimeError("boom")
+        seen.append(payload["key"])
+
+    processed = run_worker(queue, {"rss": handle}, worker_id="w1", exit_when_empty=True,
+                           stop_event=threading.Event())
+    assert processed == 3
+    assert seen == ["a", "c"]
+    assert dict(((kind, status), count) for kind, status, count in queue.stats()) == {
+        ("rss", "done"): 2, ("rss", "pending"): 1}
+
+
+def test_journal_mode_override_never_enables_wal(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "shared.db"), journal_mode="DELETE")
+    assert queue._conn().execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert not (tmp_path / "shared.db-wal").exists()
+
+
+def test_unknown_journal_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        SQLiteWorkQueue(str(tmp_path / "q.db"), journal_mode="wal; DROP TABLE x")._conn()